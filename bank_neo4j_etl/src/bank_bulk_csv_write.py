@@ -1,23 +1,36 @@
 import os
+import json
 import logging
 from retry import retry
 from neo4j import GraphDatabase
-
-# Paths to CSV files containing hospital data
-BRANCHES_CSV_PATH = os.getenv("BRANCHES_CSV_PATH")
-MORTGAGE_CSV_PATH = os.getenv("MORTGAGE_CSV_PATH")
-CUSTOMER_CSV_PATH = os.getenv("CUSTOMER_CSV_PATH")
-PAYMENTS_MADE_CSV_PATH = os.getenv("PAYMENTS_MADE_CSV_PATH")
-PAYMENTS_DUE_CSV_PATH = os.getenv("PAYMENTS_DUE_CSV_PATH")
-FEES_CSV_PATH = os.getenv("FEES_CSV_PATH")
-FAQS_CSV_PATH = os.getenv("FAQS_CSV_PATH")
-EXAMPLE_CYPHER_CSV_PATH = os.getenv("EXAMPLE_CYPHER_CSV_PATH")
+from typing import Any, Optional
+from bank_csv_mappings import (
+    CSV_PATHS,
+    NODE_MAPPINGS,
+    SOURCE_STAGES,
+    RelationshipMapping,
+    convert_value,
+    key_type,
+    node_mapping_for,
+    range_indexed_properties,
+    relationship_mappings_for,
+    row_matches,
+    row_properties,
+)
+from bank_csv_sources import iter_source_batches
 
 # Neo4j config
 NEO4J_URI = os.getenv("NEO4J_URI")
 NEO4J_USERNAME = os.getenv("NEO4J_USERNAME")
 NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD")
 
+# "transactional" loads the CSVs into a running database, "post_import"
+# only prepares a graph created from bank_bulk_import.py files
+ETL_MODE = os.getenv("ETL_MODE", "transactional")
+
+# Rows written per transaction
+ETL_BATCH_SIZE = int(os.getenv("ETL_BATCH_SIZE", "5000"))
+
 # Configure the logging module
 logging.basicConfig(
     level=logging.INFO,
@@ -28,7 +41,7 @@ logging.basicConfig(
 
 LOGGER = logging.getLogger(__name__)
 
-NODES = ["Branch", "Customer", "Mortgage", "Question"]
+NODES = [mapping.label for mapping in NODE_MAPPINGS]
 
 
 def _set_uniqueness_constraints(tx, node):
@@ -37,193 +50,177 @@ def _set_uniqueness_constraints(tx, node):
     _ = tx.run(query, {})
 
 
-@retry(tries=100, delay=10)
-def load_bank_graph_from_csv() -> None:
-    """Load structured bank CSV data following
-    a specific ontology into Neo4j"""
+def _set_range_index(tx, node, prop):
+    query = f"""CREATE INDEX {node.lower()}_{prop} IF NOT EXISTS
+        FOR (n:{node}) ON (n.{prop});"""
+    _ = tx.run(query, {})
 
-    driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USERNAME, NEO4J_PASSWORD))
-    # Add a step to clear the database before loading new data
+
+def clear_graph(driver) -> None:
     LOGGER.info("Clearing existing graph data...")
     with driver.session(database="neo4j") as session:
         session.run("MATCH (n) DETACH DELETE n;")
     LOGGER.info("Existing graph data cleared.")
 
+
+def set_uniqueness_constraints(driver) -> None:
+    """Create the id uniqueness constraints, which also index the ids"""
+
     LOGGER.info("Setting uniqueness constraints on nodes")
     with driver.session(database="neo4j") as session:
         for node in NODES:
             session.execute_write(_set_uniqueness_constraints, node)
 
-    LOGGER.info("Loading branch nodes")
-    with driver.session(database="neo4j") as session:
-        query = f"""
-        LOAD CSV WITH HEADERS
-        FROM '{BRANCHES_CSV_PATH}' AS branches
-        MERGE (h:Branch {{id: toInteger(branches.branch_id),
-                            name: branches.branch_name,
-                            state_name: branches.branch_state}});
-        """
-        _ = session.run(query, {})
-
-    LOGGER.info("Loading customer nodes")
-    with driver.session(database="neo4j") as session:
-        query = f"""
-        LOAD CSV WITH HEADERS
-        FROM '{CUSTOMER_CSV_PATH}' AS customers
-        MERGE (p:Customer {{id: customers.customer_id}})
-        SET
-            p.first_name = customers.first_name,
-            p.last_name = customers.last_name,
-            p.name = customers.first_name + ' ' + customers.last_name,
-            p.email = customers.email,
-            p.phone_number = customers.phone_number,
-            p.address = customers.address,
-            p.city = customers.city,
-            p.state = customers.state,
-            p.zip_code = customers.zip_code,
-            p.country = customers.country;
-        """
-        _ = session.run(query, {})
-
-    LOGGER.info("Loading mortgage nodes")
-    with driver.session(database="neo4j") as session:
-        query = f"""
-        LOAD CSV WITH HEADERS
-        FROM '{MORTGAGE_CSV_PATH}' AS mortgage
-        MERGE (p:Mortgage {{id: mortgage.loan_number,
-                            amount: mortgage.loan_amount,
-                            interest: mortgage.interest_rate,
-                            start: mortgage.start_date,
-                            status: mortgage.status,
-                            tenure:mortgage.tenure
-                            }});
-        """
-        _ = session.run(query, {})
-
-        LOGGER.info("Loading payments nodes")
-    with driver.session(database="neo4j") as session:
-        query = f"""
-        LOAD CSV WITH HEADERS
-        FROM '{PAYMENTS_MADE_CSV_PATH}' AS payments
-        MERGE (p:Payments {{id: payments.payment_made_id,
-                            amount: toFloat(payments.amount),
-                            payment_date: payments.payment_date
-                            }});
-        """
-        session.run(query, {})
-
-    LOGGER.info("Loading PaymentsDue nodes")
-    with driver.session(database="neo4j") as session:
-        query = f"""
-        LOAD CSV WITH HEADERS
-        FROM '{PAYMENTS_DUE_CSV_PATH}' AS payments_due
-        MERGE (pd:PaymentsDue {{id: payments_due.payment_due_id,
-                                 amount: toFloat(payments_due.amount),
-                                 due_date: payments_due.due_date,
-                                 status: payments_due.status
-                                 }});
-        """
-        session.run(query, {})
-
-    LOGGER.info("Loading Fees nodes")
-    with driver.session(database="neo4j") as session:
-        query = f"""
-        LOAD CSV WITH HEADERS
-        FROM '{FEES_CSV_PATH}' AS fees
-        MERGE (f:Fees {{id: fees.fee_id,
-                        type: fees.fee_type,
-                        amount: toFloat(fees.amount),
-                        date_incurred: fees.date_incurred,
-                        status: fees.status
-                        }});
-        """
-        session.run(query, {})
-
-    LOGGER.info("Loading FAQs nodes (assuming a simple structure)")
-    # Note: No specific CSV for FAQs was provided, so this assumes a basic structure.
-    # You would need to create a 'faqs.csv' file with 'faq_id', 'question', 'answer' columns.
-    with driver.session(database="neo4j") as session:
-        query = f"""
-        LOAD CSV WITH HEADERS
-        FROM '{FAQS_CSV_PATH}' AS faqs
-        MERGE (q:FAQs {{id: faqs.faq_id,
-                        question: faqs.question,
-                        answer: faqs.answer,
-                        topics: faqs.related_topics
-                        }});
-        """
-        session.run(query, {})
-
-    LOGGER.info("Loading question nodes")
-    with driver.session(database="neo4j") as session:
-        query = f"""
-        LOAD CSV WITH HEADERS
-        FROM '{EXAMPLE_CYPHER_CSV_PATH}' AS questions
-        MERGE (Q:Question {{
-                         question: questions.question,
-                         cypher: questions.cypher
-                        }});
-        """
-        _ = session.run(query, {})
-
-    LOGGER.info("Creating HAS relationships between Customer and Mortgage nodes")
-    with driver.session(database="neo4j") as session:
-        query = f"""
-        LOAD CSV WITH HEADERS
-        FROM '{MORTGAGE_CSV_PATH}' AS mortgage
-        MATCH (c:Customer {{id: mortgage.customer_id}})
-        MATCH (m:Mortgage {{id: mortgage.loan_number}})
-        MERGE (c)-[:HAS]->(m);
-        """
-        _ = session.run(query, {})
-
-    LOGGER.info("Creating MADE relationships between customer and payments")
-    with driver.session(database="neo4j") as session:
-        query = f"""
-        LOAD CSV WITH HEADERS
-        FROM '{PAYMENTS_MADE_CSV_PATH}' AS payments
-        MATCH (c:Customer {{id: payments.customer_id}})
-        MATCH (p:Payments {{id: payments.payment_made_id}})
-        MERGE (c)-[:MADE]->(p);
-        """
-        session.run(query, {})
-
-    LOGGER.info("Creating SCHEDULE relationships between mortgage and payments due")
-    with driver.session(database="neo4j") as session:
-        query = f"""
-        LOAD CSV WITH HEADERS
-        FROM '{PAYMENTS_DUE_CSV_PATH}' AS payments_due
-        MATCH (m:Mortgage {{id: payments_due.mortgage_id}})
-        MATCH (pd:PaymentsDue {{id: payments_due.payment_due_id}})
-        MERGE (m)-[:SCHEDULE]->(pd);
-        """
-        session.run(query, {})
-
-    LOGGER.info("Creating HAS relationships between mortgage and fees nodes")
+
+def set_range_indexes(driver) -> None:
+    """Index numeric and date properties so range filters become index seeks"""
+
+    LOGGER.info("Setting range indexes on numeric and date properties")
     with driver.session(database="neo4j") as session:
-        query = f"""
-        LOAD CSV WITH HEADERS
-        FROM '{FEES_CSV_PATH}' AS fees
-        MATCH (m:Mortgage {{id: fees.mortgage_id}})
-        MATCH (f:Fees {{id: fees.fee_id}})
-        MERGE (m)-[:HAS]->(f);
-        """
-        session.run(query, {})
-
-    LOGGER.info("Creating MAY INCUR relationships between mortgage and fees nodes")
+        for node, prop in range_indexed_properties():
+            session.execute_write(_set_range_index, node, prop)
+
+
+def _relationship_clause(
+    index: int, rel: RelationshipMapping, node_label: Optional[str]
+) -> str:
+    """Subquery creating one relationship of a row.
+
+    The node created from the same row is bound to `n`; other endpoints are
+    looked up through their indexed ids in `row.rels`.
+    """
+
+    ids = f"row.rels[{index}]"
+    if rel.start_via:
+        via_label, via_type = rel.start_via
+        match_start = (
+            f"MATCH (:{via_label} {{id: {ids}.a}})-[:{via_type}]->(a:{rel.start_label})"
+        )
+        if rel.start_where:
+            match_start += " WHERE " + " AND ".join(
+                f"a.{prop} = {json.dumps(value)}"
+                for prop, value in rel.start_where.items()
+            )
+    elif rel.start_label == node_label:
+        match_start = "WITH n, row, n AS a"
+    else:
+        match_start = f"MATCH (a:{rel.start_label} {{id: {ids}.a}})"
+
+    if rel.end_label == node_label:
+        match_end = "WITH a, n AS b"
+    else:
+        match_end = f"MATCH (b:{rel.end_label} {{id: {ids}.b}})"
+
+    return f"""
+    CALL {{
+        WITH n, row
+        WITH n, row WHERE {ids} IS NOT NULL
+        {match_start}
+        {match_end}
+        MERGE (a)-[:{rel.type}]->(b)
+    }}"""
+
+
+def _source_write_query(source: str) -> str:
+    """Query writing a batch of rows as nodes and their relationships"""
+
+    mapping = node_mapping_for(source)
+    if mapping.key is None:
+        merge = ", ".join(f"{p.name}: row.props.{p.name}" for p in mapping.properties)
+    else:
+        merge = f"{mapping.key}: row.props.{mapping.key}"
+
+    query = f"""
+    UNWIND $rows AS row
+    MERGE (n:{mapping.label} {{{merge}}})
+    SET n += row.props"""
+    for i, rel in enumerate(relationship_mappings_for(source)):
+        query += _relationship_clause(i, rel, mapping.label)
+    return query
+
+
+def _source_row_params(source: str, row: dict[str, Any]) -> Optional[dict]:
+    """Query parameters for one CSV row, or None if it has no node key"""
+
+    mapping = node_mapping_for(source)
+    props = row_properties(mapping, row)
+    merge_keys = [mapping.key] if mapping.key else [p.name for p in mapping.properties]
+    if any(props.get(k) is None for k in merge_keys):
+        return None
+
+    rels = []
+    for rel in relationship_mappings_for(source):
+        if not row_matches(rel, row):
+            rels.append(None)
+            continue
+        start_label = rel.start_via[0] if rel.start_via else rel.start_label
+        rels.append(
+            {
+                "a": convert_value(row.get(rel.start_column), key_type(start_label)),
+                "b": convert_value(row.get(rel.end_column), key_type(rel.end_label)),
+            }
+        )
+    return {"props": props, "rels": rels}
+
+
+def _write_batch(tx, query: str, rows: list[dict]) -> None:
+    _ = tx.run(query, {"rows": rows})
+
+
+def load_source(driver, source: str, path: str) -> int:
+    """Create the nodes and relationships of a source in one pass, streaming
+    it in batches so memory stays bounded for any file size"""
+
+    query = _source_write_query(source)
+    written = 0
     with driver.session(database="neo4j") as session:
-        query = f"""
-        LOAD CSV WITH HEADERS
-        FROM '{FEES_CSV_PATH}' AS fees
-        MATCH (pd:PaymentsDue {{customer_id: fees.customer_id, mortgage_id: fees.mortgage_id}})
-        MATCH (f:Fees {{id: fees.fee_id}})
-        WHERE fees.status = 'Due' // Assuming fees are incurred when payment is due and status is 'Due'
-        MERGE (pd)-[:MAY_INCUR]->(f);
-        """
-        # NOTE: This query assumes `payments_due` nodes have `customer_id` and `mortgage_id` properties
-        # which they do based on the CSV. It also assumes `fees.csv` has these IDs for linking.
-        session.run(query, {})
+        for batch in iter_source_batches(path, ETL_BATCH_SIZE):
+            rows = [
+                params
+                for params in (_source_row_params(source, row) for row in batch)
+                if params is not None
+            ]
+            session.execute_write(_write_batch, query, rows)
+            written += len(rows)
+    return written
+
+
+@retry(tries=100, delay=10)
+def load_bank_graph_from_csv(csv_paths: dict[str, str] = CSV_PATHS) -> None:
+    """Load structured bank CSV data following
+    a specific ontology into Neo4j"""
+
+    driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USERNAME, NEO4J_PASSWORD))
+    # Add a step to clear the database before loading new data
+    clear_graph(driver)
+
+    set_uniqueness_constraints(driver)
+    set_range_indexes(driver)
+
+    for stage in SOURCE_STAGES:
+        for source in stage:
+            mapping = node_mapping_for(source)
+            rel_types = [r.type for r in relationship_mappings_for(source)]
+            LOGGER.info(
+                f"Loading {mapping.label} nodes"
+                + (f" with {', '.join(rel_types)} relationships" if rel_types else "")
+            )
+            written = load_source(driver, source, csv_paths[source])
+            LOGGER.info(f"Loaded {written} {mapping.label} rows")
+
+
+@retry(tries=100, delay=10)
+def prepare_bulk_imported_graph() -> None:
+    """Create constraints and indexes on a graph built with neo4j-admin import"""
+
+    driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USERNAME, NEO4J_PASSWORD))
+    set_uniqueness_constraints(driver)
+    set_range_indexes(driver)
+    driver.close()
 
 
 if __name__ == "__main__":
-    load_bank_graph_from_csv()
+    if ETL_MODE == "post_import":
+        prepare_bulk_imported_graph()
+    else:
+        load_bank_graph_from_csv()
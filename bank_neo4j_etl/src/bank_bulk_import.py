@@ -0,0 +1,411 @@
+import os
+import re
+import csv
+import time
+import shlex
+import logging
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Optional
+from bank_csv_mappings import (
+    CSV_PATHS,
+    NODE_MAPPINGS,
+    RELATIONSHIP_MAPPINGS,
+    SOURCE_STAGES,
+    NodeMapping,
+    convert_value,
+    key_type,
+    node_mapping_for,
+    relationship_mappings_for,
+    row_matches,
+    row_properties,
+)
+from bank_csv_sources import iter_source_rows, open_binary_source
+
+# Output directory for files in the neo4j-admin import header format
+BULK_IMPORT_DIR = os.getenv("BULK_IMPORT_DIR", "import")
+# Processes converting sources
+BULK_IMPORT_WORKERS = int(os.getenv("BULK_IMPORT_WORKERS", str(os.cpu_count() or 1)))
+# Local sources larger than this are split into parts converted by separate
+# processes, up to one per worker
+BULK_IMPORT_PART_BYTES = int(os.getenv("BULK_IMPORT_PART_BYTES", str(4 * 1024 * 1024)))
+# Fail instead of dropping relationships that reference unknown nodes
+BULK_IMPORT_STRICT = os.getenv("BULK_IMPORT_STRICT", "false").lower() == "true"
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s [%(levelname)s]: %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+)
+
+LOGGER = logging.getLogger(__name__)
+
+
+# Files of the parts after the first, which hold rows without a header
+PART_FILE_PATTERN = re.compile(r"_part\d+\.csv$")
+
+
+def _part_suffix(part: int) -> str:
+    return f"_part{part}" if part else ""
+
+
+def node_file_name(label: str, part: int = 0) -> str:
+    return f"nodes_{label}{_part_suffix(part)}.csv"
+
+
+def relationship_file_name(index: int, part: int = 0) -> str:
+    rel = RELATIONSHIP_MAPPINGS[index]
+    return (
+        f"rels_{index}_{rel.start_label}_{rel.type}_{rel.end_label}"
+        f"{_part_suffix(part)}.csv"
+    )
+
+
+def source_parts(path: str, workers: int, part_bytes: int) -> int:
+    """Parts to split a source into, from its size. Remote sources, whose
+    size isn't known up front, aren't split."""
+
+    if "://" in path and not path.startswith("file://"):
+        return 1
+    with open_binary_source(path) as f:
+        size = os.fstat(f.fileno()).st_size
+    return max(1, min(workers, -(-size // part_bytes)))
+
+
+# Importer types of the mapping's property types. The importer's float and
+# int are 32-bit, while the transactional loader writes doubles and longs.
+IMPORT_TYPES = {"float": "double", "int": "long"}
+
+
+def node_header(mapping: NodeMapping) -> list[str]:
+    """Importer header: an id column for the label's id space, then properties"""
+
+    return [f":ID({mapping.label})"] + [
+        f"{prop.name}:{IMPORT_TYPES.get(prop.type, prop.type)}"
+        for prop in mapping.properties
+    ]
+
+
+def _import_id(label: str, value: Any) -> Optional[str]:
+    value = convert_value(value, key_type(label))
+    return None if value is None else str(value)
+
+
+def _convert_source(
+    source: str,
+    path: str,
+    out_dir: str,
+    known_ids: dict[str, set[str]],
+    adjacency: dict[tuple[str, str], dict[str, list[str]]],
+    collect_ids: bool,
+    collect_adjacency: dict[tuple[str, str], dict[str, str]],
+    part: int = 0,
+    parts: int = 1,
+) -> dict[str, Any]:
+    """Convert one CSV source into its node and relationship files in one pass.
+
+    `collect_adjacency` maps relationships whose end nodes later sources
+    reach via their start node to the properties those end nodes must have.
+
+    With several `parts`, only every `parts`-th row from `part` on is
+    converted, into files of its own. Only the first part's files have a
+    header, as neo4j-admin reads the files of a label or type as one.
+    """
+
+    started = time.perf_counter()
+    node_mapping = node_mapping_for(source)
+    relationships = [
+        (i, r) for i, r in enumerate(RELATIONSHIP_MAPPINGS) if r.source == source
+    ]
+
+    files = []
+    node_writer = None
+    if node_mapping is not None:
+        f = open(
+            os.path.join(out_dir, node_file_name(node_mapping.label, part)),
+            "w",
+            newline="",
+        )
+        files.append(f)
+        node_writer = csv.writer(f)
+        if part == 0:
+            node_writer.writerow(node_header(node_mapping))
+
+    rel_writers = {}
+    for i, rel in relationships:
+        f = open(
+            os.path.join(out_dir, relationship_file_name(i, part)), "w", newline=""
+        )
+        files.append(f)
+        rel_writers[i] = csv.writer(f)
+        if part == 0:
+            rel_writers[i].writerow(
+                [f":START_ID({rel.start_label})", f":END_ID({rel.end_label})"]
+            )
+
+    produced_ids: set[str] = set()
+    produced_adjacency: dict[tuple[str, str], dict[str, list[str]]] = {
+        key: defaultdict(list) for key in collect_adjacency
+    }
+    counts = {"rows": 0, "nodes": 0, "relationships": 0, "invalid": 0}
+
+    def resolve(row: dict[str, Any], label: str, column: str) -> Optional[str]:
+        """Import id referenced by a column, or None if the node is unknown"""
+
+        value = _import_id(label, row.get(column))
+        if node_mapping is not None and label == node_mapping.label:
+            return value
+        if value is None or value not in known_ids.get(label, ()):
+            return None
+        return value
+
+    try:
+        for row_number, row in enumerate(iter_source_rows(path)):
+            if row_number % parts != part:
+                continue
+            counts["rows"] += 1
+            own_id = None
+            properties: dict[str, Any] = {}
+
+            if node_mapping is not None:
+                properties = row_properties(node_mapping, row)
+                if node_mapping.key is None:
+                    own_id = f"{source}-{row_number}"
+                elif properties.get(node_mapping.key) is not None:
+                    own_id = str(properties[node_mapping.key])
+                if own_id is None:
+                    counts["invalid"] += 1
+                    continue
+                node_writer.writerow(
+                    [own_id]
+                    + [
+                        "" if properties.get(p.name) is None else properties[p.name]
+                        for p in node_mapping.properties
+                    ]
+                )
+                counts["nodes"] += 1
+                if collect_ids:
+                    produced_ids.add(own_id)
+
+            for i, rel in relationships:
+                if not row_matches(rel, row):
+                    continue
+
+                end_id = resolve(row, rel.end_label, rel.end_column)
+                if rel.start_via is not None:
+                    via_id = resolve(row, rel.start_via[0], rel.start_column)
+                    start_ids = adjacency.get(rel.start_via, {}).get(via_id, [])
+                    valid = via_id is not None
+                else:
+                    start_id = resolve(row, rel.start_label, rel.start_column)
+                    start_ids = [] if start_id is None else [start_id]
+                    valid = start_id is not None
+
+                if end_id is None or not valid:
+                    counts["invalid"] += 1
+                    if BULK_IMPORT_STRICT:
+                        raise ValueError(
+                            f"{source} row {row_number + 2} references a missing "
+                            f"node for {rel.type} between {rel.start_label} "
+                            f"and {rel.end_label}"
+                        )
+                    continue
+
+                for start_id in start_ids:
+                    rel_writers[i].writerow([start_id, end_id])
+                    counts["relationships"] += 1
+
+                key = (rel.start_label, rel.type)
+                if key in produced_adjacency and start_ids:
+                    if all(
+                        properties.get(prop) == value
+                        for prop, value in collect_adjacency[key].items()
+                    ):
+                        produced_adjacency[key][start_ids[0]].append(end_id)
+    finally:
+        for f in files:
+            f.close()
+
+    return {
+        "source": source,
+        "label": node_mapping.label if node_mapping else None,
+        "ids": produced_ids,
+        "adjacency": {k: dict(v) for k, v in produced_adjacency.items()},
+        "counts": counts,
+        "seconds": time.perf_counter() - started,
+    }
+
+
+def _merge_parts(results: list[dict[str, Any]]) -> dict[str, Any]:
+    """Combine the results of converting each part of a source"""
+
+    adjacency: dict[tuple[str, str], dict[str, list[str]]] = {}
+    for result in results:
+        for key, ends_by_start in result["adjacency"].items():
+            merged = adjacency.setdefault(key, {})
+            for start_id, end_ids in ends_by_start.items():
+                merged.setdefault(start_id, []).extend(end_ids)
+
+    return {
+        "source": results[0]["source"],
+        "label": results[0]["label"],
+        "ids": set().union(*(result["ids"] for result in results)),
+        "adjacency": adjacency,
+        "counts": {
+            name: sum(result["counts"][name] for result in results)
+            for name in results[0]["counts"]
+        },
+        # Parts run at the same time, so the slowest one is the source's time
+        "seconds": max(result["seconds"] for result in results),
+    }
+
+
+def _part_files(out_dir: str, file_name: Callable[[int], str]) -> list[str]:
+    paths = []
+    while os.path.exists(path := os.path.join(out_dir, file_name(len(paths)))):
+        paths.append(path)
+    return paths
+
+
+def neo4j_admin_import_command(out_dir: str, database: str = "neo4j") -> str:
+    """Build the neo4j-admin command that imports the generated files"""
+
+    args = ["neo4j-admin", "database", "import", "full", database]
+    for mapping in NODE_MAPPINGS:
+        paths = _part_files(out_dir, lambda part: node_file_name(mapping.label, part))
+        if paths:
+            args.append(f"--nodes={mapping.label}={','.join(paths)}")
+    for i, rel in enumerate(RELATIONSHIP_MAPPINGS):
+        paths = _part_files(out_dir, lambda part: relationship_file_name(i, part))
+        if paths:
+            args.append(f"--relationships={rel.type}={','.join(paths)}")
+    args += ["--skip-duplicate-nodes=true", "--overwrite-destination=true"]
+    return shlex.join(args)
+
+
+def write_bulk_import_files(
+    csv_paths: dict[str, str] = CSV_PATHS,
+    out_dir: str = BULK_IMPORT_DIR,
+    workers: int = BULK_IMPORT_WORKERS,
+    stats: Optional[list[dict[str, Any]]] = None,
+    part_bytes: int = BULK_IMPORT_PART_BYTES,
+) -> str:
+    """Convert the bank CSVs into neo4j-admin import files.
+
+    Sources in a stage are converted in parallel. Sources larger than
+    `part_bytes` are split into parts, each converted by its own process.
+
+    Returns the command to run against a stopped database to import them.
+    Per-source counts and timings are appended to `stats` when given.
+    """
+
+    os.makedirs(out_dir, exist_ok=True)
+    # Parts of an earlier run would otherwise be imported along with these
+    for name in os.listdir(out_dir):
+        if PART_FILE_PATTERN.search(name):
+            os.remove(os.path.join(out_dir, name))
+
+    via_filters = {
+        rel.start_via: rel.start_where for rel in RELATIONSHIP_MAPPINGS if rel.start_via
+    }
+
+    known_ids: dict[str, set[str]] = {}
+    adjacency: dict[tuple[str, str], dict[str, list[str]]] = {}
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # Each stage validates foreign keys against the node ids produced
+        # by the stages before it
+        for stage_index, stage in enumerate(SOURCE_STAGES):
+            # Only ids that sources of later stages validate against are
+            # sent back, since large id sets are costly to pickle
+            referenced_labels = set()
+            for later_stage in SOURCE_STAGES[stage_index + 1 :]:
+                for later_source in later_stage:
+                    for rel in relationship_mappings_for(later_source):
+                        referenced_labels |= {rel.start_label, rel.end_label}
+                        if rel.start_via:
+                            referenced_labels.add(rel.start_via[0])
+
+            futures = []
+            for source in stage:
+                path = csv_paths.get(source)
+                if not path:
+                    LOGGER.warning(f"No path configured for {source}, skipping")
+                    continue
+
+                node_mapping = node_mapping_for(source)
+                relationships = relationship_mappings_for(source)
+
+                needed_labels = set()
+                for rel in relationships:
+                    needed_labels |= {rel.start_label, rel.end_label}
+                    if rel.start_via:
+                        needed_labels.add(rel.start_via[0])
+
+                parts = source_parts(path, workers, part_bytes)
+                LOGGER.info(f"Converting {source} for bulk import in {parts} parts")
+                futures.append(
+                    [
+                        executor.submit(
+                            _convert_source,
+                            source,
+                            path,
+                            out_dir,
+                            {
+                                label: known_ids[label]
+                                for label in needed_labels
+                                if label in known_ids
+                            },
+                            {
+                                rel.start_via: adjacency.get(rel.start_via, {})
+                                for rel in relationships
+                                if rel.start_via
+                            },
+                            node_mapping is not None
+                            and node_mapping.label in referenced_labels,
+                            {
+                                (rel.start_label, rel.type): via_filters[
+                                    (rel.start_label, rel.type)
+                                ]
+                                for rel in relationships
+                                if (rel.start_label, rel.type) in via_filters
+                            },
+                            part,
+                            parts,
+                        )
+                        for part in range(parts)
+                    ]
+                )
+
+            for part_futures in futures:
+                result = _merge_parts([future.result() for future in part_futures])
+                if result["label"] and result["ids"]:
+                    known_ids[result["label"]] = result["ids"]
+                adjacency.update(result["adjacency"])
+
+                counts = result["counts"]
+                if stats is not None:
+                    stats.append(
+                        {
+                            "source": result["source"],
+                            "seconds": result["seconds"],
+                            **counts,
+                        }
+                    )
+                LOGGER.info(
+                    f"{result['source']}: {counts['rows']} rows, "
+                    f"{counts['nodes']} nodes, {counts['relationships']} "
+                    f"relationships, {counts['invalid']} invalid rows dropped"
+                )
+
+    command = neo4j_admin_import_command(out_dir)
+    with open(os.path.join(out_dir, "import.sh"), "w") as f:
+        f.write(f"#!/bin/bash\n{command}\n")
+
+    return command
+
+
+if __name__ == "__main__":
+    command = write_bulk_import_files()
+    LOGGER.info("Bulk import files written. Import them with:")
+    LOGGER.info(command)
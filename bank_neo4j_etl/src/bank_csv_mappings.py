@@ -0,0 +1,284 @@
+import os
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from functools import lru_cache
+from typing import Any, Optional
+
+# Formats tried, in order, when parsing date columns
+DATE_FORMATS = ["%Y-%m-%d", "%m/%d/%Y", "%d-%m-%Y"]
+
+# Property types written as native values and covered by range indexes
+RANGE_INDEXED_TYPES = ("int", "float", "date")
+
+# Paths to files containing bank data, keyed by source name. Plain, gzip
+# (.gz) or zstd (.zst) compressed CSV, or Parquet (.parquet) files.
+CSV_PATHS = {
+    "branches": os.getenv("BRANCHES_CSV_PATH"),
+    "customers": os.getenv("CUSTOMER_CSV_PATH"),
+    "mortgages": os.getenv("MORTGAGE_CSV_PATH"),
+    "payments": os.getenv("PAYMENTS_MADE_CSV_PATH"),
+    "payments_due": os.getenv("PAYMENTS_DUE_CSV_PATH"),
+    "fees": os.getenv("FEES_CSV_PATH"),
+    "faqs": os.getenv("FAQS_CSV_PATH"),
+    "questions": os.getenv("EXAMPLE_CYPHER_CSV_PATH"),
+}
+
+
+@dataclass(frozen=True)
+class PropertyMapping:
+    """A node property built from one or more CSV columns.
+
+    Several columns are joined with a space, e.g. a full name. `type` is one
+    of "string", "int", "float" or "date".
+    """
+
+    name: str
+    columns: tuple[str, ...]
+    type: str = "string"
+
+
+@dataclass(frozen=True)
+class NodeMapping:
+    """How rows of a CSV source become nodes with a given label"""
+
+    label: str
+    source: str
+    properties: tuple[PropertyMapping, ...]
+    key: Optional[str] = "id"
+    """Property used to MERGE nodes. When None, all properties are used."""
+
+
+@dataclass(frozen=True)
+class RelationshipMapping:
+    """How rows of a CSV source become relationships between nodes.
+
+    `start_via` reaches the start nodes through another relationship, e.g.
+    ("Mortgage", "SCHEDULE") links the PaymentsDue scheduled for the
+    mortgage in `start_column` rather than a single node. `start_where`
+    keeps only the start nodes with these property values. `where` keeps
+    only the CSV rows with these column values.
+    """
+
+    type: str
+    source: str
+    start_label: str
+    start_column: str
+    end_label: str
+    end_column: str
+    start_via: Optional[tuple[str, str]] = None
+    where: dict[str, str] = field(default_factory=dict)
+    start_where: dict[str, str] = field(default_factory=dict)
+
+
+def _prop(name: str, *columns: str, type: str = "string") -> PropertyMapping:
+    return PropertyMapping(name, columns or (name,), type)
+
+
+NODE_MAPPINGS = [
+    NodeMapping(
+        "Branch",
+        "branches",
+        (
+            _prop("id", "branch_id", type="int"),
+            _prop("name", "branch_name"),
+            _prop("state_name", "branch_state"),
+        ),
+    ),
+    NodeMapping(
+        "Customer",
+        "customers",
+        (
+            _prop("id", "customer_id"),
+            _prop("first_name"),
+            _prop("last_name"),
+            _prop("name", "first_name", "last_name"),
+            _prop("email"),
+            _prop("phone_number"),
+            _prop("address"),
+            _prop("city"),
+            _prop("state"),
+            _prop("zip_code"),
+            _prop("country"),
+        ),
+    ),
+    NodeMapping(
+        "Mortgage",
+        "mortgages",
+        (
+            _prop("id", "loan_number"),
+            _prop("amount", "loan_amount", type="float"),
+            _prop("interest", "interest_rate", type="float"),
+            _prop("start", "start_date", type="date"),
+            _prop("status"),
+            _prop("tenure", type="int"),
+        ),
+    ),
+    NodeMapping(
+        "Payments",
+        "payments",
+        (
+            _prop("id", "payment_made_id"),
+            _prop("amount", type="float"),
+            _prop("payment_date", type="date"),
+        ),
+    ),
+    NodeMapping(
+        "PaymentsDue",
+        "payments_due",
+        (
+            _prop("id", "payment_due_id"),
+            _prop("amount", type="float"),
+            _prop("due_date", type="date"),
+            _prop("status"),
+        ),
+    ),
+    NodeMapping(
+        "Fees",
+        "fees",
+        (
+            _prop("id", "fee_id"),
+            _prop("type", "fee_type"),
+            _prop("amount", type="float"),
+            _prop("date_incurred", type="date"),
+            _prop("status"),
+        ),
+    ),
+    NodeMapping(
+        "FAQs",
+        "faqs",
+        (
+            _prop("id", "faq_id"),
+            _prop("question"),
+            _prop("answer"),
+            _prop("topics", "related_topics"),
+        ),
+    ),
+    NodeMapping(
+        "Question",
+        "questions",
+        (
+            _prop("question"),
+            _prop("cypher"),
+        ),
+        key=None,
+    ),
+]
+
+RELATIONSHIP_MAPPINGS = [
+    RelationshipMapping(
+        "HAS", "mortgages", "Customer", "customer_id", "Mortgage", "loan_number"
+    ),
+    RelationshipMapping(
+        "MADE", "payments", "Customer", "customer_id", "Payments", "payment_made_id"
+    ),
+    RelationshipMapping(
+        "SCHEDULE",
+        "payments_due",
+        "Mortgage",
+        "mortgage_id",
+        "PaymentsDue",
+        "payment_due_id",
+    ),
+    RelationshipMapping("HAS", "fees", "Mortgage", "mortgage_id", "Fees", "fee_id"),
+    # Fees still due may be incurred by any payment still due on the mortgage
+    RelationshipMapping(
+        "MAY_INCUR",
+        "fees",
+        "PaymentsDue",
+        "mortgage_id",
+        "Fees",
+        "fee_id",
+        start_via=("Mortgage", "SCHEDULE"),
+        where={"status": "Due"},
+        start_where={"status": "Due"},
+    ),
+]
+
+NODE_MAPPINGS_BY_LABEL = {m.label: m for m in NODE_MAPPINGS}
+
+# Sources in load order. Relationships of a source only reference nodes
+# created by earlier stages, so sources within a stage are independent.
+SOURCE_STAGES = [
+    ["branches", "customers", "faqs", "questions"],
+    ["mortgages"],
+    ["payments", "payments_due"],
+    ["fees"],
+]
+
+
+def node_mapping_for(source: str) -> Optional[NodeMapping]:
+    return next((m for m in NODE_MAPPINGS if m.source == source), None)
+
+
+def relationship_mappings_for(source: str) -> list[RelationshipMapping]:
+    return [r for r in RELATIONSHIP_MAPPINGS if r.source == source]
+
+
+def parse_date(value: Any) -> date:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    value = str(value).strip()
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(value[:10], date_format).date()
+        except ValueError:
+            continue
+    raise ValueError(f"Unrecognized date: {value!r}")
+
+
+def convert_value(value: Any, type: str) -> Any:
+    """Convert a raw CSV value to the native type of its property"""
+
+    if value is None or value == "":
+        return None
+    if type == "int":
+        return int(float(value))
+    if type == "float":
+        return float(value)
+    if type == "date":
+        return parse_date(value)
+    return value if isinstance(value, str) else str(value)
+
+
+def row_properties(mapping: NodeMapping, row: dict[str, Any]) -> dict[str, Any]:
+    """Build the node properties for a CSV row"""
+
+    properties = {}
+    for prop in mapping.properties:
+        values = [row.get(column) for column in prop.columns]
+        if len(values) > 1:
+            if any(v is None for v in values):
+                continue
+            value = " ".join(str(v) for v in values)
+        else:
+            value = values[0]
+        properties[prop.name] = convert_value(value, prop.type)
+    return properties
+
+
+@lru_cache(maxsize=None)
+def key_type(label: str) -> str:
+    """Type of the key property of a label"""
+
+    mapping = NODE_MAPPINGS_BY_LABEL[label]
+    for prop in mapping.properties:
+        if prop.name == mapping.key:
+            return prop.type
+    return "string"
+
+
+def row_matches(relationship: RelationshipMapping, row: dict[str, Any]) -> bool:
+    return all(row.get(k) == v for k, v in relationship.where.items())
+
+
+def range_indexed_properties() -> list[tuple[str, str]]:
+    """(label, property) pairs that get a range index"""
+
+    return [
+        (mapping.label, prop.name)
+        for mapping in NODE_MAPPINGS
+        for prop in mapping.properties
+        if prop.type in RANGE_INDEXED_TYPES and prop.name != mapping.key
+    ]
@@ -0,0 +1,110 @@
+import io
+import csv
+import gzip
+from contextlib import contextmanager
+from itertools import islice
+from typing import Any, BinaryIO, Iterator
+from urllib.parse import urlparse
+from urllib.request import urlopen
+
+# Suffixes of compressed CSV sources, which are decompressed while streaming
+GZIP_SUFFIXES = (".gz", ".gzip")
+ZSTD_SUFFIXES = (".zst", ".zstd")
+PARQUET_SUFFIXES = (".parquet", ".pq")
+
+
+def _suffix_of(path: str) -> str:
+    return urlparse(path).path.lower() if "://" in path else path.lower()
+
+
+def is_parquet(path: str) -> bool:
+    return _suffix_of(path).endswith(PARQUET_SUFFIXES)
+
+
+def _local_path(path: str) -> str:
+    return path[len("file://") :] if urlparse(path).scheme == "file" else path
+
+
+@contextmanager
+def open_binary_source(path: str) -> Iterator[BinaryIO]:
+    """Open a local path or an http(s)/file URL as a binary stream"""
+
+    if urlparse(path).scheme in ("http", "https"):
+        with urlopen(path) as response:
+            yield response
+    else:
+        with open(_local_path(path), "rb") as f:
+            yield f
+
+
+@contextmanager
+def open_text_source(path: str) -> Iterator[io.TextIOBase]:
+    """Open a local path or an http(s)/file URL as a text stream,
+    decompressing gzip and zstd files on the fly"""
+
+    suffix = _suffix_of(path)
+    with open_binary_source(path) as raw:
+        if suffix.endswith(GZIP_SUFFIXES):
+            stream = gzip.GzipFile(fileobj=raw, mode="rb")
+        elif suffix.endswith(ZSTD_SUFFIXES):
+            try:
+                import zstandard
+            except ImportError:
+                raise ImportError(
+                    f"Reading {path} needs zstandard: pip install '.[zstd]'"
+                ) from None
+            stream = zstandard.ZstdDecompressor().stream_reader(raw)
+        else:
+            stream = raw
+        with io.TextIOWrapper(stream, encoding="utf-8", newline="") as f:
+            yield f
+
+
+def iter_parquet_batches(path: str, batch_size: int) -> Iterator[list[dict[str, Any]]]:
+    """Stream a local Parquet file in record batches of at most
+    `batch_size` rows, reading one row group at a time"""
+
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError(
+            f"Reading {path} needs pyarrow: pip install '.[parquet]'"
+        ) from None
+    if urlparse(path).scheme in ("http", "https"):
+        raise ValueError(f"Parquet sources must be local files, got {path}")
+
+    with pq.ParquetFile(_local_path(path)) as parquet_file:
+        for batch in parquet_file.iter_batches(batch_size=batch_size):
+            yield batch.to_pylist()
+
+
+def iter_csv_rows(path: str) -> Iterator[dict[str, Any]]:
+    """Stream the rows of a CSV file with a header as dictionaries"""
+
+    with open_text_source(path) as f:
+        yield from csv.DictReader(f)
+
+
+def iter_csv_batches(path: str, batch_size: int) -> Iterator[list[dict[str, Any]]]:
+    """Stream the rows of a CSV file in lists of at most `batch_size` rows"""
+
+    rows = iter_csv_rows(path)
+    while batch := list(islice(rows, batch_size)):
+        yield batch
+
+
+def iter_source_batches(path: str, batch_size: int) -> Iterator[list[dict[str, Any]]]:
+    """Stream the rows of a CSV, compressed CSV or Parquet source in lists
+    of at most `batch_size` rows. Parquet values keep their native types."""
+
+    if is_parquet(path):
+        yield from iter_parquet_batches(path, batch_size)
+    else:
+        yield from iter_csv_batches(path, batch_size)
+
+
+def iter_source_rows(path: str, batch_size: int = 10_000) -> Iterator[dict[str, Any]]:
+    """Stream the rows of a CSV, compressed CSV or Parquet source"""
+
+    for batch in iter_source_batches(path, batch_size):
+        yield from batch
@@ -0,0 +1,309 @@
+import os
+import hashlib
+import logging
+import sqlite3
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from typing import Protocol
+from retry import retry
+from neo4j import GraphDatabase
+
+# Neo4j config
+NEO4J_URI = os.getenv("NEO4J_URI")
+NEO4J_USERNAME = os.getenv("NEO4J_USERNAME")
+NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD")
+
+# Embedding config. The model must match the one used by the chatbot API
+# to embed incoming questions.
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-ada-002")
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "embedding_cache.sqlite3")
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "512"))
+EMBEDDING_MAX_CONCURRENCY = int(os.getenv("EMBEDDING_MAX_CONCURRENCY", "4"))
+EMBEDDING_WRITE_BATCH_SIZE = int(os.getenv("EMBEDDING_WRITE_BATCH_SIZE", "1000"))
+
+NEO4J_CYPHER_EXAMPLES_INDEX_NAME = os.getenv(
+    "NEO4J_CYPHER_EXAMPLES_INDEX_NAME", "questions"
+)
+NEO4J_CYPHER_EXAMPLES_NODE_NAME = os.getenv(
+    "NEO4J_CYPHER_EXAMPLES_NODE_NAME", "Question"
+)
+NEO4J_CYPHER_EXAMPLES_TEXT_NODE_PROPERTY = os.getenv(
+    "NEO4J_CYPHER_EXAMPLES_TEXT_NODE_PROPERTY", "question"
+)
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s [%(levelname)s]: %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+)
+
+LOGGER = logging.getLogger(__name__)
+
+# Vector indexes read by the chatbot API. The text properties must match
+# the ones the API uses to build its retrieval query.
+EMBEDDING_TARGETS = [
+    {
+        "index_name": "faqs",
+        "label": "FAQs",
+        "text_properties": ["question", "answer", "related_topics"],
+    },
+    {
+        "index_name": NEO4J_CYPHER_EXAMPLES_INDEX_NAME,
+        "label": NEO4J_CYPHER_EXAMPLES_NODE_NAME,
+        "text_properties": [NEO4J_CYPHER_EXAMPLES_TEXT_NODE_PROPERTY],
+    },
+]
+
+
+class Embedder(Protocol):
+    """Anything that can turn a batch of texts into vectors"""
+
+    model_name: str
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]: ...
+
+
+class OpenAIEmbedder:
+    """Embed texts with the OpenAI embeddings endpoint"""
+
+    def __init__(self, model_name: str = EMBEDDING_MODEL):
+        from openai import OpenAI
+
+        self.model_name = model_name
+        self._client = OpenAI()
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        response = self._client.embeddings.create(model=self.model_name, input=texts)
+        return [d.embedding for d in sorted(response.data, key=lambda d: d.index)]
+
+
+class HashEmbedder:
+    """Deterministic local embedder for tests and offline runs.
+
+    Vectors are derived from a SHA-256 digest of the text, so the same
+    text always maps to the same unit vector.
+    """
+
+    def __init__(self, dimensions: int = 64):
+        self.model_name = f"hash-{dimensions}"
+        self.dimensions = dimensions
+
+    def _embed(self, text: str) -> list[float]:
+        values: list[float] = []
+        counter = 0
+        while len(values) < self.dimensions:
+            digest = hashlib.sha256(f"{counter}:{text}".encode()).digest()
+            values.extend((b - 127.5) / 127.5 for b in digest)
+            counter += 1
+        values = values[: self.dimensions]
+        norm = sum(v * v for v in values) ** 0.5 or 1.0
+        return [v / norm for v in values]
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return [self._embed(text) for text in texts]
+
+
+class EmbeddingCache:
+    """Local SQLite store of vectors keyed by a hash of model and text"""
+
+    def __init__(self, path: str = EMBEDDING_CACHE_PATH):
+        self._conn = sqlite3.connect(path)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB)"
+        )
+
+    @staticmethod
+    def content_hash(model_name: str, text: str) -> str:
+        return hashlib.sha256(f"{model_name}\x00{text}".encode()).hexdigest()
+
+    def get_many(self, keys: list[str]) -> dict[str, list[float]]:
+        found = {}
+        for start in range(0, len(keys), 500):
+            chunk = keys[start : start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self._conn.execute(
+                f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})",
+                chunk,
+            )
+            for key, blob in rows:
+                found[key] = array("f", blob).tolist()
+        return found
+
+    def put_many(self, items: dict[str, list[float]]) -> None:
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+            [(k, array("f", v).tobytes()) for k, v in items.items()],
+        )
+        self._conn.commit()
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+def node_embedding_text(properties: dict, text_properties: list[str]) -> str:
+    """Build the text that gets embedded for a node.
+
+    Mirrors the format `Neo4jVector.from_existing_graph` embeds, so vectors
+    written here are interchangeable with the ones it would have created.
+    """
+
+    return "".join(
+        f"\n{k}:{'' if properties.get(k) is None else properties[k]}"
+        for k in text_properties
+    )
+
+
+def embed_texts(
+    texts: list[str],
+    embedder: Embedder,
+    cache: EmbeddingCache,
+    batch_size: int = EMBEDDING_BATCH_SIZE,
+    max_concurrency: int = EMBEDDING_MAX_CONCURRENCY,
+) -> list[list[float]]:
+    """Embed texts, only calling the embedder for texts missing from the cache"""
+
+    keys = [cache.content_hash(embedder.model_name, text) for text in texts]
+    vectors = cache.get_many(list(set(keys)))
+
+    missing = {}
+    for key, text in zip(keys, texts):
+        if key not in vectors:
+            missing[key] = text
+    LOGGER.info(f"{len(texts)} texts to embed, {len(missing)} missing from cache")
+
+    missing_keys = list(missing)
+    batches = [
+        missing_keys[start : start + batch_size]
+        for start in range(0, len(missing_keys), batch_size)
+    ]
+
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        results = executor.map(
+            lambda batch: embedder.embed_documents([missing[k] for k in batch]),
+            batches,
+        )
+        for batch, batch_vectors in zip(batches, results):
+            new_vectors = dict(zip(batch, batch_vectors))
+            cache.put_many(new_vectors)
+            vectors.update(new_vectors)
+
+    return [vectors[key] for key in keys]
+
+
+def _fetch_text_nodes(tx, label: str, text_properties: list[str]) -> list[dict]:
+    query = f"""
+    MATCH (n:`{label}`)
+    WHERE any(k IN $props WHERE n[k] IS NOT NULL)
+    RETURN elementId(n) AS id, [k IN $props | n[k]] AS values
+    """
+    result = tx.run(query, {"props": text_properties})
+    return [
+        {
+            "id": record["id"],
+            "text": node_embedding_text(
+                dict(zip(text_properties, record["values"])), text_properties
+            ),
+        }
+        for record in result
+    ]
+
+
+def _write_embeddings(tx, rows: list[dict]) -> None:
+    query = """
+    UNWIND $rows AS row
+    MATCH (n) WHERE elementId(n) = row.id
+    CALL db.create.setNodeVectorProperty(n, 'embedding', row.embedding)
+    """
+    tx.run(query, {"rows": rows})
+
+
+def _create_vector_index(tx, index_name: str, label: str, dimensions: int) -> None:
+    query = f"""
+    CREATE VECTOR INDEX `{index_name}` IF NOT EXISTS
+    FOR (n:`{label}`) ON (n.embedding)
+    OPTIONS {{indexConfig: {{
+        `vector.dimensions`: {int(dimensions)},
+        `vector.similarity_function`: 'cosine'
+    }}}}
+    """
+    tx.run(query, {})
+
+
+def _record_data_generation(tx, index_name: str, content_hash: str) -> None:
+    query = """
+    MERGE (g:DataGeneration {index_name: $index_name})
+    SET g.content_hash = $content_hash, g.updated_at = datetime()
+    """
+    tx.run(query, {"index_name": index_name, "content_hash": content_hash})
+
+
+def data_generation_hash(texts: list[str]) -> str:
+    """Hash of the embedded texts, independent of node order.
+
+    The chatbot API drops answers cached from an index when its hash changes.
+    """
+
+    digest = hashlib.sha256()
+    for text in sorted(texts):
+        digest.update(text.encode())
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+def embed_text_nodes(driver, embedder: Embedder, cache: EmbeddingCache) -> None:
+    """Embed every text node target, write the vectors and create the indexes"""
+
+    for target in EMBEDDING_TARGETS:
+        label = target["label"]
+
+        LOGGER.info(f"Embedding {label} nodes")
+        with driver.session(database="neo4j") as session:
+            nodes = session.execute_read(
+                _fetch_text_nodes, label, target["text_properties"]
+            )
+
+        if not nodes:
+            LOGGER.info(f"No {label} nodes to embed")
+            continue
+
+        vectors = embed_texts([node["text"] for node in nodes], embedder, cache)
+
+        LOGGER.info(f"Writing {len(nodes)} {label} embeddings")
+        with driver.session(database="neo4j") as session:
+            for start in range(0, len(nodes), EMBEDDING_WRITE_BATCH_SIZE):
+                rows = [
+                    {"id": node["id"], "embedding": vector}
+                    for node, vector in zip(
+                        nodes[start : start + EMBEDDING_WRITE_BATCH_SIZE],
+                        vectors[start : start + EMBEDDING_WRITE_BATCH_SIZE],
+                    )
+                ]
+                session.execute_write(_write_embeddings, rows)
+
+            LOGGER.info(f"Creating vector index {target['index_name']}")
+            session.execute_write(
+                _create_vector_index, target["index_name"], label, len(vectors[0])
+            )
+            session.execute_write(
+                _record_data_generation,
+                target["index_name"],
+                data_generation_hash([node["text"] for node in nodes]),
+            )
+
+
+@retry(tries=100, delay=10)
+def run_embedding_stage(embedder: Embedder | None = None) -> None:
+    """Embed FAQ and example question nodes ahead of API startup"""
+
+    embedder = embedder or OpenAIEmbedder()
+    cache = EmbeddingCache()
+    driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USERNAME, NEO4J_PASSWORD))
+    try:
+        embed_text_nodes(driver, embedder, cache)
+    finally:
+        cache.close()
+        driver.close()
+
+
+if __name__ == "__main__":
+    run_embedding_stage()
@@ -0,0 +1,268 @@
+import os
+import sys
+import csv
+import json
+import time
+import logging
+import platform
+import argparse
+import resource
+import subprocess
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Iterator, Optional
+from neo4j import GraphDatabase
+import bank_bulk_csv_write as loader
+from bank_bulk_import import write_bulk_import_files
+from bank_csv_mappings import SOURCE_STAGES
+from bank_csv_sources import open_text_source
+from bank_embeddings import EmbeddingCache, HashEmbedder, embed_text_nodes
+from bank_summaries import refresh_summaries
+from bank_synthetic_data import generate_bank_csvs
+
+ETL_MODES = ["transactional", "bulk_import"]
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s [%(levelname)s]: %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+)
+
+LOGGER = logging.getLogger(__name__)
+
+
+def _count_rows(path: str) -> int:
+    """Rows of a CSV with a header, counting quoted line breaks as part of
+    their row"""
+
+    with open_text_source(path) as f:
+        return max(sum(1 for row in csv.reader(f) if row) - 1, 0)
+
+
+def _peak_rss_mb() -> float:
+    """High-water resident memory of this process and its finished children,
+    over their whole lifetime, so it can't be attributed to a single stage"""
+
+    # ru_maxrss is reported in kilobytes on Linux and bytes on macOS
+    unit = 1024 * 1024 if sys.platform == "darwin" else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return max(own, children) / unit
+
+
+class StageRecorder:
+    """Record rows/second and peak Python heap for each ETL stage.
+
+    Heap peaks are only recorded with `trace_memory`, since tracing slows
+    the stages down. They only cover this process, so stages timed in
+    worker processes are recorded without one.
+    """
+
+    def __init__(self, trace_memory: bool = False):
+        self.trace_memory = trace_memory
+        self.stages: dict[str, dict[str, Any]] = {}
+
+    @contextmanager
+    def stage(self, name: str, rows: int) -> Iterator[None]:
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+        started = time.perf_counter()
+        yield
+        peak_traced_mb = None
+        if self.trace_memory:
+            peak_traced_mb = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+        self.record(name, rows, time.perf_counter() - started, peak_traced_mb)
+
+    def record(
+        self,
+        name: str,
+        rows: int,
+        seconds: float,
+        peak_traced_mb: Optional[float] = None,
+    ) -> None:
+        result = {
+            "rows": rows,
+            "seconds": round(seconds, 4),
+            "rows_per_second": round(rows / seconds, 2) if seconds > 0 else None,
+        }
+        if peak_traced_mb is not None:
+            result["peak_traced_mb"] = round(peak_traced_mb, 1)
+        self.stages[name] = result
+        LOGGER.info(f"{name}: {result}")
+
+
+def run_transactional(
+    paths: dict[str, str], recorder: StageRecorder, cache_path: str, neo4j_uri: str
+):
+    """Clear the graph at `neo4j_uri` and load the CSVs into it, one stage
+    per source"""
+
+    driver = GraphDatabase.driver(
+        neo4j_uri, auth=(loader.NEO4J_USERNAME, loader.NEO4J_PASSWORD)
+    )
+    try:
+        loader.clear_graph(driver)
+        loader.set_uniqueness_constraints(driver)
+        loader.set_range_indexes(driver)
+
+        for stage in SOURCE_STAGES:
+            for source in stage:
+                with recorder.stage(f"load_{source}", _count_rows(paths[source])):
+                    loader.load_source(driver, source, paths[source])
+
+        with recorder.stage("summaries", _count_rows(paths["customers"])):
+            refresh_summaries(driver)
+
+        # A deterministic embedder measures the ETL itself, not the provider.
+        # 1536 dimensions match the vector indexes the API expects.
+        cache = EmbeddingCache(cache_path)
+        embedded_rows = _count_rows(paths["faqs"]) + _count_rows(paths["questions"])
+        with recorder.stage("embeddings", embedded_rows):
+            embed_text_nodes(driver, HashEmbedder(1536), cache)
+        cache.close()
+    finally:
+        driver.close()
+
+
+def run_bulk_import(
+    paths: dict[str, str],
+    recorder: StageRecorder,
+    out_dir: str,
+    neo4j_admin: Optional[str],
+):
+    """Write bulk import files and optionally run neo4j-admin on them"""
+
+    stats: list[dict[str, Any]] = []
+    total_rows = sum(_count_rows(path) for path in paths.values())
+    with recorder.stage("convert_total", total_rows):
+        command = write_bulk_import_files(paths, out_dir, stats=stats)
+    for source_stats in stats:
+        recorder.record(
+            f"convert_{source_stats['source']}",
+            source_stats["rows"],
+            source_stats["seconds"],
+        )
+
+    if neo4j_admin:
+        command = command.replace("neo4j-admin", neo4j_admin, 1)
+        with recorder.stage("neo4j_admin_import", total_rows):
+            subprocess.run(command, shell=True, check=True)
+
+
+def find_regressions(
+    results: dict[str, Any], baseline: dict[str, Any], tolerance: float
+) -> list[str]:
+    """Stages whose throughput dropped more than `tolerance` below the baseline"""
+
+    regressions = []
+    for mode, mode_results in results["modes"].items():
+        baseline_stages = baseline.get("modes", {}).get(mode, {}).get("stages", {})
+        for name, stage in mode_results["stages"].items():
+            expected = baseline_stages.get(name, {}).get("rows_per_second")
+            actual = stage["rows_per_second"]
+            if expected and actual is not None and actual < expected * (1 - tolerance):
+                regressions.append(
+                    f"{mode}/{name}: {actual} rows/s vs baseline {expected} rows/s"
+                )
+    return regressions
+
+
+def run_benchmark(
+    customers: int,
+    seed: int,
+    modes: list[str],
+    work_dir: str,
+    trace_memory: bool = False,
+    neo4j_admin: Optional[str] = None,
+    neo4j_uri: Optional[str] = None,
+) -> dict[str, Any]:
+    if "transactional" in modes and not neo4j_uri:
+        raise ValueError("The transactional mode needs the URI of a graph to clear")
+
+    LOGGER.info(f"Generating synthetic data for {customers} customers")
+    paths = generate_bank_csvs(os.path.join(work_dir, "csv"), customers, seed)
+
+    if trace_memory:
+        tracemalloc.start()
+
+    results = {
+        "run_at": datetime.now(timezone.utc).isoformat(),
+        "host": platform.node(),
+        "python": platform.python_version(),
+        "customers": customers,
+        "seed": seed,
+        "modes": {},
+    }
+    for mode in modes:
+        LOGGER.info(f"Benchmarking {mode} ETL")
+        recorder = StageRecorder(trace_memory)
+        started = time.perf_counter()
+        if mode == "transactional":
+            run_transactional(
+                paths, recorder, os.path.join(work_dir, "embeddings.sqlite3"), neo4j_uri
+            )
+        else:
+            run_bulk_import(
+                paths, recorder, os.path.join(work_dir, "import"), neo4j_admin
+            )
+        results["modes"][mode] = {
+            "total_seconds": round(time.perf_counter() - started, 4),
+            "stages": recorder.stages,
+        }
+
+    if trace_memory:
+        tracemalloc.stop()
+    results["peak_rss_mb"] = round(_peak_rss_mb(), 1)
+
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the bank ETL modes")
+    parser.add_argument("--customers", type=int, default=10_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--modes", nargs="+", choices=ETL_MODES, default=ETL_MODES)
+    parser.add_argument("--work-dir", default="etl_benchmark")
+    parser.add_argument("--output", default="etl_benchmark_results.json")
+    parser.add_argument("--baseline", help="Results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument(
+        "--trace-memory",
+        action="store_true",
+        help="Record per-stage Python heap peaks, which slows the run",
+    )
+    parser.add_argument(
+        "--neo4j-uri",
+        help="Neo4j to load in the transactional mode. Its graph is deleted first.",
+    )
+    parser.add_argument(
+        "--neo4j-admin",
+        help="Path to neo4j-admin to also time the import of the bulk files",
+    )
+    args = parser.parse_args()
+    if "transactional" in args.modes and not args.neo4j_uri:
+        parser.error(
+            "the transactional mode deletes the graph it loads into, pass "
+            "--neo4j-uri explicitly or use --modes bulk_import"
+        )
+
+    results = run_benchmark(
+        args.customers,
+        args.seed,
+        args.modes,
+        args.work_dir,
+        args.trace_memory,
+        args.neo4j_admin,
+        args.neo4j_uri,
+    )
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    LOGGER.info(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = find_regressions(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            LOGGER.error(f"Throughput regression: {regression}")
+        sys.exit(1 if regressions else 0)
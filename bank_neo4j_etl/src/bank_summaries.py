@@ -0,0 +1,300 @@
+import os
+import re
+import json
+import hashlib
+import logging
+import argparse
+from datetime import date
+from typing import Any, Optional
+from retry import retry
+from neo4j import GraphDatabase
+
+# Neo4j config
+NEO4J_URI = os.getenv("NEO4J_URI")
+NEO4J_USERNAME = os.getenv("NEO4J_USERNAME")
+NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD")
+
+# Customers summarized per read and write transaction
+SUMMARY_BATCH_SIZE = int(os.getenv("SUMMARY_BATCH_SIZE", "1000"))
+
+# Summary properties filtered on by range, e.g. customers with overdue payments
+SUMMARY_RANGE_INDEXES = [
+    ("Customer", "outstanding_due"),
+    ("Customer", "overdue_amount"),
+    ("Customer", "next_due_date"),
+    ("Customer", "total_fees"),
+    ("Mortgage", "outstanding_due"),
+    ("Mortgage", "next_due_date"),
+]
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s [%(levelname)s]: %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+)
+
+LOGGER = logging.getLogger(__name__)
+
+
+def fee_property(fee_type: str) -> str:
+    """Property holding the total of a fee type, e.g. fees_late_fee"""
+
+    return "fees_" + re.sub(r"[^a-z0-9]+", "_", fee_type.lower()).strip("_")
+
+
+def _set_range_index(tx, node: str, prop: str) -> None:
+    query = f"""CREATE INDEX {node.lower()}_{prop} IF NOT EXISTS
+        FOR (n:{node}) ON (n.{prop});"""
+    tx.run(query, {})
+
+
+def _fetch_fee_types(tx) -> list[str]:
+    result = tx.run("MATCH (f:Fees) WHERE f.type IS NOT NULL RETURN DISTINCT f.type")
+    return sorted(record[0] for record in result)
+
+
+def _fetch_customer_ids(tx) -> list[str]:
+    return [record[0] for record in tx.run("MATCH (c:Customer) RETURN c.id")]
+
+
+def _fetch_customer_activity(tx, ids: list[str]) -> list[dict[str, Any]]:
+    """Payments, mortgages, payments due and fees of a batch of customers,
+    with the summary hashes written last time"""
+
+    query = """
+    UNWIND $ids AS id
+    MATCH (c:Customer {id: id})
+    CALL {
+        WITH c
+        OPTIONAL MATCH (c)-[:MADE]->(p:Payments)
+        RETURN sum(p.amount) AS total_paid, count(p) AS payments_made,
+            max(p.payment_date) AS last_payment_date
+    }
+    CALL {
+        WITH c
+        MATCH (c)-[:HAS]->(m:Mortgage)
+        CALL {
+            WITH m
+            OPTIONAL MATCH (m)-[:SCHEDULE]->(d:PaymentsDue)
+            RETURN collect({amount: d.amount, due_date: d.due_date,
+                status: d.status}) AS dues
+        }
+        CALL {
+            WITH m
+            OPTIONAL MATCH (m)-[:HAS]->(f:Fees)
+            RETURN collect({type: f.type, amount: f.amount,
+                status: f.status}) AS fees
+        }
+        RETURN collect({id: m.id, amount: m.amount, dues: dues, fees: fees,
+            summary_hash: m.summary_hash,
+            fee_keys: [k IN keys(m) WHERE k STARTS WITH 'fees_']}) AS mortgages
+    }
+    RETURN c.id AS id, total_paid, payments_made, last_payment_date, mortgages,
+        c.summary_hash AS summary_hash,
+        [k IN keys(c) WHERE k STARTS WITH 'fees_'] AS fee_keys
+    """
+    return [record.data() for record in tx.run(query, {"ids": ids})]
+
+
+def _write_summaries(tx, label: str, rows: list[dict]) -> None:
+    query = f"""
+    UNWIND $rows AS row
+    MATCH (n:{label} {{id: row.id}})
+    SET n += row.props
+    """
+    tx.run(query, {"rows": rows})
+
+
+def _stamp_summaries(tx, ids: list[str], as_of: date) -> None:
+    """Record that the summaries of a batch of customers, and of their
+    mortgages, are current as of `as_of`, whether or not they changed"""
+
+    query = """
+    UNWIND $ids AS id
+    MATCH (c:Customer {id: id})
+    SET c.summary_as_of = $as_of
+    WITH c
+    MATCH (c)-[:HAS]->(m:Mortgage)
+    SET m.summary_as_of = $as_of
+    """
+    tx.run(query, {"ids": ids, "as_of": as_of})
+
+
+def _native(value: Any) -> Any:
+    return value.to_native() if hasattr(value, "to_native") else value
+
+
+def _is_due(status: Optional[str]) -> bool:
+    return (status or "").lower() == "due"
+
+
+def _due_summary(dues: list[dict], as_of: date) -> dict[str, Any]:
+    due = [
+        (_native(d["due_date"]), d["amount"] or 0.0)
+        for d in dues
+        if _is_due(d["status"]) and d["due_date"] is not None
+    ]
+    upcoming = [day for day, _ in due if day >= as_of]
+    next_due_date = min(upcoming) if upcoming else None
+    return {
+        "outstanding_due": round(sum((amount for _, amount in due), 0.0), 2),
+        "overdue_amount": round(sum((a for day, a in due if day < as_of), 0.0), 2),
+        "next_due_date": next_due_date,
+        "next_due_amount": (
+            round(sum(a for day, a in due if day == next_due_date), 2)
+            if next_due_date
+            else None
+        ),
+    }
+
+
+def _fee_summary(fees: list[dict], fee_types: list[str]) -> dict[str, Any]:
+    # Totals start at 0.0, so nodes without fees still get FLOAT properties
+    fees = [f for f in fees if f["type"] is not None]
+    summary = {
+        "total_fees": round(sum((f["amount"] for f in fees), 0.0), 2),
+        "unpaid_fees": round(
+            sum((f["amount"] for f in fees if _is_due(f["status"])), 0.0), 2
+        ),
+    }
+    # Every fee type is written, so every node has the same properties
+    for fee_type in fee_types:
+        summary[fee_property(fee_type)] = round(
+            sum((f["amount"] for f in fees if f["type"] == fee_type), 0.0), 2
+        )
+    return summary
+
+
+def _with_hash(
+    props: dict[str, Any], previous_hash: Optional[str], fee_keys: list[str]
+) -> Optional[dict[str, Any]]:
+    """Props to write, or None if they are unchanged since the last refresh.
+    Totals of fee types no longer in the data are removed."""
+
+    summary_hash = hashlib.sha256(
+        json.dumps(props, sort_keys=True, default=str).encode()
+    ).hexdigest()
+    if summary_hash == previous_hash:
+        return None
+    stale = {key: None for key in fee_keys if key not in props}
+    return {**props, **stale, "summary_hash": summary_hash}
+
+
+def summarize_customer(
+    activity: dict[str, Any], fee_types: list[str], as_of: date
+) -> tuple[Optional[dict], list[dict]]:
+    """Summary properties of a customer and of each of their mortgages, None
+    for those that haven't changed"""
+
+    mortgages = []
+    all_dues, all_fees = [], []
+    for mortgage in activity["mortgages"]:
+        dues = [d for d in mortgage["dues"] if d["amount"] is not None]
+        fees = [f for f in mortgage["fees"] if f["amount"] is not None]
+        all_dues += dues
+        all_fees += fees
+        props = _with_hash(
+            {
+                **_due_summary(dues, as_of),
+                **_fee_summary(fees, fee_types),
+            },
+            mortgage["summary_hash"],
+            mortgage["fee_keys"],
+        )
+        if props is not None:
+            mortgages.append({"id": mortgage["id"], "props": props})
+
+    customer = _with_hash(
+        {
+            "mortgage_count": len(activity["mortgages"]),
+            "total_mortgage_amount": round(
+                sum((m["amount"] or 0.0 for m in activity["mortgages"]), 0.0), 2
+            ),
+            "total_paid": round(activity["total_paid"] or 0.0, 2),
+            "payments_made": activity["payments_made"],
+            "last_payment_date": _native(activity["last_payment_date"]),
+            **_due_summary(all_dues, as_of),
+            **_fee_summary(all_fees, fee_types),
+        },
+        activity["summary_hash"],
+        activity["fee_keys"],
+    )
+    if customer is not None:
+        customer = {"id": activity["id"], "props": customer}
+    return customer, mortgages
+
+
+def refresh_summaries(
+    driver, customer_ids: Optional[list[str]] = None, as_of: Optional[date] = None
+) -> None:
+    """Compute and store summaries for the given customers, or all of them.
+
+    Due amounts and dates are relative to `as_of`, today by default, so a
+    daily refresh keeps next and overdue payments current. Only summaries
+    that changed are written, but every summary's `summary_as_of` is set.
+    """
+
+    as_of = as_of or date.today()
+    with driver.session(database="neo4j") as session:
+        for node, prop in SUMMARY_RANGE_INDEXES:
+            session.execute_write(_set_range_index, node, prop)
+
+        fee_types = session.execute_read(_fetch_fee_types)
+        if customer_ids is None:
+            customer_ids = session.execute_read(_fetch_customer_ids)
+        LOGGER.info(
+            f"Summarizing {len(customer_ids)} customers as of {as_of}, "
+            f"with fee types {fee_types}"
+        )
+
+        customers_written = mortgages_written = 0
+        for start in range(0, len(customer_ids), SUMMARY_BATCH_SIZE):
+            batch = customer_ids[start : start + SUMMARY_BATCH_SIZE]
+            customer_rows, mortgage_rows = [], []
+            for activity in session.execute_read(_fetch_customer_activity, batch):
+                customer, mortgages = summarize_customer(activity, fee_types, as_of)
+                if customer is not None:
+                    customer_rows.append(customer)
+                mortgage_rows += mortgages
+
+            if customer_rows:
+                session.execute_write(_write_summaries, "Customer", customer_rows)
+            if mortgage_rows:
+                session.execute_write(_write_summaries, "Mortgage", mortgage_rows)
+            session.execute_write(_stamp_summaries, batch, as_of)
+            customers_written += len(customer_rows)
+            mortgages_written += len(mortgage_rows)
+
+    LOGGER.info(
+        f"Updated summaries of {customers_written} customers and "
+        f"{mortgages_written} mortgages"
+    )
+
+
+@retry(tries=100, delay=10)
+def run_summary_stage(
+    customer_ids: Optional[list[str]] = None, as_of: Optional[date] = None
+) -> None:
+    """Materialize customer and mortgage summaries for common questions"""
+
+    driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USERNAME, NEO4J_PASSWORD))
+    try:
+        refresh_summaries(driver, customer_ids, as_of)
+    finally:
+        driver.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Store per-customer and per-mortgage summaries in Neo4j"
+    )
+    parser.add_argument(
+        "--customer-ids",
+        type=lambda value: value.split(","),
+        default=None,
+        help="Comma-separated customers to refresh, all by default",
+    )
+    parser.add_argument("--as-of", type=date.fromisoformat, default=None)
+    args = parser.parse_args()
+
+    run_summary_stage(args.customer_ids, args.as_of)
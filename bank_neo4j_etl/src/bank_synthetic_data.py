@@ -0,0 +1,290 @@
+import os
+import csv
+import random
+import logging
+import argparse
+from datetime import date, timedelta
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s [%(levelname)s]: %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+)
+
+LOGGER = logging.getLogger(__name__)
+
+# Columns expected by the column mappings in bank_csv_mappings.py
+CSV_COLUMNS = {
+    "branches": ["branch_id", "branch_name", "branch_state"],
+    "customers": [
+        "customer_id",
+        "first_name",
+        "last_name",
+        "email",
+        "phone_number",
+        "address",
+        "city",
+        "state",
+        "zip_code",
+        "country",
+    ],
+    "mortgages": [
+        "loan_number",
+        "customer_id",
+        "loan_amount",
+        "interest_rate",
+        "start_date",
+        "status",
+        "tenure",
+    ],
+    "payments": ["payment_made_id", "customer_id", "amount", "payment_date"],
+    "payments_due": [
+        "payment_due_id",
+        "customer_id",
+        "mortgage_id",
+        "amount",
+        "due_date",
+        "status",
+    ],
+    "fees": [
+        "fee_id",
+        "customer_id",
+        "mortgage_id",
+        "fee_type",
+        "amount",
+        "date_incurred",
+        "status",
+    ],
+    "faqs": ["faq_id", "question", "answer", "related_topics"],
+    "questions": ["question", "cypher"],
+}
+
+STATES = [
+    "Alabama", "Arizona", "California", "Colorado", "Florida", "Georgia",
+    "Illinois", "Massachusetts", "Michigan", "New Jersey", "New York",
+    "North Carolina", "Ohio", "Oregon", "Pennsylvania", "Texas", "Virginia",
+    "Washington",
+]  # fmt: skip
+FIRST_NAMES = [
+    "Alice", "Bob", "Carla", "David", "Elena", "Frank", "Grace", "Hector",
+    "Ivy", "Jon", "Karen", "Luis", "Maya", "Noah", "Olivia", "Priya",
+]  # fmt: skip
+LAST_NAMES = [
+    "Smith", "Johnson", "Garcia", "Brown", "Nguyen", "Miller", "Davis",
+    "Lopez", "Wilson", "Anderson", "Thomas", "Moore", "Lee", "Clark",
+]  # fmt: skip
+BRANCH_WORDS = [
+    "Jordan", "Wallace", "Hamilton", "Castaneda", "Hardy", "Riverside",
+    "Summit", "Harbor", "Maple", "Cedar", "Lakeview", "Pioneer",
+]  # fmt: skip
+PRODUCTS = ["Fixed-Rate", "Adjustable-Rate", "Interest-Only", "FHA", "Jumbo"]
+FEE_TYPES = ["Late Fee", "Processing Fee", "Prepayment Penalty", "Returned Payment"]
+
+EXAMPLE_QUESTIONS = [
+    ("How many customers are there?", "MATCH (c:Customer) RETURN count(c) AS total"),
+    (
+        "What is the average loan amount?",
+        "MATCH (m:Mortgage) RETURN avg(m.amount) AS average_amount",
+    ),
+    (
+        "Which customers live in California?",
+        "MATCH (c:Customer) WHERE toLower(c.state) = 'california' "
+        "RETURN c.name AS customer_name, c.id AS customer_id",
+    ),
+    (
+        "What fees were incurred in the last quarter?",
+        "MATCH (m:Mortgage)-[:HAS]->(f:Fees) "
+        "WHERE f.date_incurred >= date() - duration('P3M') "
+        "RETURN m.id AS loan_number, f.type AS fee_type, f.amount AS amount",
+    ),
+    (
+        "What are the total late fees for customer Bob Smith?",
+        "MATCH (c:Customer) WHERE toLower(c.name) = 'bob smith' "
+        "RETURN c.name AS customer_name, c.fees_late_fee AS late_fees",
+    ),
+    (
+        "When is the next payment due for customer Alice Garcia and how much is it?",
+        "MATCH (c:Customer) WHERE toLower(c.name) = 'alice garcia' "
+        "RETURN c.name AS customer_name, c.next_due_date AS next_due_date, "
+        "c.next_due_amount AS next_due_amount, c.outstanding_due AS outstanding_due",
+    ),
+    (
+        "Which loans are above 500000?",
+        "MATCH (c:Customer)-[:HAS]->(m:Mortgage) WHERE m.amount > 500000 "
+        "RETURN c.name AS customer_name, m.id AS loan_number, m.amount AS amount",
+    ),
+]
+
+
+def _add_months(day: date, months: int) -> date:
+    month = day.month - 1 + months
+    return date(day.year + month // 12, month % 12 + 1, min(day.day, 28))
+
+
+def _faq_rows() -> list[list[str]]:
+    rows = []
+    for i, product in enumerate(PRODUCTS, start=1):
+        rows.append(
+            [
+                str(i),
+                f"What is a {product} mortgage?",
+                f"A {product} mortgage is one of our home loan products.",
+                "products",
+            ]
+        )
+        rows.append(
+            [
+                str(len(PRODUCTS) + i),
+                f"What interest rates apply to {product} mortgages?",
+                f"{product} mortgage rates depend on tenure and credit history.",
+                "interest rates",
+            ]
+        )
+    return rows
+
+
+def generate_bank_csvs(
+    out_dir: str,
+    customers: int,
+    seed: int = 0,
+    payments_per_mortgage: int = 12,
+    as_of: date | None = None,
+) -> dict[str, str]:
+    """Write synthetic bank CSVs to `out_dir` and return their paths.
+
+    Rows are streamed to disk as they are generated, so memory use does not
+    grow with the number of customers. The same seed, size and `as_of` date
+    always produce the same files.
+    """
+
+    os.makedirs(out_dir, exist_ok=True)
+    rng = random.Random(seed)
+    paths = {name: os.path.join(out_dir, f"{name}.csv") for name in CSV_COLUMNS}
+    files = {name: open(path, "w", newline="") for name, path in paths.items()}
+    writers = {name: csv.writer(f) for name, f in files.items()}
+    for name, columns in CSV_COLUMNS.items():
+        writers[name].writerow(columns)
+
+    id_width = max(3, len(str(customers)))
+    today = as_of or date.today()
+    counters = {"mortgage": 0, "payment": 0, "payment_due": 0, "fee": 0}
+
+    try:
+        for i in range(1, max(10, customers // 1000) + 1):
+            writers["branches"].writerow(
+                [i, f"{rng.choice(BRANCH_WORDS)} {i}", rng.choice(STATES)]
+            )
+
+        for i in range(1, customers + 1):
+            customer_id = f"C{i:0{id_width}d}"
+            first_name = rng.choice(FIRST_NAMES)
+            last_name = rng.choice(LAST_NAMES)
+            writers["customers"].writerow(
+                [
+                    customer_id,
+                    first_name,
+                    last_name,
+                    f"{first_name.lower()}.{last_name.lower()}{i}@example.com",
+                    f"555-{rng.randint(1000000, 9999999)}",
+                    f"{rng.randint(1, 9999)} Main St",
+                    f"City {rng.randint(1, 500)}",
+                    rng.choice(STATES),
+                    f"{rng.randint(10000, 99999)}",
+                    "USA",
+                ]
+            )
+
+            for _ in range(1 if rng.random() < 0.8 else 2):
+                counters["mortgage"] += 1
+                loan_number = f"L{counters['mortgage']:0{id_width + 1}d}"
+                amount = round(rng.uniform(50_000, 1_500_000), 2)
+                start = date(rng.randint(2010, today.year - 1), rng.randint(1, 12), 1)
+                tenure = rng.choice([10, 15, 20, 30])
+                status = "Active" if rng.random() < 0.85 else "Closed"
+                writers["mortgages"].writerow(
+                    [
+                        loan_number,
+                        customer_id,
+                        amount,
+                        round(rng.uniform(2.5, 8.0), 2),
+                        start.isoformat(),
+                        status,
+                        tenure,
+                    ]
+                )
+
+                installment = round(amount / (tenure * 12), 2)
+                # Active loans have a schedule straddling `as_of`
+                if status == "Active":
+                    first_due = _add_months(
+                        today.replace(day=1), -(payments_per_mortgage // 2)
+                    )
+                else:
+                    first_due = _add_months(start, payments_per_mortgage)
+                for month in range(payments_per_mortgage):
+                    counters["payment"] += 1
+                    writers["payments"].writerow(
+                        [
+                            f"P{counters['payment']}",
+                            customer_id,
+                            installment,
+                            _add_months(start, month).isoformat(),
+                        ]
+                    )
+                    counters["payment_due"] += 1
+                    due_date = _add_months(first_due, month)
+                    writers["payments_due"].writerow(
+                        [
+                            f"D{counters['payment_due']}",
+                            customer_id,
+                            loan_number,
+                            installment,
+                            due_date.isoformat(),
+                            "Due" if due_date >= today else rng.choice(["Paid", "Due"]),
+                        ]
+                    )
+
+                if rng.random() < 0.5:
+                    counters["fee"] += 1
+                    writers["fees"].writerow(
+                        [
+                            f"F{counters['fee']}",
+                            customer_id,
+                            loan_number,
+                            rng.choice(FEE_TYPES),
+                            round(rng.uniform(15, 500), 2),
+                            (start + timedelta(days=rng.randint(0, 3000))).isoformat(),
+                            rng.choice(["Due", "Paid"]),
+                        ]
+                    )
+
+        writers["faqs"].writerows(_faq_rows())
+        writers["questions"].writerows(EXAMPLE_QUESTIONS)
+    finally:
+        for f in files.values():
+            f.close()
+
+    LOGGER.info(
+        f"Generated {customers} customers, {counters['mortgage']} mortgages, "
+        f"{counters['payment']} payments, {counters['payment_due']} payments due "
+        f"and {counters['fee']} fees in {out_dir}"
+    )
+    return paths
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate synthetic bank CSVs")
+    parser.add_argument("--out-dir", default="synthetic_data")
+    parser.add_argument("--customers", type=int, default=10_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--payments-per-mortgage", type=int, default=12)
+    parser.add_argument("--as-of", type=date.fromisoformat, default=None)
+    args = parser.parse_args()
+
+    generate_bank_csvs(
+        args.out_dir,
+        args.customers,
+        args.seed,
+        args.payments_per_mortgage,
+        args.as_of,
+    )
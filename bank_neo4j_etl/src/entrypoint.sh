@@ -3,5 +3,20 @@
 # Run any setup steps or pre-processing tasks here
 echo "Running ETL to move bank data from csvs to Neo4j..."
 
+# ETL_MODE=bulk_import writes neo4j-admin import files for a cold build.
+# After importing them, run again with ETL_MODE=post_import.
+if [ "$ETL_MODE" = "bulk_import" ]; then
+    python bank_bulk_import.py
+    exit 0
+fi
+
 # Run the ETL script
 python bank_bulk_csv_write.py
+
+# Materialize customer and mortgage summaries for common aggregate questions
+echo "Computing customer and mortgage summaries..."
+python bank_summaries.py
+
+# Embed FAQ and example question nodes so the API never embeds at startup
+echo "Embedding text nodes and creating vector indexes..."
+python bank_embeddings.py
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# The ETL modules import each other as top-level modules, as in its container
+sys.path.insert(0, str(Path(__file__).parents[1] / "src"))
@@ -0,0 +1,76 @@
+from datetime import date
+from bank_bulk_csv_write import _source_row_params, _source_write_query
+
+
+def lines(query: str) -> list[str]:
+    return [line.strip() for line in query.strip().splitlines()]
+
+
+def test_node_query_merges_on_key_and_links_to_existing_start():
+    """
+    Test that a source's nodes are merged on their key, and relationships
+    to nodes of earlier sources match those by id
+    """
+    assert lines(_source_write_query("mortgages")) == [
+        "UNWIND $rows AS row",
+        "MERGE (n:Mortgage {id: row.props.id})",
+        "SET n += row.props",
+        "CALL {",
+        "WITH n, row",
+        "WITH n, row WHERE row.rels[0] IS NOT NULL",
+        "MATCH (a:Customer {id: row.rels[0].a})",
+        "WITH a, n AS b",
+        "MERGE (a)-[:HAS]->(b)",
+        "}",
+    ]
+    assert "MERGE (n:Question {question: row.props.question, cypher: " in (
+        _source_write_query("questions")
+    )
+
+
+def test_relationship_query_reaches_start_nodes_via_another_relationship():
+    """
+    Test that a relationship with `start_via` links the start nodes
+    reached through it, keeping only those matching `start_where`
+    """
+    assert lines(_source_write_query("fees"))[-6:] == [
+        "WITH n, row",
+        "WITH n, row WHERE row.rels[1] IS NOT NULL",
+        "MATCH (:Mortgage {id: row.rels[1].a})-[:SCHEDULE]->(a:PaymentsDue)"
+        ' WHERE a.status = "Due"',
+        "WITH a, n AS b",
+        "MERGE (a)-[:MAY_INCUR]->(b)",
+        "}",
+    ]
+
+
+def test_row_params_convert_values_and_apply_where():
+    """
+    Test that row params hold typed properties and the ids of each
+    relationship, None for relationships whose `where` the row fails,
+    and that rows without a key are skipped
+    """
+    row = {
+        "fee_id": "F1",
+        "mortgage_id": "M1",
+        "fee_type": "Late Fee",
+        "amount": "25",
+        "date_incurred": "2024-01-05",
+        "status": "Due",
+    }
+
+    assert _source_row_params("fees", row) == {
+        "props": {
+            "id": "F1",
+            "type": "Late Fee",
+            "amount": 25.0,
+            "date_incurred": date(2024, 1, 5),
+            "status": "Due",
+        },
+        "rels": [{"a": "M1", "b": "F1"}, {"a": "M1", "b": "F1"}],
+    }
+    assert _source_row_params("fees", {**row, "status": "Paid"})["rels"] == [
+        {"a": "M1", "b": "F1"},
+        None,
+    ]
+    assert _source_row_params("fees", {**row, "fee_id": ""}) is None
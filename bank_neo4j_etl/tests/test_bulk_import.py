@@ -0,0 +1,139 @@
+import csv
+import pytest
+import bank_bulk_import
+from bank_bulk_import import (
+    _convert_source,
+    node_file_name,
+    node_header,
+    relationship_file_name,
+    write_bulk_import_files,
+)
+from bank_csv_mappings import NODE_MAPPINGS_BY_LABEL, RELATIONSHIP_MAPPINGS
+
+SOURCES = {
+    "customers": [
+        {"customer_id": "C1", "first_name": "Ann", "last_name": "Lee"},
+        {"customer_id": "C2", "first_name": "Bob", "last_name": "Ray"},
+    ],
+    "mortgages": [
+        {"loan_number": "M1", "customer_id": "C1", "loan_amount": "1000.5"},
+        {"loan_number": "M2", "customer_id": "C9", "loan_amount": "2000"},
+    ],
+    "payments_due": [
+        {"payment_due_id": "D1", "mortgage_id": "M1", "status": "Due"},
+        {"payment_due_id": "D2", "mortgage_id": "M1", "status": "Paid"},
+        {"payment_due_id": "D3", "mortgage_id": "M9", "status": "Due"},
+    ],
+    "fees": [
+        {"fee_id": "F1", "mortgage_id": "M1", "fee_type": "Late", "status": "Due"},
+        {"fee_id": "F2", "mortgage_id": "M1", "fee_type": "Late", "status": "Paid"},
+    ],
+}
+
+
+def write_sources(tmp_path) -> dict[str, str]:
+    paths = {}
+    for source, rows in SOURCES.items():
+        paths[source] = str(tmp_path / f"{source}.csv")
+        with open(paths[source], "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+    return paths
+
+
+def read_rows(out_dir, file_name) -> tuple[list[str], list[list[str]]]:
+    """Header and rows of a node or relationship file, across its parts"""
+
+    rows = []
+    part = 0
+    while (path := out_dir / file_name(part)).exists():
+        with open(path, newline="") as f:
+            rows += list(csv.reader(f))
+        part += 1
+    return rows[0], sorted(rows[1:])
+
+
+def relationships(out_dir, type: str, end_label: str) -> list[list[str]]:
+    [index] = [
+        i
+        for i, rel in enumerate(RELATIONSHIP_MAPPINGS)
+        if rel.type == type and rel.end_label == end_label
+    ]
+    return read_rows(out_dir, lambda part: relationship_file_name(index, part))[1]
+
+
+def test_import_headers_use_importer_types():
+    """
+    Test that node headers declare the label's id space, and map floats
+    and ints to the importer's 64-bit types
+    """
+    assert node_header(NODE_MAPPINGS_BY_LABEL["Mortgage"]) == [
+        ":ID(Mortgage)",
+        "id:string",
+        "amount:double",
+        "interest:double",
+        "start:date",
+        "status:string",
+        "tenure:long",
+    ]
+
+
+@pytest.mark.parametrize("part_bytes", [10**9, 1])
+def test_relationships_to_unknown_nodes_are_dropped(tmp_path, part_bytes):
+    """
+    Test that relationships are only written between known nodes, fees
+    still due link to the mortgage's payments still due, and that sources
+    split into parts give the same files as whole ones
+    """
+    stats = []
+    out_dir = tmp_path / "import"
+    command = write_bulk_import_files(
+        write_sources(tmp_path),
+        str(out_dir),
+        workers=2,
+        stats=stats,
+        part_bytes=part_bytes,
+    )
+
+    assert (out_dir / node_file_name("Mortgage", 1)).exists() == (part_bytes == 1)
+    header, mortgages = read_rows(
+        out_dir, lambda part: node_file_name("Mortgage", part)
+    )
+    assert header[:3] == [":ID(Mortgage)", "id:string", "amount:double"]
+    assert [row[:3] for row in mortgages] == [
+        ["M1", "M1", "1000.5"],
+        ["M2", "M2", "2000.0"],
+    ]
+
+    assert relationships(out_dir, "HAS", "Mortgage") == [["C1", "M1"]]
+    assert relationships(out_dir, "SCHEDULE", "PaymentsDue") == [
+        ["M1", "D1"],
+        ["M1", "D2"],
+    ]
+    assert relationships(out_dir, "HAS", "Fees") == [["M1", "F1"], ["M1", "F2"]]
+    assert relationships(out_dir, "MAY_INCUR", "Fees") == [["D1", "F1"]]
+
+    invalid = {source["source"]: source["invalid"] for source in stats}
+    assert invalid == {"customers": 0, "mortgages": 1, "payments_due": 1, "fees": 0}
+    assert f"--nodes=Mortgage={out_dir / 'nodes_Mortgage.csv'}" in command
+
+
+def test_strict_import_fails_on_unknown_nodes(tmp_path, monkeypatch):
+    """
+    Test that a reference to a node of an earlier stage that doesn't exist
+    fails the conversion in strict mode
+    """
+    monkeypatch.setattr(bank_bulk_import, "BULK_IMPORT_STRICT", True)
+    paths = write_sources(tmp_path)
+
+    with pytest.raises(ValueError, match="mortgages row 3"):
+        _convert_source(
+            "mortgages",
+            paths["mortgages"],
+            str(tmp_path),
+            {"Customer": {"C1"}},
+            {},
+            False,
+            {},
+        )
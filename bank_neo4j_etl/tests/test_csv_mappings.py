@@ -0,0 +1,71 @@
+from datetime import date, datetime
+import pytest
+from bank_csv_mappings import (
+    NODE_MAPPINGS_BY_LABEL,
+    convert_value,
+    parse_date,
+    range_indexed_properties,
+    row_properties,
+)
+
+
+def test_convert_value_to_property_types():
+    """
+    Test that blank values become None, and others the property's type,
+    with ints read from float text
+    """
+    assert convert_value("", "float") is None
+    assert convert_value(None, "date") is None
+    assert convert_value("1000.5", "float") == 1000.5
+    assert convert_value("360", "int") == 360
+    assert convert_value("360.0", "int") == 360
+    assert convert_value("2024-03-01", "date") == date(2024, 3, 1)
+    assert convert_value(42, "string") == "42"
+
+
+def test_parse_date_formats():
+    """
+    Test that each supported date format and timestamps are parsed, and
+    unknown formats are rejected
+    """
+    assert parse_date("2024-03-01") == date(2024, 3, 1)
+    assert parse_date("2024-03-01T10:30:00") == date(2024, 3, 1)
+    assert parse_date("03/01/2024") == date(2024, 3, 1)
+    assert parse_date(" 01-03-2024 ") == date(2024, 3, 1)
+    assert parse_date(datetime(2024, 3, 1, 10, 30)) == date(2024, 3, 1)
+    with pytest.raises(ValueError, match="Unrecognized date"):
+        parse_date("March 1st")
+
+
+def test_row_properties_join_columns():
+    """
+    Test that a property built from several columns joins them, and is
+    left out when one of them is missing
+    """
+    customer = NODE_MAPPINGS_BY_LABEL["Customer"]
+
+    properties = row_properties(
+        customer, {"customer_id": "C1", "first_name": "Ann", "last_name": "Lee"}
+    )
+    assert properties["name"] == "Ann Lee"
+    assert properties["email"] is None
+    assert "name" not in row_properties(customer, {"first_name": "Ann"})
+
+
+def test_range_indexes_cover_numeric_and_date_properties():
+    """
+    Test that every numeric and date property except keys gets a range
+    index
+    """
+    assert range_indexed_properties() == [
+        ("Mortgage", "amount"),
+        ("Mortgage", "interest"),
+        ("Mortgage", "start"),
+        ("Mortgage", "tenure"),
+        ("Payments", "amount"),
+        ("Payments", "payment_date"),
+        ("PaymentsDue", "amount"),
+        ("PaymentsDue", "due_date"),
+        ("Fees", "amount"),
+        ("Fees", "date_incurred"),
+    ]
@@ -0,0 +1,83 @@
+import csv
+import gzip
+import pytest
+from bank_csv_sources import iter_source_batches, iter_source_rows
+
+ROWS = [{"customer_id": str(i), "name": f"Customer {i}"} for i in range(5)]
+
+
+def write_csv(f) -> None:
+    writer = csv.DictWriter(f, fieldnames=["customer_id", "name"])
+    writer.writeheader()
+    writer.writerows(ROWS)
+
+
+def test_csv_is_read_in_batches_without_its_header(tmp_path):
+    """
+    Test that CSV rows are keyed by the header, which isn't a row itself,
+    and split into batches of at most `batch_size` rows
+    """
+    path = tmp_path / "customers.csv"
+    with open(path, "w", newline="") as f:
+        write_csv(f)
+
+    batches = list(iter_source_batches(str(path), batch_size=2))
+    assert [len(batch) for batch in batches] == [2, 2, 1]
+    assert [row for batch in batches for row in batch] == ROWS
+    assert list(iter_source_batches(str(path), batch_size=5)) == [ROWS]
+    assert list(iter_source_rows(str(path), batch_size=3)) == ROWS
+
+
+def test_header_only_csv_has_no_batches(tmp_path):
+    """
+    Test that a CSV with only a header yields no batches, not an empty one
+    """
+    path = tmp_path / "customers.csv"
+    path.write_text("customer_id,name\n")
+
+    assert list(iter_source_batches(str(path), batch_size=2)) == []
+
+
+def test_gzip_csv_is_decompressed(tmp_path):
+    """
+    Test that gzip compressed CSVs, read from file URLs too, are streamed
+    """
+    path = tmp_path / "customers.csv.gz"
+    with gzip.open(path, "wt", newline="") as f:
+        write_csv(f)
+
+    batches = list(iter_source_batches(f"file://{path}", batch_size=3))
+    assert [len(batch) for batch in batches] == [3, 2]
+    assert list(iter_source_rows(str(path))) == ROWS
+
+
+def test_zstd_csv_is_decompressed(tmp_path):
+    """
+    Test that zstd compressed CSVs are streamed
+    """
+    zstandard = pytest.importorskip("zstandard")
+    plain = tmp_path / "customers.csv"
+    with open(plain, "w", newline="") as f:
+        write_csv(f)
+    path = tmp_path / "customers.csv.zst"
+    path.write_bytes(zstandard.ZstdCompressor().compress(plain.read_bytes()))
+
+    batches = list(iter_source_batches(str(path), batch_size=4))
+    assert [len(batch) for batch in batches] == [4, 1]
+    assert [row for batch in batches for row in batch] == ROWS
+
+
+def test_parquet_is_read_in_batches_with_native_types(tmp_path):
+    """
+    Test that Parquet rows keep their types, and are split into batches
+    """
+    pa = pytest.importorskip("pyarrow")
+    pq = pytest.importorskip("pyarrow.parquet")
+    path = tmp_path / "customers.parquet"
+    table = pa.table({"customer_id": [1, 2, 3], "balance": [1.5, 2.0, None]})
+    pq.write_table(table, path)
+
+    batches = list(iter_source_batches(str(path), batch_size=2))
+    assert [len(batch) for batch in batches] == [2, 1]
+    assert batches[0][0] == {"customer_id": 1, "balance": 1.5}
+    assert list(iter_source_rows(str(path)))[-1] == {"customer_id": 3, "balance": None}
@@ -0,0 +1,66 @@
+import pytest
+from bank_embeddings import EmbeddingCache, HashEmbedder, embed_texts
+
+
+class CountingEmbedder(HashEmbedder):
+    def __init__(self):
+        super().__init__(dimensions=8)
+        self.embedded = []
+
+    def embed_documents(self, texts):
+        self.embedded.extend(texts)
+        return super().embed_documents(texts)
+
+
+def test_hash_embedder_is_deterministic_unit_vectors():
+    """
+    Test that the same text always gets the same unit vector of the
+    configured size, and different texts get different ones
+    """
+    embedder = HashEmbedder(dimensions=40)
+    first, again, other = embedder.embed_documents(["fees", "fees", "rates"])
+
+    assert len(first) == 40
+    assert first == again and first != other
+    assert abs(sum(v * v for v in first) - 1.0) < 1e-9
+    assert embedder.model_name == "hash-40"
+
+
+def test_embedding_cache_round_trips_vectors(tmp_path):
+    """
+    Test that stored vectors are read back by key, across connections,
+    and that keys depend on both model and text
+    """
+    path = str(tmp_path / "embeddings.sqlite3")
+    key = EmbeddingCache.content_hash("hash-8", "fees")
+    assert key != EmbeddingCache.content_hash("hash-16", "fees")
+    assert key != EmbeddingCache.content_hash("hash-8", "rates")
+
+    cache = EmbeddingCache(path)
+    cache.put_many({key: [0.5, -0.25, 1.0]})
+    cache.close()
+
+    cache = EmbeddingCache(path)
+    assert cache.get_many([key, "missing"]) == {key: [0.5, -0.25, 1.0]}
+    cache.close()
+
+
+def test_embed_texts_only_embeds_texts_missing_from_cache(tmp_path):
+    """
+    Test that texts already cached, or repeated within a call, aren't sent
+    to the embedder, and vectors come back in the order of the texts
+    """
+    cache = EmbeddingCache(str(tmp_path / "embeddings.sqlite3"))
+    embedder = CountingEmbedder()
+
+    first = embed_texts(["fees", "rates", "fees"], embedder, cache, batch_size=1)
+    assert sorted(embedder.embedded) == ["fees", "rates"]
+    assert first[0] == first[2] != first[1]
+
+    embedder.embedded.clear()
+    second = embed_texts(["rates", "terms", "fees"], embedder, cache)
+    assert embedder.embedded == ["terms"]
+    # Cached vectors are stored as 32-bit floats
+    assert second[0] == pytest.approx(first[1], abs=1e-6)
+    assert second[2] == pytest.approx(first[0], abs=1e-6)
+    cache.close()
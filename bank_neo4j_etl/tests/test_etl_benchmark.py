@@ -0,0 +1,58 @@
+import tracemalloc
+from bank_etl_benchmark import StageRecorder, _count_rows, find_regressions
+
+
+def test_count_rows_counts_records_not_lines(tmp_path):
+    """
+    Test that a quoted value spanning lines is one row, and neither the
+    header nor blank lines are counted
+    """
+    path = tmp_path / "faqs.csv"
+    path.write_text(
+        'faq_id,answer\n1,"First line\nsecond line"\n\n2,Short\n', newline=""
+    )
+
+    assert _count_rows(str(path)) == 2
+
+
+def test_heap_peaks_are_only_recorded_when_tracing():
+    """
+    Test that stages are timed without heap peaks by default, and with
+    them when memory tracing is asked for
+    """
+    recorder = StageRecorder()
+    with recorder.stage("untraced", 10):
+        pass
+    assert "peak_traced_mb" not in recorder.stages["untraced"]
+    assert recorder.stages["untraced"]["rows"] == 10
+
+    tracemalloc.start()
+    try:
+        recorder = StageRecorder(trace_memory=True)
+        with recorder.stage("traced", 10):
+            data = [0] * 100_000
+        del data
+    finally:
+        tracemalloc.stop()
+    assert recorder.stages["traced"]["peak_traced_mb"] > 0
+
+
+def test_regressions_past_tolerance_are_reported():
+    """
+    Test that only stages slower than the baseline by more than the
+    tolerance are reported
+    """
+
+    def results(**rates):
+        stages = {name: {"rows_per_second": rate} for name, rate in rates.items()}
+        return {"modes": {"bulk_import": {"stages": stages}}}
+
+    regressions = find_regressions(
+        results(convert_fees=70.0, convert_payments=90.0, convert_new=1.0),
+        results(convert_fees=100.0, convert_payments=100.0),
+        tolerance=0.2,
+    )
+
+    assert regressions == [
+        "bulk_import/convert_fees: 70.0 rows/s vs baseline 100.0 rows/s"
+    ]
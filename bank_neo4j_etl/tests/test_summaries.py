@@ -0,0 +1,108 @@
+from datetime import date
+from bank_summaries import _due_summary, _fee_summary, summarize_customer
+
+AS_OF = date(2024, 6, 15)
+
+DUES = [
+    {"amount": 100.0, "due_date": date(2024, 6, 1), "status": "Due"},
+    {"amount": 200.0, "due_date": date(2024, 7, 1), "status": "due"},
+    {"amount": 50.0, "due_date": date(2024, 7, 1), "status": "Due"},
+    {"amount": 400.0, "due_date": date(2024, 8, 1), "status": "Paid"},
+    {"amount": 75.0, "due_date": None, "status": "Due"},
+]
+
+FEES = [
+    {"type": "Late Fee", "amount": 25.0, "status": "Due"},
+    {"type": "Late Fee", "amount": 25.0, "status": "Paid"},
+    {"type": "Processing Fee", "amount": 10.0, "status": "Due"},
+    {"type": None, "amount": 99.0, "status": "Due"},
+]
+
+
+def test_due_summary_splits_overdue_and_next_payments():
+    """
+    Test that only payments still due count, those before the as-of date
+    are overdue, and payments on the next due date are added up
+    """
+    assert _due_summary(DUES, AS_OF) == {
+        "outstanding_due": 350.0,
+        "overdue_amount": 100.0,
+        "next_due_date": date(2024, 7, 1),
+        "next_due_amount": 250.0,
+    }
+    assert _due_summary([], AS_OF) == {
+        "outstanding_due": 0.0,
+        "overdue_amount": 0.0,
+        "next_due_date": None,
+        "next_due_amount": None,
+    }
+
+
+def test_fee_summary_totals_every_fee_type():
+    """
+    Test that fees are totalled overall, unpaid and per type, with zeros
+    for fee types a node doesn't have
+    """
+    fee_types = ["Late Fee", "Processing Fee", "Annual Fee"]
+
+    assert _fee_summary(FEES, fee_types) == {
+        "total_fees": 60.0,
+        "unpaid_fees": 35.0,
+        "fees_late_fee": 50.0,
+        "fees_processing_fee": 10.0,
+        "fees_annual_fee": 0.0,
+    }
+
+
+def activity(customer_hash=None, mortgage_hash=None, fee_keys=()):
+    return {
+        "id": "C1",
+        "total_paid": 1234.5,
+        "payments_made": 3,
+        "last_payment_date": date(2024, 5, 1),
+        "summary_hash": customer_hash,
+        "fee_keys": list(fee_keys),
+        "mortgages": [
+            {
+                "id": "M1",
+                "amount": 300000.0,
+                "dues": DUES,
+                "fees": FEES,
+                "summary_hash": mortgage_hash,
+                "fee_keys": list(fee_keys),
+            }
+        ],
+    }
+
+
+def test_summarize_customer_skips_unchanged_summaries():
+    """
+    Test that customer and mortgage summaries are returned with their
+    hashes, and not again once those hashes are stored
+    """
+    customer, mortgages = summarize_customer(activity(), ["Late Fee"], AS_OF)
+
+    assert customer["id"] == "C1"
+    assert customer["props"]["total_paid"] == 1234.5
+    assert customer["props"]["mortgage_count"] == 1
+    assert customer["props"]["overdue_amount"] == 100.0
+    assert "total_paid" not in mortgages[0]["props"]
+    assert mortgages[0]["props"]["fees_late_fee"] == 50.0
+
+    unchanged = activity(
+        customer["props"]["summary_hash"], mortgages[0]["props"]["summary_hash"]
+    )
+    assert summarize_customer(unchanged, ["Late Fee"], AS_OF) == (None, [])
+
+
+def test_summarize_customer_removes_dropped_fee_types():
+    """
+    Test that totals of fee types no longer in the data are removed
+    """
+    customer, mortgages = summarize_customer(
+        activity(fee_keys=["fees_late_fee", "fees_annual_fee"]), ["Late Fee"], AS_OF
+    )
+
+    assert customer["props"]["fees_annual_fee"] is None
+    assert mortgages[0]["props"]["fees_annual_fee"] is None
+    assert customer["props"]["fees_late_fee"] == 50.0
@@ -1,25 +1,32 @@
 import os
-from typing import Any
-from langchain_openai import ChatOpenAI
+from typing import Any, Optional
 from langchain.agents import AgentExecutor, tool
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain.agents.format_scratchpad.openai_tools import (
     format_to_openai_tool_messages,
 )
 from langchain.agents.output_parsers.openai_tools import OpenAIToolsAgentOutputParser
-from src.chains.bank_faq_chain import faq_vector_chain
+from src.chains.bank_faq_chain import answer_faq_question
 from src.chains.bank_cypher_chain import bank_cypher_chain
+from src.langchain_custom.graph_qa.cypher import LISTING_KEY
 from src.tools.wait_times import (
     get_current_wait_times,
+    get_least_busy_branches,
     get_most_available_branch,
 )
+from src.utils.agent_stream import AGENT_LLM_TAG
+from src.utils.listing import record_listing
+from src.utils.llm_factory import build_chat_model
+from src.utils.sessions import record_entities
+from src.utils.telemetry import tool_span, traced_runnable
 
 
 BANK_AGENT_MODEL = os.getenv("BANK_AGENT_MODEL")
+# Reuse the responses to identical agent prompts, including tool results
+BANK_AGENT_LLM_CACHE = os.getenv("BANK_AGENT_LLM_CACHE", "true").lower() == "true"
 
-agent_chat_model = ChatOpenAI(
-    model=BANK_AGENT_MODEL,
-    temperature=0,
+agent_chat_model = build_chat_model(
+    BANK_AGENT_MODEL, cache_name="agent" if BANK_AGENT_LLM_CACHE else None
 )
 
 
@@ -34,7 +41,8 @@ def explore_product_faqs(question: str) -> str:
     the input should be "What are the different products offered?".
     """
 
-    return faq_vector_chain.invoke(question)
+    with tool_span("explore_product_faqs"):
+        return answer_faq_question(question)
 
 
 @tool
@@ -48,7 +56,18 @@ def explore_bank_database(question: str) -> str:
     rate on customer Jon Doe's loan?".
     """
 
-    return bank_cypher_chain.invoke(question)
+    with tool_span("explore_bank_database"):
+        response = bank_cypher_chain.invoke(question)
+
+    # Customers and loans identified by the query are remembered for the
+    # rest of the session; the agent only needs the answer
+    for step in response.pop("intermediate_steps", []):
+        if "context" in step:
+            record_entities(step["context"])
+    # Listed rows go to the user as a table, the agent only gets the summary
+    if LISTING_KEY in response:
+        record_listing(response.pop(LISTING_KEY))
+    return response
 
 
 @tool
@@ -63,7 +82,8 @@ def get_branch_wait_time(branch: str) -> str:
     input should be "Jordan Inc".
     """
 
-    return get_current_wait_times(branch)
+    with tool_span("get_branch_wait_time"):
+        return get_current_wait_times(branch)
 
 
 @tool
@@ -75,22 +95,44 @@ def find_most_available_branch(tmp: Any) -> dict[str, float]:
     branch name as the key and the wait time in minutes as the value.
     """
 
-    return get_most_available_branch(tmp)
+    with tool_span("find_most_available_branch"):
+        return get_most_available_branch(tmp)
+
 
 # @tool
 # def get_customer(name: str)-> str:
 #     """
 #     Looks up for a customer by name
-#     in the customer dataset and verifies the identity of the 
+#     in the customer dataset and verifies the identity of the
 #     customer when the customer enters the name
 #     """
 #     return verify_customer(name)
 
+
+@tool
+def find_least_busy_branches_in_state(
+    state: Optional[str] = None, customer: Optional[str] = None
+) -> dict[str, int] | str:
+    """
+    Use when you need the branches with the shortest wait times near a
+    customer, or in a specific state. Pass the full state name, e.g.
+    "California", or pass the customer's ID or full name to search the
+    customer's state. Prefer this over find_most_available_branch
+    whenever the state or customer is known. Returns a dictionary with
+    branch names as keys and wait times in minutes as values, shortest
+    wait first.
+    """
+
+    with tool_span("find_least_busy_branches_in_state"):
+        return get_least_busy_branches(state, customer)
+
+
 agent_tools = [
     explore_product_faqs,
     explore_bank_database,
     get_branch_wait_time,
     find_most_available_branch,
+    find_least_busy_branches_in_state,
 ]
 
 agent_prompt = ChatPromptTemplate.from_messages(
@@ -101,8 +143,11 @@ agent_prompt = ChatPromptTemplate.from_messages(
             You are a helpful chatbot for a bank designed to answer any queries
             about customer mortgage/loan details, customer payment schedule, fee related query and
             wait times and availability for appointment in a bank branch.
+
+            {session_context}
             """,
         ),
+        MessagesPlaceholder(variable_name="chat_history", optional=True),
         ("user", "{input}"),
         MessagesPlaceholder(variable_name="agent_scratchpad"),
     ]
@@ -113,12 +158,16 @@ agent_llm_with_tools = agent_chat_model.bind_tools(agent_tools)
 bank_rag_agent = (
     {
         "input": lambda x: x["input"],
+        "chat_history": lambda x: x.get("chat_history", []),
+        "session_context": lambda x: x.get("session_context", ""),
         "agent_scratchpad": lambda x: format_to_openai_tool_messages(
             x["intermediate_steps"]
         ),
     }
     | agent_prompt
-    | agent_llm_with_tools
+    | traced_runnable(agent_llm_with_tools, "agent_llm").with_config(
+        tags=[AGENT_LLM_TAG]
+    )
     | OpenAIToolsAgentOutputParser()
 )
 
@@ -1,10 +1,20 @@
 import os
+import asyncio
 from langchain_community.graphs import Neo4jGraph
-from langchain_openai import ChatOpenAI
 from langchain.prompts import PromptTemplate
+from langchain_core.documents import Document
 from langchain_community.vectorstores.neo4j_vector import Neo4jVector
-from langchain_openai import OpenAIEmbeddings
 from src.langchain_custom.graph_qa.cypher import GraphCypherQAChain
+from src.utils.example_selector import AdaptiveExampleRetriever
+from src.utils.graph_schema import load_graph_schema
+from src.utils.listing import LISTING_ROW_THRESHOLD
+from src.utils.llm_factory import build_chat_model, build_embeddings
+from src.utils.speculation import Speculation, speculative_task
+from src.utils.token_budget import (
+    CYPHER_GENERATION_TOKEN_BUDGET,
+    QA_GENERATION_TOKEN_BUDGET,
+)
+from src.utils.vector_index import text_node_retrieval_query
 
 NEO4J_URI = os.getenv("NEO4J_URI")
 NEO4J_USERNAME = os.getenv("NEO4J_USERNAME")
@@ -12,6 +22,9 @@ NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD")
 
 BANK_QA_MODEL = os.getenv("BANK_QA_MODEL")
 BANK_CYPHER_MODEL = os.getenv("BANK_CYPHER_MODEL")
+# Reuse the responses to identical Cypher generation and QA prompts
+BANK_CYPHER_LLM_CACHE = os.getenv("BANK_CYPHER_LLM_CACHE", "true").lower() == "true"
+BANK_QA_LLM_CACHE = os.getenv("BANK_QA_LLM_CACHE", "true").lower() == "true"
 NEO4J_URI = os.getenv("NEO4J_URI")
 NEO4J_USERNAME = os.getenv("NEO4J_USERNAME")
 NEO4J_PASSWORD = os.getenv("NEO4J_Password")
@@ -26,25 +39,44 @@ graph = Neo4jGraph(
     url=NEO4J_URI,
     username=NEO4J_USERNAME,
     password=NEO4J_PASSWORD,
+    refresh_schema=False,
 )
 
-graph.refresh_schema()
+# Other workers may already have read the schema into the shared cache
+load_graph_schema(graph)
 
-cypher_example_index = Neo4jVector.from_existing_graph(
-    embedding=OpenAIEmbeddings(),
+# Example question embeddings and the vector index are created by the
+# ETL embedding stage
+cypher_example_index = Neo4jVector.from_existing_index(
+    embedding=build_embeddings(),
     url=NEO4J_URI,
     username=NEO4J_USERNAME,
     password=NEO4J_PASSWORD,
     index_name=NEO4J_CYPHER_EXAMPLES_INDEX_NAME,
-    node_label=NEO4J_CYPHER_EXAMPLES_TEXT_NODE_PROPERTY.capitalize(),
-    text_node_properties=[
-        NEO4J_CYPHER_EXAMPLES_TEXT_NODE_PROPERTY,
-    ],
     text_node_property=NEO4J_CYPHER_EXAMPLES_TEXT_NODE_PROPERTY,
-    embedding_node_property="embedding",
+    # Embeddings come back with the examples for deduplicating them
+    retrieval_query=text_node_retrieval_query(
+        [
+            NEO4J_CYPHER_EXAMPLES_TEXT_NODE_PROPERTY,
+        ],
+        include_embedding=True,
+    ),
+)
+
+# Only examples relevant to the question are included, without
+# near-duplicates
+cypher_example_retriever = AdaptiveExampleRetriever(
+    vectorstore=cypher_example_index, speculative_task="cypher_examples"
 )
 
-cypher_example_retriever = cypher_example_index.as_retriever(search_kwargs={"k": 8})
+
+@speculative_task("cypher_examples")
+async def speculate_cypher_examples(speculation: Speculation) -> list[Document]:
+    vector = await speculation.embed(cypher_example_index.embeddings)
+    return await asyncio.to_thread(
+        cypher_example_retriever.select, speculation.question, vector
+    )
+
 
 cypher_generation_template = """
 Task:
@@ -76,6 +108,8 @@ Warning:
 - Never return a product FAQs about Mortgage node without explicitly returning all of the properties
 besides the embedding property
 - Make sure to use IS NULL or IS NOT NULL when analyzing missing properties.
+- Alias every returned value, e.g. RETURN c.name AS customer_name, c.state AS state.
+Alias customer names as customer_name.
 - You must never include the
 statement "GROUP BY" in your query.
 - Make sure to alias all statements that
@@ -83,6 +117,16 @@ follow as with statement (e.g. WITH c as customer, m.loan_amount as
 loan_amount)
 - If you need to divide numbers, make sure to filter the denominator to be non
 zero.
+- Customer and Mortgage nodes store precomputed summaries: total_fees,
+unpaid_fees, fee type totals such as fees_late_fee, outstanding_due,
+overdue_amount, next_due_date and next_due_amount. Customer nodes also store
+total_paid, payments_made, last_payment_date, mortgage_count and
+total_mortgage_amount. Return them directly instead of aggregating payments
+and fees, unless the question filters those by date or status.
+- Amounts, interest rates and tenures are stored as numbers and dates as native
+DATE values, as shown by the property types in the schema. Compare them directly
+instead of converting them, e.g. m.amount > 500000 or
+f.date_incurred >= date() - duration('P3M').
 
 String category values:
 # Based on the new graph model, add relevant string categories if known. For example:
@@ -140,14 +184,26 @@ qa_generation_prompt = PromptTemplate(
 )
 
 bank_cypher_chain = GraphCypherQAChain.from_llm(
-    cypher_llm=ChatOpenAI(model=BANK_CYPHER_MODEL, temperature=0),
-    qa_llm=ChatOpenAI(model=BANK_QA_MODEL, temperature=0),
+    cypher_llm=build_chat_model(
+        BANK_CYPHER_MODEL, cache_name="cypher" if BANK_CYPHER_LLM_CACHE else None
+    ),
+    qa_llm=build_chat_model(
+        BANK_QA_MODEL, cache_name="cypher_qa" if BANK_QA_LLM_CACHE else None
+    ),
     cypher_example_retriever=cypher_example_retriever,
+    cypher_example_metadata_keys=[NEO4J_CYPHER_EXAMPLES_METADATA_NAME or "cypher"],
     node_properties_to_exclude=["embedding"],
+    # Bookkeeping written by the ETL's embedding stage, not bank data
+    exclude_types=["DataGeneration"],
     graph=graph,
     verbose=True,
     qa_prompt=qa_generation_prompt,
     cypher_prompt=cypher_generation_prompt,
     validate_cypher=True,
     top_k=100,
+    return_intermediate_steps=True,
+    # Long lists of customers, loans or payments are returned as a table
+    listing_row_threshold=LISTING_ROW_THRESHOLD or None,
+    cypher_prompt_token_budget=CYPHER_GENERATION_TOKEN_BUDGET,
+    qa_prompt_token_budget=QA_GENERATION_TOKEN_BUDGET,
 )
\ No newline at end of file
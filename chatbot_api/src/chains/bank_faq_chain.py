@@ -1,30 +1,41 @@
 import os
+import asyncio
+from typing import Optional
 from langchain_community.vectorstores import Neo4jVector
-from langchain_openai import OpenAIEmbeddings
 from langchain.chains import RetrievalQA
-from langchain_openai import ChatOpenAI
 from langchain.prompts import (
     PromptTemplate,
     SystemMessagePromptTemplate,
     HumanMessagePromptTemplate,
     ChatPromptTemplate,
 )
+from langchain_core.documents import Document
+from src.utils.llm_factory import build_chat_model, build_embeddings
+from src.utils.semantic_cache import FAQ_CACHE_ENABLED, SemanticAnswerCache
+from src.utils.shared_cache import shared_cache
+from src.utils.speculation import Speculation, speculative_task, take_speculative
+from src.utils.telemetry import stage_span
+from src.utils.token_budget import FAQ_ANSWER_TOKEN_BUDGET, fit_to_budget
+from src.utils.vector_index import text_node_retrieval_query
 
 BANK_QA_MODEL = os.getenv("BANK_QA_MODEL")
+# Reuse the responses to identical FAQ answer prompts
+BANK_FAQ_LLM_CACHE = os.getenv("BANK_FAQ_LLM_CACHE", "true").lower() == "true"
 
-neo4j_vector_index = Neo4jVector.from_existing_graph(
-    embedding=OpenAIEmbeddings(),
+# FAQ embeddings and the vector index are created by the ETL embedding stage
+neo4j_vector_index = Neo4jVector.from_existing_index(
+    embedding=build_embeddings(),
     url=os.getenv("NEO4J_URI"),
     username=os.getenv("NEO4J_USERNAME"),
     password=os.getenv("NEO4J_PASSWORD"),
     index_name="faqs",
-    node_label="FAQs",
-    text_node_properties=[
-        "question",
-        "answer",
-        "related_topics",
-    ],
-    embedding_node_property="embedding",
+    retrieval_query=text_node_retrieval_query(
+        [
+            "question",
+            "answer",
+            "related_topics",
+        ]
+    ),
 )
 
 review_template = """Your job is to use the provided product FAQs to answer questions about general mortgage-related queries.
@@ -47,8 +58,81 @@ faq_prompt = ChatPromptTemplate(
 )
 
 faq_vector_chain = RetrievalQA.from_chain_type(
-    llm=ChatOpenAI(model=BANK_QA_MODEL, temperature=0),
+    llm=build_chat_model(
+        BANK_QA_MODEL, cache_name="faq" if BANK_FAQ_LLM_CACHE else None
+    ),
     chain_type="stuff",
     retriever=neo4j_vector_index.as_retriever(k=12),
 )
 faq_vector_chain.combine_documents_chain.llm_chain.prompt = faq_prompt
+
+
+def faq_data_generation() -> Optional[str]:
+    """Hash of the FAQ content, recorded by the ETL embedding stage"""
+
+    rows = neo4j_vector_index.query(
+        "MATCH (g:DataGeneration {index_name: 'faqs'}) RETURN g.content_hash AS hash"
+    )
+    return rows[0]["hash"] if rows else None
+
+
+# FAQ answers only depend on the FAQs, so similar questions can share them.
+# Never use this for answers built from customer data.
+faq_answer_cache = SemanticAnswerCache("faq", faq_data_generation, shared=shared_cache)
+
+
+def retrieve_faq_documents(vector: list[float]) -> list[Document]:
+    return neo4j_vector_index.similarity_search_by_vector(
+        vector, **faq_vector_chain.retriever.search_kwargs
+    )
+
+
+@speculative_task("faq_documents")
+async def speculate_faq_documents(
+    speculation: Speculation,
+) -> tuple[list[float], list[Document]]:
+    vector = await speculation.embed(neo4j_vector_index.embeddings)
+    return vector, await asyncio.to_thread(retrieve_faq_documents, vector)
+
+
+def answer_faq_question(question: str) -> dict[str, str]:
+    """Run `faq_vector_chain` with retrieval and answer generation timed as
+    separate stages. Returns the same keys as invoking the chain.
+    Similar questions answered before are served from `faq_answer_cache`."""
+
+    with stage_span("faq_retrieval") as span:
+        speculative = take_speculative("faq_documents", question)
+        span.set_attribute("faq.speculative", speculative is not None)
+        if speculative is not None:
+            vector, documents = speculative
+        else:
+            # Embed once for both the cache lookup and the vector search
+            vector = neo4j_vector_index.embeddings.embed_query(question)
+            documents = None
+        cached_answer = faq_answer_cache.lookup(vector) if FAQ_CACHE_ENABLED else None
+        span.set_attribute("faq.cache_hit", cached_answer is not None)
+        if cached_answer is not None:
+            return {"query": question, "result": cached_answer}
+
+        if documents is None:
+            documents = retrieve_faq_documents(vector)
+        documents = fit_to_budget(
+            documents,
+            lambda docs: faq_prompt.format(
+                context="\n\n".join(doc.page_content for doc in docs),
+                question=question,
+            ),
+            FAQ_ANSWER_TOKEN_BUDGET,
+            "faq_answer_generation",
+        )
+        span.set_attribute("faq.documents", len(documents))
+
+    with stage_span("faq_answer_generation"):
+        answer = faq_vector_chain.combine_documents_chain.invoke(
+            {"input_documents": documents, "question": question}
+        )
+
+    if FAQ_CACHE_ENABLED:
+        faq_answer_cache.store(vector, answer["output_text"])
+
+    return {"query": question, "result": answer["output_text"]}
@@ -1,7 +1,23 @@
 #!/bin/bash
 
 # Run any setup steps or pre-processing tasks here
-echo "Starting hospital RAG FastAPI service..."
+echo "Starting bank chatbot FastAPI service..."
+
+# Worker processes to serve requests with. Workers share caches through a
+# SQLite file, and the state they all need is preloaded into it once.
+API_WORKERS=${API_WORKERS:-1}
+export API_WORKERS
+if [ "$API_WORKERS" -gt 1 ]; then
+    export SHARED_CACHE_PATH=${SHARED_CACHE_PATH:-/tmp/bank_chatbot_cache.sqlite3}
+fi
+if [ -n "$SHARED_CACHE_PATH" ]; then
+    python -m src.preload
+fi
+# Workers sign listing cursors with the same key, so any of them can page
+if [ -z "$LISTING_CURSOR_SECRET" ]; then
+    LISTING_CURSOR_SECRET=$(python -c "import secrets; print(secrets.token_hex(32))")
+    export LISTING_CURSOR_SECRET
+fi
 
 # Start the main application
-uvicorn main:app --host 0.0.0.0 --port 8000
+uvicorn main:app --host 0.0.0.0 --port 8000 --workers "$API_WORKERS"
@@ -21,4 +21,21 @@ The question is:
 CYPHER_GENERATION_WITH_EXAMPLES_PROMPT = PromptTemplate(
     input_variables=["schema", "example_queries", "question"],
     template=CYPHER_GENERATION_WITH_EXAMPLES_TEMPLATE,
-)
\ No newline at end of file
+)
+
+LISTING_SUMMARY_TEMPLATE = """The rows answering a question are shown to the user
+as a table. Write a single sentence introducing the table, e.g. how many rows
+it has and what they are. Do not list the rows.
+
+The question is:
+{question}
+
+The table has {total_rows} rows with the columns {columns}. The first rows are:
+{sample}
+
+Summary:"""
+
+LISTING_SUMMARY_PROMPT = PromptTemplate(
+    input_variables=["question", "total_rows", "columns", "sample"],
+    template=LISTING_SUMMARY_TEMPLATE,
+)
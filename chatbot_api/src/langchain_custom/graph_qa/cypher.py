@@ -24,7 +24,7 @@ from langchain_core.prompts import (
 )
 from langchain_core.documents import Document
 from langchain_core.pydantic_v1 import Field
-from langchain_core.runnables import Runnable, RunnableLambda
+from langchain_core.runnables import Runnable
 
 from langchain_community.chains.graph_qa.cypher_utils import (
     CypherQueryCorrector,
@@ -37,12 +37,35 @@ from langchain_community.chains.graph_qa.prompts import (
 )
 from langchain_community.graphs.graph_store import GraphStore
 from langchain_core.vectorstores import VectorStoreRetriever
-from operator import itemgetter
+from neo4j.exceptions import ClientError
 from src.langchain_custom.graph_qa.custom_prompts import (
     CYPHER_GENERATION_WITH_EXAMPLES_PROMPT,
+    LISTING_SUMMARY_PROMPT,
 )
+from src.utils.graph_queries import QueryRejected, QueryTimeout, read_query
+from src.utils.listing import (
+    LISTING_PAGE_SIZE,
+    can_page,
+    fetch_page,
+    first_page,
+    has_own_order,
+)
+from src.utils.telemetry import record_cypher_examples, stage_span
+from src.utils.token_budget import fit_to_budget
 
 INTERMEDIATE_STEPS_KEY = "intermediate_steps"
+LISTING_KEY = "listing"
+
+# Rows of a listing shown to the QA LLM for writing its summary
+LISTING_SUMMARY_SAMPLE_ROWS = 3
+
+# Answer when the generated query times out, for the agent to rephrase
+QUERY_TIMEOUT_ANSWER = """{error}, since it matched too much of the database.
+Ask again with a narrower question, e.g. about one customer, loan or period."""
+
+# Answer when the generated query tries to write, which retrying won't fix
+QUERY_REJECTED_ANSWER = """{error}, which isn't allowed.
+Only questions that look up or summarize existing data can be answered."""
 
 FUNCTION_RESPONSE_SYSTEM = """You are an assistant that helps to form nice and human
 understandable answers based on the provided information from tools.
@@ -156,8 +179,11 @@ def get_function_response(
     return messages
 
 
-def format_retrieved_documents(documents: list[Document]) -> str:
-    """Format retrieved documents and metadata as a single string"""
+def format_retrieved_documents(
+    documents: list[Document], metadata_keys: Optional[list[str]] = None
+) -> str:
+    """Format retrieved documents and metadata as a single string, keeping
+    only `metadata_keys` when given"""
 
     result = ""
     for doc in documents:
@@ -166,7 +192,8 @@ def format_retrieved_documents(documents: list[Document]) -> str:
         result += f"{page_content}\n"
 
         for key in doc.metadata.keys():
-            result += f"{key}:\n{doc.metadata[key]}"
+            if metadata_keys is None or key in metadata_keys:
+                result += f"{key}:\n{doc.metadata[key]}"
 
         result += "\n\n"
 
@@ -223,8 +250,25 @@ class GraphCypherQAChain(Chain):
     """Whether to wrap the database context as tool/function response"""
     cypher_example_retriever: Optional[VectorStoreRetriever] = None
     """Optional retriever to augment the prompt with example Cypher queries"""
+    cypher_example_metadata_keys: Optional[list[str]] = None
+    """Metadata of the examples to include in the prompt, all when None"""
     node_properties_to_exclude: Optional[list[str]] = None
     """Optional list of node properties to exclude from context in the QA prompt"""
+    cypher_prompt: Optional[BasePromptTemplate] = None
+    """Prompt used to generate Cypher, for counting its tokens"""
+    qa_prompt: Optional[BasePromptTemplate] = None
+    """Prompt used to answer from the query results, for counting its tokens"""
+    cypher_prompt_token_budget: Optional[int] = None
+    """Drop the least similar examples until the Cypher prompt fits"""
+    qa_prompt_token_budget: Optional[int] = None
+    """Drop trailing query results until the QA prompt fits"""
+    listing_row_threshold: Optional[int] = None
+    """Return results with more rows than this as a paged listing, with a
+    one-line summary instead of an answer written from every row"""
+    listing_page_size: int = LISTING_PAGE_SIZE
+    """Rows in each page of a listing"""
+    listing_summary_chain: Optional[Runnable] = None
+    """Writes the summary of a listing"""
 
     @property
     def input_keys(self) -> List[str]:
@@ -322,21 +366,19 @@ class GraphCypherQAChain(Chain):
                 qa_chain = response_prompt | qa_llm | StrOutputParser()  # type: ignore
             except (NotImplementedError, AttributeError):
                 raise ValueError("Provided LLM does not support native tools/functions")
+            qa_prompt = response_prompt
         else:
             qa_chain = LLMChain(llm=qa_llm, **use_qa_llm_kwargs)  # type: ignore[arg-type]
+            qa_prompt = use_qa_llm_kwargs["prompt"]
 
+        # A cypher_prompt given with an example retriever must take the
+        # {example_queries} variable
+        generation_prompt = use_cypher_llm_kwargs["prompt"]
         if cypher_example_retriever is not None:
+            # Examples are retrieved in `_call` so retrieval and generation
+            # are timed as separate stages
             cypher_generation_chain = (
-                {
-                    "example_queries": itemgetter("question")
-                    | cypher_example_retriever
-                    | RunnableLambda(format_retrieved_documents),
-                    "schema": itemgetter("schema"),
-                    "question": itemgetter("question"),
-                }
-                | CYPHER_GENERATION_PROMPT_USE
-                | cypher_llm
-                | StrOutputParser()
+                generation_prompt | (cypher_llm or llm) | StrOutputParser()
             )
         else:
             cypher_generation_chain = LLMChain(
@@ -369,9 +411,40 @@ class GraphCypherQAChain(Chain):
             use_function_response=use_function_response,
             cypher_example_retriever=cypher_example_retriever,
             node_properties_to_exclude=node_properties_to_exclude,
+            cypher_prompt=generation_prompt,
+            qa_prompt=qa_prompt,
+            listing_summary_chain=LISTING_SUMMARY_PROMPT | qa_llm | StrOutputParser(),
             **kwargs,
         )
 
+    def _fetch_listing(
+        self, query: str, rows: List[Dict[str, Any]], truncated: bool
+    ) -> Optional[dict]:
+        """First page of the results of `query`, or None when they can't be
+        paged, e.g. because a column isn't aliased.
+
+        When `rows` are all of the results, the page is cut from them, and
+        their count is the listing's total. Otherwise the page is queried,
+        and counting the total is left to clients that ask for it.
+        """
+
+        columns = list(rows[0])
+        if not truncated:
+            listing = first_page(query, columns, rows, self.listing_page_size)
+            if listing is not None:
+                return {**listing, "total_rows": len(rows)}
+
+        with stage_span("listing_query") as span:
+            try:
+                listing = fetch_page(
+                    self.graph, query, columns, page_size=self.listing_page_size
+                )
+            except (ValueError, ClientError, QueryTimeout) as e:
+                print(f"Answering from all rows, since they can't be paged: {e}")
+                return None
+            span.set_attribute("neo4j.rows", len(listing["rows"]))
+        return {**listing, "total_rows": None if truncated else len(rows)}
+
     def _call(
         self,
         inputs: Dict[str, Any],
@@ -385,22 +458,52 @@ class GraphCypherQAChain(Chain):
         intermediate_steps: List = []
 
         if self.cypher_example_retriever:
-            generated_cypher = self.cypher_generation_chain.invoke(
-                {"schema": self.graph_schema, "question": question},
-                {"callbacks": callbacks},
-            )
+            with stage_span("cypher_example_retrieval") as span:
+                examples = self.cypher_example_retriever.invoke(
+                    question, {"callbacks": callbacks}
+                )
+                if self.cypher_prompt is not None:
+                    examples = fit_to_budget(
+                        examples,
+                        lambda docs: self.cypher_prompt.format(
+                            schema=self.graph_schema,
+                            question=question,
+                            example_queries=format_retrieved_documents(
+                                docs, self.cypher_example_metadata_keys
+                            ),
+                        ),
+                        self.cypher_prompt_token_budget,
+                        "cypher_generation",
+                    )
+                example_queries = format_retrieved_documents(
+                    examples, self.cypher_example_metadata_keys
+                )
+                span.set_attribute("cypher.examples", len(examples))
+                record_cypher_examples(len(examples))
+            with stage_span("cypher_generation"):
+                generated_cypher = self.cypher_generation_chain.invoke(
+                    {
+                        "schema": self.graph_schema,
+                        "question": question,
+                        "example_queries": example_queries,
+                    },
+                    {"callbacks": callbacks},
+                )
 
         else:
-            generated_cypher = self.cypher_generation_chain.run(
-                {"question": question, "schema": self.graph_schema}, callbacks=callbacks
-            )
+            with stage_span("cypher_generation"):
+                generated_cypher = self.cypher_generation_chain.run(
+                    {"question": question, "schema": self.graph_schema},
+                    callbacks=callbacks,
+                )
 
         # Extract Cypher code if it is wrapped in backticks
         generated_cypher = extract_cypher(generated_cypher)
 
         # Correct Cypher query if enabled
         if self.cypher_query_corrector:
-            generated_cypher = self.cypher_query_corrector(generated_cypher)
+            with stage_span("cypher_correction"):
+                generated_cypher = self.cypher_query_corrector(generated_cypher)
 
         _run_manager.on_text("Generated Cypher:", end="\n", verbose=self.verbose)
         _run_manager.on_text(
@@ -408,21 +511,81 @@ class GraphCypherQAChain(Chain):
         )
 
         intermediate_steps.append({"query": generated_cypher})
+        listing = None
+        query_error = None
 
         # Retrieve and limit the number of results
         # Generated Cypher be null if query corrector identifies invalid schema
         if generated_cypher:
-            context = self.graph.query(generated_cypher)[: self.top_k]
+            with stage_span("neo4j_query") as span:
+                try:
+                    context, truncated = read_query(
+                        self.graph, generated_cypher, max_rows=self.top_k
+                    )
+                except QueryTimeout as e:
+                    query_error = QUERY_TIMEOUT_ANSWER.format(error=e)
+                    context, truncated = [], False
+                except QueryRejected as e:
+                    query_error = QUERY_REJECTED_ANSWER.format(error=e)
+                    context, truncated = [], False
+                span.set_attribute("neo4j.rows", len(context))
+                span.set_attribute("neo4j.truncated", truncated)
+
+            # Long results are paged rather than written out by the QA LLM
+            if (
+                self.listing_row_threshold
+                and not self.return_direct
+                and len(context) > self.listing_row_threshold
+                and can_page(context[0])
+                # Listings are ordered by every column, not the query's order
+                and not has_own_order(generated_cypher)
+            ):
+                listing = self._fetch_listing(generated_cypher, context, truncated)
 
             if self.node_properties_to_exclude and isinstance(context, list):
                 context = remove_keys_from_dicts(
                     context, self.node_properties_to_exclude
                 )
 
+            if (
+                self.qa_prompt is not None
+                and not self.return_direct
+                and listing is None
+            ):
+                context = fit_to_budget(
+                    context,
+                    lambda rows: self.qa_prompt.format(
+                        question=question,
+                        **(
+                            {"function_response": get_function_response(question, rows)}
+                            if self.use_function_response
+                            else {"context": rows}
+                        ),
+                    ),
+                    self.qa_prompt_token_budget,
+                    "qa_generation",
+                )
+
         else:
             context = []
 
-        if self.return_direct:
+        if query_error is not None:
+            intermediate_steps.append({"error": query_error})
+            final_result = query_error
+        elif listing is not None:
+            intermediate_steps.append({"context": listing["rows"]})
+            with stage_span("listing_summary"):
+                final_result = self.listing_summary_chain.invoke(  # type: ignore
+                    {
+                        "question": question,
+                        "total_rows": listing["total_rows"]
+                        or f"more than {len(context)}",
+                        "columns": ", ".join(listing["columns"]),
+                        "sample": listing["rows"][:LISTING_SUMMARY_SAMPLE_ROWS],
+                    },
+                    {"callbacks": callbacks},
+                )
+        elif self.return_direct:
             final_result = context
         else:
             _run_manager.on_text("Full Context:", end="\n", verbose=self.verbose)
@@ -431,19 +594,22 @@ class GraphCypherQAChain(Chain):
             )
 
             intermediate_steps.append({"context": context})
-            if self.use_function_response:
-                function_response = get_function_response(question, context)
-                final_result = self.qa_chain.invoke(  # type: ignore
-                    {"question": question, "function_response": function_response},
-                )
-            else:
-                result = self.qa_chain.invoke(  # type: ignore
-                    {"question": question, "context": context},
-                    callbacks=callbacks,
-                )
-                final_result = result[self.qa_chain.output_key]  # type: ignore
+            with stage_span("qa_generation"):
+                if self.use_function_response:
+                    function_response = get_function_response(question, context)
+                    final_result = self.qa_chain.invoke(  # type: ignore
+                        {"question": question, "function_response": function_response},
+                    )
+                else:
+                    result = self.qa_chain.invoke(  # type: ignore
+                        {"question": question, "context": context},
+                        callbacks=callbacks,
+                    )
+                    final_result = result[self.qa_chain.output_key]  # type: ignore
 
         chain_result: Dict[str, Any] = {self.output_key: final_result}
+        if listing is not None:
+            chain_result[LISTING_KEY] = listing
         if self.return_intermediate_steps:
             chain_result[INTERMEDIATE_STEPS_KEY] = intermediate_steps
 
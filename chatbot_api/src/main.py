@@ -1,7 +1,60 @@
-from fastapi import FastAPI
+import os
+import json
+import asyncio
+from contextlib import AsyncExitStack
+from itertools import islice
+from typing import Any, AsyncIterator, Awaitable, Optional, TypeVar
+import openai
+from fastapi import FastAPI, Header, HTTPException, Request
+from fastapi.responses import (
+    JSONResponse,
+    PlainTextResponse,
+    Response,
+    StreamingResponse,
+)
+from starlette.background import BackgroundTask
 from src.agents.bank_rag_agent import bank_rag_agent_executor
-from src.models.bank_rag_query import BankQueryInput, BankQueryOutput
+from src.chains.bank_cypher_chain import graph
+from src.models.bank_rag_query import (
+    BankQueryInput,
+    BankQueryOutput,
+    Listing,
+    ListingPageInput,
+)
+from src.utils.admission import Overloaded, admission_controller
+from src.utils.agent_stream import stream_agent_events
 from src.utils.async_utils import async_retry
+from src.utils.graph_queries import QueryTimeout, cancel_queries_on_exit
+from src.utils.listing import (
+    InvalidCursor,
+    collect_listings,
+    count_listing,
+    decode_cursor,
+    fetch_next_page,
+    iter_listing_rows,
+)
+from src.utils.profiling import (
+    PROFILE_ADMIN_TOKEN,
+    PROFILE_HEADER,
+    profile_store,
+    run_profiled,
+    should_profile,
+)
+from src.utils.sessions import collect_entities, session_store
+from src.utils.single_flight import SingleFlight, flight_key
+from src.utils.speculation import speculate
+from src.utils.telemetry import collect_timings, metrics, stage_span
+
+# Share one agent run between identical questions asked at the same time
+SINGLE_FLIGHT_ENABLED = os.getenv("SINGLE_FLIGHT_ENABLED", "true").lower() == "true"
+# Rows read from Neo4j and sent together when streaming a listing
+LISTING_STREAM_PAGE_SIZE = int(os.getenv("LISTING_STREAM_PAGE_SIZE", "1000"))
+# Seconds between checks that the client is still waiting for an answer
+DISCONNECT_POLL_SECONDS = 0.5
+
+T = TypeVar("T")
+
+agent_flight = SingleFlight("agent")
 
 app = FastAPI(
     title="Retail Bank Chatbot",
@@ -9,14 +62,80 @@ app = FastAPI(
 )
 
 
-@async_retry(max_retries=10, delay=1)
-async def invoke_agent_with_retry(query: str):
+@app.exception_handler(Overloaded)
+async def overloaded_handler(request: Request, exc: Overloaded):
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+# Retrying overload errors would only add to the load
+@async_retry(max_retries=10, delay=1, give_up_on=(Overloaded, openai.RateLimitError))
+async def invoke_agent_with_retry(agent_input: dict[str, Any]):
     """
     Retry the agent if a tool fails to run. This can help when there
     are intermittent connection issues to external APIs.
     """
 
-    return await bank_rag_agent_executor.ainvoke({"input": query})
+    with stage_span("agent"):
+        return await bank_rag_agent_executor.ainvoke(agent_input)
+
+
+async def invoke_agent_with_entities(agent_input: dict[str, Any], profile: bool):
+    """Run the agent, profiled if `profile`, and return its response with
+    the last listing a tool returned and the profile's id, and the entities
+    it resolved"""
+
+    profile_id = None
+    async with admission_controller.slot(), cancel_queries_on_exit(graph):
+        with collect_entities() as entities, collect_listings() as listings:
+            with speculate(agent_input["input"]):
+                if profile:
+                    response, profile_id = await asyncio.to_thread(
+                        invoke_agent_profiled, agent_input
+                    )
+                else:
+                    response = await invoke_agent_with_retry(agent_input)
+    listing = listings[-1] if listings else None
+    return {**response, "listing": listing, "profile_id": profile_id}, entities
+
+
+async def unless_disconnected(request: Request, awaitable: Awaitable[T]) -> T:
+    """
+    Await the answer to a request, cancelling it if the client disconnects
+    first, so its Neo4j queries don't keep running for nobody
+    """
+
+    task = asyncio.ensure_future(awaitable)
+    while True:
+        done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_SECONDS)
+        if done:
+            return task.result()
+        if await request.is_disconnected():
+            task.cancel()
+            raise HTTPException(499, "Client closed the request")
+
+
+def invoke_agent_profiled(agent_input: dict[str, Any]):
+    """
+    Run the agent synchronously under the profiler. Tools then run in the
+    same thread, so the profile covers the whole invocation.
+    """
+
+    def invoke():
+        with stage_span("agent"):
+            return bank_rag_agent_executor.invoke(agent_input)
+
+    return run_profiled(invoke, agent_input["input"])
+
+
+def require_admin(token: Optional[str]) -> None:
+    if not PROFILE_ADMIN_TOKEN:
+        raise HTTPException(403, "Set PROFILE_ADMIN_TOKEN to enable profile access")
+    if token != PROFILE_ADMIN_TOKEN:
+        raise HTTPException(403, "Invalid admin token")
 
 
 @app.get("/")
@@ -24,11 +143,167 @@ async def get_status():
     return {"status": "running"}
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Latency histograms per stage and per tool in the Prometheus format"""
+
+    return metrics.render_prometheus()
+
+
+@app.get("/admin/profiles")
+async def list_profiles(x_admin_token: Optional[str] = Header(None)):
+    require_admin(x_admin_token)
+    return profile_store.list()
+
+
+@app.get("/admin/profiles/{profile_id}")
+async def download_profile(
+    profile_id: str, x_admin_token: Optional[str] = Header(None)
+):
+    """The profile in cProfile's file format, e.g. for pstats or snakeviz"""
+
+    require_admin(x_admin_token)
+    record = profile_store.get(profile_id)
+    if record is None:
+        raise HTTPException(404, f"No profile {profile_id}")
+    return Response(
+        record.stats,
+        media_type="application/octet-stream",
+        headers={"Content-Disposition": f'attachment; filename="{profile_id}.prof"'},
+    )
+
+
+@app.get("/admin/profiles/{profile_id}/summary", response_class=PlainTextResponse)
+async def get_profile_summary(
+    profile_id: str, x_admin_token: Optional[str] = Header(None)
+):
+    require_admin(x_admin_token)
+    record = profile_store.get(profile_id)
+    if record is None:
+        raise HTTPException(404, f"No profile {profile_id}")
+    return record.summary
+
+
 @app.post("/bank-rag-agent")
-async def ask_bank_agent(query: BankQueryInput) -> BankQueryOutput:
-    query_response = await invoke_agent_with_retry(query.text)
+async def ask_bank_agent(query: BankQueryInput, request: Request) -> BankQueryOutput:
+    session = session_store.get(query.session_id)
+    agent_input = {"input": query.text, **session.agent_inputs()}
+
+    profile = should_profile(
+        request.headers.get(PROFILE_HEADER), request.headers.get("X-Admin-Token")
+    )
+    coalesced = False
+    with collect_timings() as timings:
+        with stage_span("request"):
+            if SINGLE_FLIGHT_ENABLED:
+                key = flight_key(
+                    query.text,
+                    {
+                        "history": session.history,
+                        "summary": session.summary,
+                        "entities": session.entities,
+                        # Only profiled runs return a profile
+                        "profile": profile,
+                    },
+                )
+                (query_response, entities), coalesced = await unless_disconnected(
+                    request,
+                    agent_flight.do(
+                        key, lambda: invoke_agent_with_entities(agent_input, profile)
+                    ),
+                )
+                # Coalesced requests share the response, so copy it
+                query_response = dict(query_response)
+            else:
+                query_response, entities = await unless_disconnected(
+                    request, invoke_agent_with_entities(agent_input, profile)
+                )
+
+    session.entities.update(entities)
+    session.add_turn(query.text, query_response["output"])
+    session_store.save(session)
+
+    query_response["session_id"] = session.id
     query_response["intermediate_steps"] = [
         str(s) for s in query_response["intermediate_steps"]
     ]
+    if query.include_timings:
+        query_response["timings"] = timings
+    query_response["coalesced"] = coalesced
 
     return query_response
+
+
+@app.post("/bank-rag-agent/stream")
+async def stream_bank_agent(query: BankQueryInput) -> StreamingResponse:
+    """Answer like /bank-rag-agent, streaming the answer as it's generated"""
+
+    session = session_store.get(query.session_id)
+    agent_input = {"input": query.text, **session.agent_inputs()}
+
+    # Wait for admission before responding, so overload is still a 429/503.
+    # The slot is released when the stream ends, or after the response if
+    # the client disconnects before the stream starts.
+    admission = AsyncExitStack()
+    await admission.enter_async_context(admission_controller.slot())
+
+    return StreamingResponse(
+        stream_agent_events(
+            bank_rag_agent_executor, graph, query, session, agent_input, admission
+        ),
+        media_type="application/x-ndjson",
+        background=BackgroundTask(admission.aclose),
+    )
+
+
+@app.post("/bank-rag-agent/listing")
+async def get_listing_page(page: ListingPageInput) -> Listing:
+    """The next page of a listing returned with an answer, read straight
+    from Neo4j without calling an LLM"""
+
+    try:
+        with stage_span("listing_query"):
+            listing = await asyncio.to_thread(fetch_next_page, graph, page.cursor)
+            if page.include_total:
+                listing["total_rows"] = await asyncio.to_thread(
+                    count_listing, graph, page.cursor
+                )
+            return listing
+    except InvalidCursor as e:
+        raise HTTPException(400, str(e))
+    except QueryTimeout as e:
+        raise HTTPException(504, str(e))
+
+
+async def stream_listing_rows(cursor: str) -> AsyncIterator[str]:
+    """Yield every row from the cursor on as newline-delimited JSON, read
+    in chunks from the result of a single query"""
+
+    rows = iter_listing_rows(graph, cursor)
+    try:
+        while True:
+            with stage_span("listing_query"):
+                chunk = await asyncio.to_thread(
+                    lambda: list(islice(rows, LISTING_STREAM_PAGE_SIZE))
+                )
+            if not chunk:
+                break
+            yield "".join(json.dumps(row, default=str) + "\n" for row in chunk)
+    finally:
+        # Ends the query if the client stops reading early
+        await asyncio.to_thread(rows.close)
+
+
+@app.post("/bank-rag-agent/listing/stream")
+async def stream_listing(page: ListingPageInput) -> StreamingResponse:
+    """Stream the rest of a listing, e.g. to export it"""
+
+    # Checked up front, so a bad cursor is a 400 rather than a broken stream
+    try:
+        decode_cursor(page.cursor)
+    except InvalidCursor as e:
+        raise HTTPException(400, str(e))
+
+    return StreamingResponse(
+        stream_listing_rows(page.cursor), media_type="application/x-ndjson"
+    )
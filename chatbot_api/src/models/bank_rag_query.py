@@ -1,11 +1,39 @@
-from pydantic import BaseModel
+from typing import Any, Optional
+from pydantic import BaseModel, Field
 
 
 class BankQueryInput(BaseModel):
     text: str
+    session_id: Optional[str] = Field(None, max_length=128)
+    include_timings: bool = False
+
+
+class StageTiming(BaseModel):
+    name: str
+    kind: str
+    duration_ms: float
+    status: str
+    prompt_tokens: Optional[int] = None
+
+
+class Listing(BaseModel):
+    columns: list[str]
+    rows: list[dict[str, Any]]
+    next_cursor: Optional[str] = None
+    total_rows: Optional[int] = None
+
+
+class ListingPageInput(BaseModel):
+    cursor: str
+    include_total: bool = False
 
 
 class BankQueryOutput(BaseModel):
     input: str
     output: str
+    session_id: str
     intermediate_steps: list[str]
+    timings: Optional[list[StageTiming]] = None
+    profile_id: Optional[str] = None
+    coalesced: bool = False
+    listing: Optional[Listing] = None
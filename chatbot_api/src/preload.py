@@ -0,0 +1,29 @@
+"""
+Preload the read-only state every API worker needs into the shared cache,
+so that starting several workers reads it from Neo4j once instead of once
+per worker. Run before starting uvicorn with `python -m src.preload`.
+"""
+
+import os
+from langchain_community.graphs import Neo4jGraph
+from src.utils.graph_schema import refresh_shared_schema
+from src.utils.shared_cache import SHARED_CACHE_PATH, shared_cache
+
+
+def preload() -> None:
+    if shared_cache is None:
+        print("SHARED_CACHE_PATH is not set, nothing to preload")
+        return
+
+    graph = Neo4jGraph(
+        url=os.getenv("NEO4J_URI"),
+        username=os.getenv("NEO4J_USERNAME"),
+        password=os.getenv("NEO4J_PASSWORD"),
+        refresh_schema=False,
+    )
+    refresh_shared_schema(graph)
+    print(f"Preloaded the graph schema into {SHARED_CACHE_PATH}")
+
+
+if __name__ == "__main__":
+    preload()
@@ -0,0 +1,233 @@
+import os
+import time
+import heapq
+import hashlib
+import threading
+from dataclasses import dataclass
+from typing import Callable, Optional, Protocol
+import numpy as np
+
+# Simulated time advances in steps of this many seconds. Wait times stay
+# the same within a step, e.g. across the tool calls of one agent turn.
+BRANCH_QUEUE_STEP_SECONDS = float(os.getenv("BRANCH_QUEUE_STEP_SECONDS", "60"))
+# Queues are simulated from empty at fixed multiples of this many steps,
+# at least this many steps before the answer
+BRANCH_QUEUE_WARMUP_STEPS = int(os.getenv("BRANCH_QUEUE_WARMUP_STEPS", "120"))
+# Customers turn away once a queue is this long
+BRANCH_QUEUE_MAX_LENGTH = int(os.getenv("BRANCH_QUEUE_MAX_LENGTH", "60"))
+BRANCH_QUEUE_SEED = int(os.getenv("BRANCH_QUEUE_SEED", "0"))
+
+
+@dataclass
+class QueueObservation:
+    """Measured state of a branch's queue"""
+
+    queue_length: int
+    tellers: Optional[int] = None
+
+
+class QueueFeed(Protocol):
+    """Source of real queue data, e.g. a branch ticketing system.
+
+    Branches it reports on use the observed state instead of the
+    simulated one.
+    """
+
+    def read(self, branches: list[str]) -> dict[str, QueueObservation]: ...
+
+
+def _branch_rng(seed: int, name: str) -> np.random.Generator:
+    digest = hashlib.sha256(f"{seed}:{name}".encode()).digest()
+    return np.random.default_rng(int.from_bytes(digest[:8], "little"))
+
+
+class BranchQueueModel:
+    """Every branch as a multi-teller queue, simulated for all at once.
+
+    Each step draws Poisson arrivals and services for every branch with
+    one NumPy call each. Random draws are seeded by the wall clock step,
+    and queues start empty at steps that are multiples of the warmup, so
+    every process simulates the same queues whenever it started. The
+    wait at a branch is its queue length over its service capacity.
+
+    Min-heaps of waits answer "most available" queries in O(k log N),
+    one over all branches and one per state, so a query for a state only
+    touches that state's branches. They are rebuilt once per step;
+    branches updated between steps push a new entry and their old ones
+    are skipped when popped.
+    """
+
+    def __init__(
+        self,
+        step_seconds: float = BRANCH_QUEUE_STEP_SECONDS,
+        warmup_steps: int = BRANCH_QUEUE_WARMUP_STEPS,
+        max_queue_length: int = BRANCH_QUEUE_MAX_LENGTH,
+        seed: int = BRANCH_QUEUE_SEED,
+        feed: Optional[QueueFeed] = None,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.step_seconds = step_seconds
+        self.warmup_steps = warmup_steps
+        self.max_queue_length = max_queue_length
+        self.seed = seed
+        self.feed = feed
+        self.clock = clock
+
+        self.names: list[str] = []
+        self.states: list[Optional[str]] = []
+        self._index: dict[str, int] = {}
+        # Branch indexes by lowercased state
+        self._partitions: dict[str, list[int]] = {}
+        # Customers per minute
+        self.arrival_rate = np.zeros(0)
+        # Customers per minute served by one teller
+        self.service_rate = np.zeros(0)
+        self.tellers = np.zeros(0, dtype=np.int64)
+        self.queue_length = np.zeros(0, dtype=np.int64)
+
+        self._step: Optional[int] = None
+        # Step the current simulation started from empty queues
+        self._origin: Optional[int] = None
+        # Heaps by state, None holding every branch
+        self._heaps: dict[Optional[str], list[tuple[float, int, int]]] = {}
+        self._versions = np.zeros(0, dtype=np.int64)
+        self._lock = threading.Lock()
+
+    def set_branches(
+        self, names: list[str], states: Optional[list[Optional[str]]] = None
+    ) -> None:
+        """Model these branches, with parameters derived from their names"""
+
+        states = states or [None] * len(names)
+        with self._lock:
+            branch_states = dict(zip(names, states))
+            names = list(branch_states)
+            states = [s.lower() if s else None for s in branch_states.values()]
+            if names == self.names and states == self.states:
+                return
+
+            tellers, service_rate, arrival_rate = [], [], []
+            for name in names:
+                rng = _branch_rng(self.seed, name)
+                tellers.append(rng.integers(1, 7))
+                # 3 to 10 minutes per customer
+                service_rate.append(1 / rng.uniform(3, 10))
+                # Busy branches run close to, or past, their capacity
+                arrival_rate.append(
+                    tellers[-1] * service_rate[-1] * rng.uniform(0.5, 1.05)
+                )
+
+            self.names = names
+            self.states = states
+            self._index = {name: i for i, name in enumerate(names)}
+            self._partitions = {}
+            for i, state in enumerate(states):
+                if state:
+                    self._partitions.setdefault(state, []).append(i)
+            self.tellers = np.array(tellers, dtype=np.int64)
+            self.service_rate = np.array(service_rate)
+            self.arrival_rate = np.array(arrival_rate)
+            self.queue_length = np.zeros(len(names), dtype=np.int64)
+            self._versions = np.zeros(len(names), dtype=np.int64)
+            # Warm up again from empty queues
+            self._step = None
+
+    def _advance(self) -> None:
+        step = int(self.clock() // self.step_seconds)
+        warmup = max(1, self.warmup_steps)
+        origin = (step // warmup - 1) * warmup
+        if origin != self._origin or self._step is None or step < self._step:
+            self.queue_length[:] = 0
+            self._origin = self._step = origin
+        if step == self._step and self._heaps:
+            return
+
+        minutes = self.step_seconds / 60
+        capacity = self.tellers * self.service_rate * minutes
+        for k in range(self._step + 1, step + 1):
+            rng = np.random.default_rng([self.seed, k])
+            arrivals = rng.poisson(self.arrival_rate * minutes)
+            served = rng.poisson(capacity)
+            np.clip(
+                self.queue_length + arrivals - served,
+                0,
+                self.max_queue_length,
+                out=self.queue_length,
+            )
+        self._step = step
+
+        if self.feed is not None:
+            for name, observation in self.feed.read(self.names).items():
+                self._observe(name, observation)
+        self._rebuild_heaps()
+
+    def _observe(self, name: str, observation: QueueObservation) -> None:
+        i = self._index.get(name)
+        if i is None:
+            return
+        self.queue_length[i] = observation.queue_length
+        if observation.tellers:
+            self.tellers[i] = observation.tellers
+
+    def wait_minutes(self) -> np.ndarray:
+        return self.queue_length / (self.tellers * self.service_rate)
+
+    def _rebuild_heaps(self) -> None:
+        self._versions += 1
+        entries = list(zip(self.wait_minutes(), self._versions, range(len(self.names))))
+        self._heaps = {None: entries}
+        for state, indexes in self._partitions.items():
+            self._heaps[state] = [entries[i] for i in indexes]
+        for heap in self._heaps.values():
+            heapq.heapify(heap)
+
+    def update(self, name: str, observation: QueueObservation) -> None:
+        """Apply an observation pushed by a feed between steps"""
+
+        with self._lock:
+            i = self._index.get(name)
+            if i is None:
+                return
+            self._observe(name, observation)
+            self._versions[i] += 1
+            wait = self.queue_length[i] / (self.tellers[i] * self.service_rate[i])
+            entry = (wait, int(self._versions[i]), i)
+            for state in {None, self.states[i]}:
+                if state in self._heaps:
+                    heapq.heappush(self._heaps[state], entry)
+
+    def wait_time(self, name: str) -> Optional[int]:
+        """Current wait at a branch in minutes, None for unknown branches"""
+
+        with self._lock:
+            i = self._index.get(name)
+            if i is None:
+                return None
+            self._advance()
+            return round(
+                self.queue_length[i] / (self.tellers[i] * self.service_rate[i])
+            )
+
+    def most_available(
+        self, k: int = 1, state: Optional[str] = None
+    ) -> list[tuple[str, int]]:
+        """The `k` branches with the shortest waits, shortest first,
+        optionally only those in `state`"""
+
+        with self._lock:
+            if not self.names:
+                return []
+            self._advance()
+
+            heap = self._heaps.get(state.lower() if state else None, [])
+            best: list[tuple[float, int, int]] = []
+            while heap and len(best) < k:
+                entry = heapq.heappop(heap)
+                wait, version, i = entry
+                # Entries superseded by an update are dropped for good
+                if version == self._versions[i]:
+                    best.append(entry)
+            for entry in best:
+                heapq.heappush(heap, entry)
+
+            return [(self.names[i], round(wait)) for wait, _, i in best]
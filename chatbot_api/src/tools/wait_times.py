@@ -1,38 +1,63 @@
 import os
-from typing import Any
-import numpy as np
+import time
+from typing import Any, Optional
 from langchain_community.graphs import Neo4jGraph
+from src.tools.branch_queues import BranchQueueModel
+from src.utils.telemetry import stage_span
+
+# Branch names are read from Neo4j at most this often
+BRANCH_NAMES_REFRESH_SECONDS = float(os.getenv("BRANCH_NAMES_REFRESH_SECONDS", "300"))
+# Branches returned by a least busy branches search
+LEAST_BUSY_BRANCHES_TOP_K = int(os.getenv("LEAST_BUSY_BRANCHES_TOP_K", "3"))
+
+branch_queues = BranchQueueModel()
+
+_graph: Optional[Neo4jGraph] = None
+_branches_loaded_at = float("-inf")
+
+
+def _get_graph() -> Neo4jGraph:
+    global _graph
+
+    if _graph is None:
+        _graph = Neo4jGraph(
+            url=os.getenv("NEO4J_URI"),
+            username=os.getenv("NEO4J_USERNAME"),
+            password=os.getenv("NEO4J_PASSWORD"),
+            refresh_schema=False,
+        )
+    return _graph
 
 
 def _get_current_branches() -> list[str]:
     """Fetch a list of current branch names from a Neo4j database."""
-    graph = Neo4jGraph(
-        url=os.getenv("NEO4J_URI"),
-        username=os.getenv("NEO4J_USERNAME"),
-        password=os.getenv("NEO4J_PASSWORD"),
-    )
-
-    current_branches = graph.query(
-        """
-        MATCH (h:Branch)
-        RETURN h.name AS branch_name
-        """
+    global _branches_loaded_at
+
+    if time.monotonic() - _branches_loaded_at < BRANCH_NAMES_REFRESH_SECONDS:
+        return branch_queues.names
+
+    with stage_span("neo4j_branch_lookup"):
+        current_branches = _get_graph().query(
+            """
+            MATCH (h:Branch)
+            RETURN h.name AS branch_name, h.state_name AS state_name
+            """
+        )
+    branch_queues.set_branches(
+        [d["branch_name"].lower() for d in current_branches],
+        [d.get("state_name") for d in current_branches],
     )
-    print("Messi",current_branches)
-    current_branches = [d["branch_name"].lower() for d in current_branches]
-    print (current_branches)
-    return current_branches
+    _branches_loaded_at = time.monotonic()
+    return branch_queues.names
 
 
 def _get_current_wait_time_minutes(branch: str) -> int:
     """Get the current wait time at a branch in minutes."""
 
-    current_branches = _get_current_branches()
+    _get_current_branches()
+    wait_time = branch_queues.wait_time(branch.lower())
 
-    if branch.lower() not in current_branches:
-        return -1
-
-    return np.random.randint(low=0, high=600)
+    return -1 if wait_time is None else wait_time
 
 
 def get_current_wait_times(branch: str) -> str:
@@ -56,12 +81,46 @@ def get_current_wait_times(branch: str) -> str:
 def get_most_available_branch(tmp: Any) -> dict[str, float]:
     """Find the branch with the shortest wait time."""
 
-    current_branches = _get_current_branches()
+    _get_current_branches()
+
+    return dict(branch_queues.most_available(1))
+
+
+def _get_customer_state(customer: str) -> Optional[str]:
+    """State of a customer given their ID or full name."""
+
+    with stage_span("neo4j_customer_state_lookup"):
+        rows = _get_graph().query(
+            """
+            MATCH (c:Customer)
+            WHERE c.id = $customer OR toLower(c.name) = toLower($customer)
+            RETURN c.state AS state
+            LIMIT 1
+            """,
+            {"customer": customer.strip()},
+        )
+    return rows[0]["state"] if rows else None
+
+
+def get_least_busy_branches(
+    state: Optional[str] = None,
+    customer: Optional[str] = None,
+    k: int = LEAST_BUSY_BRANCHES_TOP_K,
+) -> dict[str, int] | str:
+    """Find the branches with the shortest wait times in a state, or in
+    a customer's state."""
+
+    _get_current_branches()
 
-    current_wait_times = [_get_current_wait_time_minutes(h) for h in current_branches]
+    if not state and customer:
+        state = _get_customer_state(customer)
+        if state is None:
+            return f"Customer '{customer}' does not exist or has no state."
+    if not state:
+        return "Provide a state or a customer to search branches in."
 
-    best_time_idx = np.argmin(current_wait_times)
-    best_branch = current_branches[best_time_idx]
-    best_wait_time = current_wait_times[best_time_idx]
+    least_busy = branch_queues.most_available(k, state=state)
+    if not least_busy:
+        return f"There are no branches in {state}."
 
-    return {best_branch: best_wait_time}
+    return dict(least_busy)
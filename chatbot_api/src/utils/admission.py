@@ -0,0 +1,107 @@
+import os
+import math
+import time
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+from src.utils.telemetry import metrics, stage_span
+
+# Agent runs in progress at once, later requests wait in a queue
+ADMISSION_MAX_CONCURRENCY = int(os.getenv("ADMISSION_MAX_CONCURRENCY", "32"))
+# Requests beyond this many waiting are rejected with a 429
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "64"))
+# Requests waiting longer than this are rejected with a 503
+ADMISSION_QUEUE_TIMEOUT_SECONDS = float(
+    os.getenv("ADMISSION_QUEUE_TIMEOUT_SECONDS", "10")
+)
+
+
+class Overloaded(Exception):
+    """The request was rejected to protect the service, retry after a delay"""
+
+    def __init__(self, message: str, status_code: int, retry_after: float):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+class AdmissionController:
+    """Bound the agent runs in progress and the requests waiting for one.
+
+    Rejecting early keeps latency flat for admitted requests under
+    overload, instead of every request slowing down together. Must be
+    used from a single event loop.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = ADMISSION_MAX_CONCURRENCY,
+        max_queue: int = ADMISSION_MAX_QUEUE,
+        queue_timeout: float = ADMISSION_QUEUE_TIMEOUT_SECONDS,
+    ):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._waiting = 0
+        # Moving average of how long an admitted request runs
+        self._service_seconds = 1.0
+
+    def retry_after(self) -> float:
+        """Estimated seconds until the queue has room again"""
+
+        return self._service_seconds * (self._waiting + 1) / self.max_concurrency
+
+    def _reject(self, outcome: str, message: str, status_code: int) -> Overloaded:
+        metrics.inc(
+            "bank_chatbot_admission_requests",
+            "outcome",
+            outcome,
+            help="Requests admitted or rejected by admission control",
+        )
+        return Overloaded(message, status_code, self.retry_after())
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """Hold one of the concurrent slots, raising `Overloaded` if the
+        queue is full or the wait exceeds the queue timeout"""
+
+        if not self._semaphore.locked():
+            # Returns at once, without waiting in the queue
+            await self._semaphore.acquire()
+        elif self._waiting >= self.max_queue:
+            raise self._reject("rejected_queue_full", "Too many requests queued", 429)
+        else:
+            self._waiting += 1
+            try:
+                with stage_span("admission_wait"):
+                    await asyncio.wait_for(
+                        self._semaphore.acquire(), self.queue_timeout
+                    )
+            except asyncio.TimeoutError:
+                raise self._reject(
+                    "rejected_timeout", "Timed out waiting for capacity", 503
+                ) from None
+            finally:
+                self._waiting -= 1
+
+        metrics.inc(
+            "bank_chatbot_admission_requests",
+            "outcome",
+            "admitted",
+            help="Requests admitted or rejected by admission control",
+        )
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            elapsed = time.monotonic() - started
+            self._service_seconds = 0.8 * self._service_seconds + 0.2 * elapsed
+            self._semaphore.release()
+
+    @property
+    def waiting(self) -> int:
+        return self._waiting
+
+
+admission_controller = AdmissionController()
@@ -0,0 +1,90 @@
+import json
+from contextlib import AsyncExitStack
+from typing import Any, AsyncIterator
+from langchain_community.graphs.graph_store import GraphStore
+from langchain_core.runnables import Runnable
+from src.models.bank_rag_query import BankQueryInput
+from src.utils.graph_queries import cancel_queries_on_exit
+from src.utils.listing import collect_listings
+from src.utils.sessions import Session, collect_entities, session_store
+from src.utils.speculation import speculate
+from src.utils.telemetry import collect_timings, stage_span
+
+# Tags the agent's own LLM calls, so their streamed tokens can be told apart
+# from those of the chains the tools call
+AGENT_LLM_TAG = "agent_llm"
+
+
+def _event(**fields: Any) -> str:
+    return json.dumps(fields, default=str) + "\n"
+
+
+async def stream_agent_events(
+    executor: Runnable,
+    graph: GraphStore,
+    query: BankQueryInput,
+    session: Session,
+    agent_input: dict[str, Any],
+    admission: AsyncExitStack,
+) -> AsyncIterator[str]:
+    """
+    Run the agent and yield newline-delimited JSON events: "token" for
+    each piece of the answer, "reset" when tokens streamed so far turn out
+    not to be the answer, "step" as each tool returns, then "done" with the
+    same fields as the non-streaming response, or "error".
+    """
+
+    async with admission, cancel_queries_on_exit(graph):
+        try:
+            with (
+                collect_timings() as timings,
+                collect_entities() as entities,
+                collect_listings() as listings,
+            ):
+                with stage_span("request"), stage_span("agent"), speculate(query.text):
+                    response = None
+                    streamed = False
+                    async for agent_event in executor.astream_events(
+                        agent_input, version="v2"
+                    ):
+                        kind, data = agent_event["event"], agent_event["data"]
+                        from_agent_llm = AGENT_LLM_TAG in agent_event.get("tags", [])
+
+                        if kind == "on_chat_model_stream" and from_agent_llm:
+                            if data["chunk"].content:
+                                streamed = True
+                                yield _event(type="token", text=data["chunk"].content)
+                        elif kind == "on_chat_model_end" and from_agent_llm:
+                            # Text streamed before a tool call isn't the answer
+                            if streamed and data["output"].tool_calls:
+                                streamed = False
+                                yield _event(type="reset")
+                        elif kind == "on_tool_end":
+                            yield _event(
+                                type="step",
+                                tool=agent_event["name"],
+                                input=data.get("input"),
+                                output=data.get("output"),
+                            )
+                        elif kind == "on_chain_end" and not agent_event["parent_ids"]:
+                            response = data["output"]
+
+            if response is None:
+                raise RuntimeError("The agent finished without an answer")
+
+            session.entities.update(entities)
+            session.add_turn(query.text, response["output"])
+            session_store.save(session)
+
+            yield _event(
+                type="done",
+                input=query.text,
+                output=response["output"],
+                session_id=session.id,
+                intermediate_steps=[str(s) for s in response["intermediate_steps"]],
+                timings=timings if query.include_timings else None,
+                listing=listings[-1] if listings else None,
+            )
+        except Exception as e:
+            print(f"Streaming agent run failed: {e}")
+            yield _event(type="error", detail=str(e))
@@ -1,13 +1,21 @@
 import asyncio
 
 
-def async_retry(max_retries: int = 3, delay: int = 1):
+def async_retry(
+    max_retries: int = 3,
+    delay: int = 1,
+    give_up_on: tuple[type[Exception], ...] = (),
+):
+    """Retry on any exception except `give_up_on`, which are raised at once"""
+
     def decorator(func):
         async def wrapper(*args, **kwargs):
             for attempt in range(1, max_retries + 1):
                 try:
                     result = await func(*args, **kwargs)
                     return result
+                except give_up_on:
+                    raise
                 except Exception as e:
                     print(f"Attempt {attempt} failed: {str(e)}")
                     await asyncio.sleep(delay)
@@ -0,0 +1,230 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+from typing import Any, Optional
+from langchain_core.embeddings import Embeddings
+from langchain_core.load import dumpd, load
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForLLMRun,
+    CallbackManagerForLLMRun,
+)
+from src.utils.rate_limits import RateLimitedChatOpenAI
+
+CASSETTE_MODES = ("off", "record", "replay")
+
+
+def request_key(request: dict[str, Any]) -> str:
+    """Hash of a request, stable across runs and processes"""
+
+    canonical = json.dumps(request, sort_keys=True, default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def dump_chat_result(result: ChatResult) -> dict[str, Any]:
+    """JSON-serializable form of a chat model's result"""
+
+    return {
+        "generations": [
+            {"message": dumpd(g.message), "generation_info": g.generation_info}
+            for g in result.generations
+        ],
+        "llm_output": result.llm_output,
+    }
+
+
+def load_chat_result(entry: dict[str, Any]) -> ChatResult:
+    return ChatResult(
+        generations=[
+            ChatGeneration(
+                message=load(g["message"]), generation_info=g["generation_info"]
+            )
+            for g in entry["generations"]
+        ],
+        llm_output=entry["llm_output"],
+    )
+
+
+class Cassette:
+    """Request and response pairs stored as one JSON file per request hash"""
+
+    def __init__(self, directory: str, latency_scale: float = 0.0):
+        self.directory = directory
+        self.latency_scale = latency_scale
+
+    def _path(self, kind: str, key: str) -> str:
+        return os.path.join(self.directory, kind, f"{key}.json")
+
+    def get(self, kind: str, key: str) -> dict[str, Any]:
+        try:
+            with open(self._path(kind, key)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise ValueError(
+                f"No recorded {kind} response for request {key} in "
+                f"{self.directory}. Record it with LLM_CASSETTE_MODE=record."
+            ) from None
+
+    def put(self, kind: str, key: str, entry: dict[str, Any]) -> None:
+        path = self._path(kind, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Concurrent recorders of the same request write identical entries,
+        # so replacing the file atomically is enough
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(entry, f, indent=1)
+        os.replace(tmp_path, path)
+
+    def replay_delay(self, entry: dict[str, Any]) -> float:
+        """Seconds to wait before replaying an entry"""
+
+        return entry.get("latency_ms", 0.0) * self.latency_scale / 1000
+
+
+class CassetteChatOpenAI(RateLimitedChatOpenAI):
+    """ChatOpenAI that records responses to, or replays them from, a cassette.
+
+    Requests are keyed by a hash of the payload that would be sent to the
+    OpenAI API, so the same prompt, model, parameters and tools replay the
+    same response. Replaying skips the model's rate limit.
+    """
+
+    cassette: Cassette
+    cassette_mode: str = "replay"
+    # Responses are recorded and replayed whole
+    disable_streaming: bool = True
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    def _cassette_key(
+        self, messages: list[BaseMessage], stop: Optional[list[str]], **kwargs: Any
+    ) -> tuple[str, dict[str, Any]]:
+        payload = self._get_request_payload(messages, stop=stop, **kwargs)
+        payload.pop("stream", None)
+        return request_key(payload), payload
+
+    @staticmethod
+    def _entry(
+        payload: dict[str, Any], result: ChatResult, seconds: float
+    ) -> dict[str, Any]:
+        return {
+            "request": payload,
+            **dump_chat_result(result),
+            "latency_ms": round(seconds * 1000, 2),
+        }
+
+    @staticmethod
+    def _result(entry: dict[str, Any]) -> ChatResult:
+        return load_chat_result(entry)
+
+    def _generate(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        key, payload = self._cassette_key(messages, stop, **kwargs)
+        if self.cassette_mode == "replay":
+            entry = self.cassette.get("chat", key)
+            time.sleep(self.cassette.replay_delay(entry))
+            return self._result(entry)
+
+        started = time.perf_counter()
+        result = super()._generate(messages, stop, run_manager, **kwargs)
+        self.cassette.put(
+            "chat", key, self._entry(payload, result, time.perf_counter() - started)
+        )
+        return result
+
+    async def _agenerate(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        key, payload = self._cassette_key(messages, stop, **kwargs)
+        if self.cassette_mode == "replay":
+            entry = self.cassette.get("chat", key)
+            await asyncio.sleep(self.cassette.replay_delay(entry))
+            return self._result(entry)
+
+        started = time.perf_counter()
+        result = await super()._agenerate(messages, stop, run_manager, **kwargs)
+        self.cassette.put(
+            "chat", key, self._entry(payload, result, time.perf_counter() - started)
+        )
+        return result
+
+
+class CassetteEmbeddings(Embeddings):
+    """Embeddings that record to, or replay from, a cassette"""
+
+    def __init__(self, embeddings: Embeddings, cassette: Cassette, mode: str):
+        self.embeddings = embeddings
+        self.cassette = cassette
+        self.mode = mode
+        self.model = getattr(embeddings, "model", type(embeddings).__name__)
+
+    def _key(self, method: str, texts: Any) -> str:
+        return request_key({"model": self.model, "method": method, "input": texts})
+
+    def _replay(self, key: str) -> tuple[Any, float]:
+        entry = self.cassette.get("embeddings", key)
+        return entry["embeddings"], self.cassette.replay_delay(entry)
+
+    def _record(self, key: str, embeddings: Any, seconds: float) -> None:
+        self.cassette.put(
+            "embeddings",
+            key,
+            {"embeddings": embeddings, "latency_ms": round(seconds * 1000, 2)},
+        )
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        key = self._key("documents", texts)
+        if self.mode == "replay":
+            embeddings, delay = self._replay(key)
+            time.sleep(delay)
+            return embeddings
+        started = time.perf_counter()
+        embeddings = self.embeddings.embed_documents(texts)
+        self._record(key, embeddings, time.perf_counter() - started)
+        return embeddings
+
+    def embed_query(self, text: str) -> list[float]:
+        key = self._key("query", text)
+        if self.mode == "replay":
+            embedding, delay = self._replay(key)
+            time.sleep(delay)
+            return embedding
+        started = time.perf_counter()
+        embedding = self.embeddings.embed_query(text)
+        self._record(key, embedding, time.perf_counter() - started)
+        return embedding
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        key = self._key("documents", texts)
+        if self.mode == "replay":
+            embeddings, delay = self._replay(key)
+            await asyncio.sleep(delay)
+            return embeddings
+        started = time.perf_counter()
+        embeddings = await self.embeddings.aembed_documents(texts)
+        self._record(key, embeddings, time.perf_counter() - started)
+        return embeddings
+
+    async def aembed_query(self, text: str) -> list[float]:
+        key = self._key("query", text)
+        if self.mode == "replay":
+            embedding, delay = self._replay(key)
+            await asyncio.sleep(delay)
+            return embedding
+        started = time.perf_counter()
+        embedding = await self.embeddings.aembed_query(text)
+        self._record(key, embedding, time.perf_counter() - started)
+        return embedding
@@ -0,0 +1,128 @@
+import os
+from typing import Optional
+import numpy as np
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStoreRetriever
+from src.utils.speculation import take_speculative
+
+# Candidate examples fetched from the vector index per question
+CYPHER_EXAMPLES_FETCH_K = int(os.getenv("CYPHER_EXAMPLES_FETCH_K", "20"))
+# Most examples put in a Cypher prompt
+CYPHER_EXAMPLES_MAX_K = int(os.getenv("CYPHER_EXAMPLES_MAX_K", "8"))
+# Fewest examples kept, even when none clear the score threshold
+CYPHER_EXAMPLES_MIN_K = int(os.getenv("CYPHER_EXAMPLES_MIN_K", "1"))
+# Minimum index score of an example. Neo4j cosine scores are in [0, 1].
+CYPHER_EXAMPLES_SCORE_THRESHOLD = float(
+    os.getenv("CYPHER_EXAMPLES_SCORE_THRESHOLD", "0.9")
+)
+# Trade-off between relevance (1) and diversity (0) when picking examples
+CYPHER_EXAMPLES_MMR_LAMBDA = float(os.getenv("CYPHER_EXAMPLES_MMR_LAMBDA", "0.7"))
+
+
+def select_examples(
+    query_vector: list[float],
+    vectors: list[list[float]],
+    scores: list[float],
+    max_k: int = CYPHER_EXAMPLES_MAX_K,
+    min_k: int = CYPHER_EXAMPLES_MIN_K,
+    score_threshold: float = CYPHER_EXAMPLES_SCORE_THRESHOLD,
+    mmr_lambda: float = CYPHER_EXAMPLES_MMR_LAMBDA,
+) -> list[int]:
+    """Indexes of the candidates to use, most relevant first.
+
+    Candidates scoring below `score_threshold` are dropped, keeping the
+    best `min_k` regardless. The rest are picked by maximal marginal
+    relevance, so near-duplicates of an example already picked lose out
+    to less similar but different ones.
+    """
+
+    if not scores:
+        return []
+
+    order = np.argsort(scores)[::-1]
+    eligible = [int(i) for i in order if scores[i] >= score_threshold]
+    if len(eligible) < min_k:
+        eligible = [int(i) for i in order[:min_k]]
+
+    matrix = np.asarray([vectors[i] for i in eligible], dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    matrix = matrix / np.where(norms == 0, 1, norms)
+    query = np.asarray(query_vector, dtype=np.float32)
+    query = query / (np.linalg.norm(query) or 1)
+
+    relevance = matrix @ query
+    similarity = matrix @ matrix.T
+
+    picked: list[int] = []
+    remaining = list(range(len(eligible)))
+    while remaining and len(picked) < max_k:
+        if picked:
+            redundancy = similarity[np.ix_(remaining, picked)].max(axis=1)
+        else:
+            redundancy = np.zeros(len(remaining))
+        mmr = mmr_lambda * relevance[remaining] - (1 - mmr_lambda) * redundancy
+        best = remaining[int(np.argmax(mmr))]
+        picked.append(best)
+        remaining.remove(best)
+
+    return [eligible[i] for i in picked]
+
+
+class AdaptiveExampleRetriever(VectorStoreRetriever):
+    """Retrieves as many examples as are relevant to the question, up to
+    `max_k`, dropping near-duplicates.
+
+    Example embeddings are read from the `embedding_key` metadata when the
+    index returns them, and embedded otherwise.
+    """
+
+    fetch_k: int = CYPHER_EXAMPLES_FETCH_K
+    max_k: int = CYPHER_EXAMPLES_MAX_K
+    min_k: int = CYPHER_EXAMPLES_MIN_K
+    score_threshold: float = CYPHER_EXAMPLES_SCORE_THRESHOLD
+    mmr_lambda: float = CYPHER_EXAMPLES_MMR_LAMBDA
+    embedding_key: Optional[str] = "embedding"
+    speculative_task: Optional[str] = None
+    """Name of the speculative task whose examples to reuse, if any"""
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> list[Document]:
+        if self.speculative_task:
+            examples = take_speculative(self.speculative_task, query)
+            if examples is not None:
+                return examples
+        return self.select(query, self.vectorstore.embeddings.embed_query(query))
+
+    def select(self, query: str, query_vector: list[float]) -> list[Document]:
+        """Examples for a question whose embedding is already known"""
+
+        embeddings = self.vectorstore.embeddings
+        # Neo4jVector also passes the question to its keyword index
+        candidates = self.vectorstore.similarity_search_with_score_by_vector(
+            query_vector, k=self.fetch_k, query=query
+        )
+        if not candidates:
+            return []
+
+        documents = [doc for doc, _ in candidates]
+        vectors = [doc.metadata.pop(self.embedding_key, None) for doc in documents]
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            embedded = embeddings.embed_documents(
+                [documents[i].page_content for i in missing]
+            )
+            for i, vector in zip(missing, embedded):
+                vectors[i] = vector
+
+        selected = select_examples(
+            query_vector,
+            vectors,
+            [score for _, score in candidates],
+            max_k=self.max_k,
+            min_k=self.min_k,
+            score_threshold=self.score_threshold,
+            mmr_lambda=self.mmr_lambda,
+        )
+        return [documents[i] for i in selected]
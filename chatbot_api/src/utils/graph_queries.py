@@ -0,0 +1,236 @@
+import os
+import json
+import uuid
+import asyncio
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Iterator, Optional
+from langchain_community.graphs.graph_store import GraphStore
+from langchain_community.graphs.neo4j_graph import Neo4jGraph
+from neo4j import READ_ACCESS, unit_of_work
+from neo4j.exceptions import ClientError, CypherSyntaxError
+from src.utils.telemetry import metrics
+
+# Generated Cypher running longer than this is cancelled by Neo4j
+CYPHER_QUERY_TIMEOUT_SECONDS = float(os.getenv("CYPHER_QUERY_TIMEOUT_SECONDS", "10"))
+# Most rows and bytes of rows read from a query, the rest are discarded
+CYPHER_QUERY_MAX_ROWS = int(os.getenv("CYPHER_QUERY_MAX_ROWS", "10000"))
+CYPHER_QUERY_MAX_BYTES = int(os.getenv("CYPHER_QUERY_MAX_BYTES", "5000000"))
+
+
+@dataclass
+class QueryTag:
+    """Identifies the queries run for one request, to cancel them together"""
+
+    id: str
+    cancelled: bool = False
+
+
+_query_tag: ContextVar[Optional[QueryTag]] = ContextVar("query_tag", default=None)
+
+
+class QueryTimeout(Exception):
+    """Raised when Neo4j cancels a query for running too long"""
+
+
+class QueryCancelled(Exception):
+    """Raised for queries of a request that was cancelled"""
+
+
+class QueryRejected(Exception):
+    """Raised when Neo4j rejects a generated query that tries to write"""
+
+
+def _count(outcome: str) -> None:
+    metrics.inc(
+        "bank_chatbot_neo4j_queries_stopped",
+        "reason",
+        outcome,
+        help="Generated queries timed out, terminated, rejected or cut short by a cap",
+    )
+
+
+def _cap_rows(
+    records: Iterator[dict[str, Any]], max_rows: int, max_bytes: int
+) -> tuple[list[dict[str, Any]], bool]:
+    rows: list[dict[str, Any]] = []
+    size = 0
+    for row in records:
+        size += len(json.dumps(row, default=str))
+        if len(rows) >= max_rows or size > max_bytes:
+            # Stopping at a caller's own limit, e.g. top_k, is expected
+            if len(rows) >= CYPHER_QUERY_MAX_ROWS:
+                _count("max_rows")
+            elif size > CYPHER_QUERY_MAX_BYTES:
+                _count("max_bytes")
+            return rows, True
+        rows.append(row)
+    return rows, False
+
+
+def read_query(
+    graph: GraphStore,
+    query: str,
+    params: Optional[dict[str, Any]] = None,
+    timeout: float = CYPHER_QUERY_TIMEOUT_SECONDS,
+    max_rows: int = CYPHER_QUERY_MAX_ROWS,
+    max_bytes: int = CYPHER_QUERY_MAX_BYTES,
+) -> tuple[list[dict[str, Any]], bool]:
+    """Rows of a query run in a read-only transaction, and whether they were
+    cut short by `max_rows` or `max_bytes`, which can't exceed the global caps.
+
+    The transaction is tagged with the current request's tag, so it can be
+    terminated if the request is cancelled. Graphs other than Neo4jGraph
+    are queried through their `query` method, without a timeout.
+    """
+
+    max_rows = min(max_rows, CYPHER_QUERY_MAX_ROWS)
+    max_bytes = min(max_bytes, CYPHER_QUERY_MAX_BYTES)
+    tag = _query_tag.get()
+    if tag is not None and tag.cancelled:
+        raise QueryCancelled("The request was cancelled")
+
+    if not isinstance(graph, Neo4jGraph):
+        return _cap_rows(iter(graph.query(query, params or {})), max_rows, max_bytes)
+
+    @unit_of_work(
+        timeout=timeout,
+        metadata={"app": "bank_chatbot", "query_tag": tag.id if tag else None},
+    )
+    def work(tx):
+        records = (record.data() for record in tx.run(query, params or {}))
+        return _cap_rows(records, max_rows, max_bytes)
+
+    # Rows past the caps aren't fetched from the server
+    fetch_size = min(max_rows + 1, 1000)
+    try:
+        with graph._driver.session(
+            database=graph._database, fetch_size=fetch_size
+        ) as session:
+            return session.execute_read(work)
+    except ClientError as e:
+        error = _query_error(e, timeout)
+        if error is e:
+            raise
+        raise error from e
+
+
+def _query_error(e: ClientError, timeout: float) -> Exception:
+    """The exception to raise for a query Neo4j stopped or refused"""
+
+    if isinstance(e, CypherSyntaxError):
+        return ValueError(f"Generated Cypher Statement is not valid\n{e}")
+    if "TransactionTimedOut" in (e.code or ""):
+        _count("timeout")
+        return QueryTimeout(
+            f"The database query was cancelled after {timeout:g} seconds"
+        )
+    if e.code == "Neo.ClientError.Transaction.Terminated":
+        _count("terminated")
+        return QueryCancelled("The database query was terminated")
+    if e.code == "Neo.ClientError.Statement.AccessMode":
+        _count("write_rejected")
+        return QueryRejected("The database query tried to change data")
+    return e
+
+
+def stream_query(
+    graph: GraphStore,
+    query: str,
+    params: Optional[dict[str, Any]] = None,
+    timeout: float = CYPHER_QUERY_TIMEOUT_SECONDS,
+    fetch_size: int = 1000,
+) -> Iterator[dict[str, Any]]:
+    """Rows of a query run in a read-only transaction, yielded as they are
+    fetched from the server instead of read into a list first.
+
+    Like `read_query`, the transaction is tagged with the current request's
+    tag, but no caps apply. Close the iterator to stop the query early.
+    """
+
+    tag = _query_tag.get()
+    if tag is not None and tag.cancelled:
+        raise QueryCancelled("The request was cancelled")
+
+    if not isinstance(graph, Neo4jGraph):
+        yield from graph.query(query, params or {})
+        return
+
+    try:
+        with graph._driver.session(
+            database=graph._database,
+            default_access_mode=READ_ACCESS,
+            fetch_size=fetch_size,
+        ) as session:
+            with session.begin_transaction(
+                timeout=timeout,
+                metadata={"app": "bank_chatbot", "query_tag": tag.id if tag else None},
+            ) as tx:
+                for record in tx.run(query, params or {}):
+                    yield record.data()
+    except ClientError as e:
+        error = _query_error(e, timeout)
+        if error is e:
+            raise
+        raise error from e
+
+
+def terminate_queries(graph: GraphStore, tag: QueryTag) -> int:
+    """Terminate the running transactions of a request, and stop it from
+    starting more. Returns how many were terminated."""
+
+    tag.cancelled = True
+    if not isinstance(graph, Neo4jGraph):
+        return 0
+
+    with graph._driver.session(database=graph._database) as session:
+        ids = [
+            record["transactionId"]
+            for record in session.run(
+                """SHOW TRANSACTIONS YIELD transactionId, metaData
+                WHERE metaData.query_tag = $tag
+                RETURN transactionId""",
+                tag=tag.id,
+            )
+        ]
+        if ids:
+            session.run("TERMINATE TRANSACTIONS $ids", ids=ids).consume()
+    return len(ids)
+
+
+@contextmanager
+def tag_queries() -> Iterator[QueryTag]:
+    """Tag the queries run within the block, including by tools in threads"""
+
+    tag = QueryTag(uuid.uuid4().hex)
+    token = _query_tag.set(tag)
+    try:
+        yield tag
+    finally:
+        _query_tag.reset(token)
+
+
+def _terminate_cancelled(graph: GraphStore, tag: QueryTag) -> None:
+    try:
+        terminated = terminate_queries(graph, tag)
+        print(f"Terminated {terminated} queries of a cancelled request")
+    except Exception as e:
+        print(f"Failed to terminate queries of a cancelled request: {e}")
+
+
+@asynccontextmanager
+async def cancel_queries_on_exit(graph: GraphStore) -> AsyncIterator[QueryTag]:
+    """Tag the queries run within the block, and terminate them in Neo4j if
+    the block is cancelled, e.g. because the client disconnected. Tools
+    running in threads can't be cancelled, so their queries are."""
+
+    with tag_queries() as tag:
+        try:
+            yield tag
+        except (asyncio.CancelledError, GeneratorExit):
+            # Not awaited, since a cancelled task may be cancelled again
+            asyncio.get_running_loop().run_in_executor(
+                None, _terminate_cancelled, graph, tag
+            )
+            raise
@@ -0,0 +1,32 @@
+from typing import Optional
+from langchain_community.graphs import Neo4jGraph
+from src.utils.shared_cache import SharedCache, shared_cache
+
+
+def refresh_shared_schema(
+    graph: Neo4jGraph, cache: Optional[SharedCache] = shared_cache
+) -> None:
+    """Read the schema from Neo4j and publish it to the other workers"""
+
+    graph.refresh_schema()
+    if cache is not None:
+        cache.set(
+            "graph_schema",
+            "neo4j",
+            {"schema": graph.schema, "structured_schema": graph.structured_schema},
+        )
+
+
+def load_graph_schema(
+    graph: Neo4jGraph, cache: Optional[SharedCache] = shared_cache
+) -> None:
+    """Use the schema preloaded into the shared cache, reading it from
+    Neo4j only when no worker has yet"""
+
+    cached = cache.get("graph_schema", "neo4j") if cache is not None else None
+    if cached is None:
+        refresh_shared_schema(graph, cache)
+        return
+
+    graph.schema = cached["schema"]
+    graph.structured_schema = cached["structured_schema"]
@@ -0,0 +1,303 @@
+import os
+import re
+import hmac
+import json
+import base64
+import hashlib
+import secrets
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import date, datetime
+from typing import Any, Iterator, Optional
+from src.utils.graph_queries import read_query, stream_query
+
+# Rows in each page of a listing
+LISTING_PAGE_SIZE = int(os.getenv("LISTING_PAGE_SIZE", "50"))
+# Query results with more rows than this are returned as a listing, with
+# only a one-line summary written by the QA LLM. 0 disables listings.
+LISTING_ROW_THRESHOLD = int(os.getenv("LISTING_ROW_THRESHOLD", "20"))
+# Key signing listing cursors, which carry the Cypher query of the listing.
+# Without one, cursors are only valid in the process that issued them.
+LISTING_CURSOR_SECRET = os.getenv("LISTING_CURSOR_SECRET") or secrets.token_hex(32)
+# Streaming the rest of a listing runs one query, which may take this long
+LISTING_STREAM_TIMEOUT_SECONDS = float(
+    os.getenv("LISTING_STREAM_TIMEOUT_SECONDS", "300")
+)
+
+# Listings returned by tools while answering the current request
+_listings: ContextVar[Optional[list[dict[str, Any]]]] = ContextVar(
+    "listings", default=None
+)
+
+
+class InvalidCursor(ValueError):
+    """Raised for cursors that were tampered with or can't be decoded"""
+
+
+def _quote(column: str) -> str:
+    return "`" + column.replace("`", "``") + "`"
+
+
+def keyset_query(
+    query: str,
+    columns: list[str],
+    after: Optional[list[Any]] = None,
+    paged: bool = True,
+) -> str:
+    """Wrap `query` to return its rows ordered by all `columns`, starting at
+    the row `after`, skipping $skip rows and, when `paged`, returning at
+    most $page_size.
+
+    Nulls sort last, as in Cypher's ORDER BY, so a row follows `after`
+    when its first differing column is greater, or null where `after`
+    isn't. Rows equal to `after` are kept, since duplicate rows are listed
+    as often as the query returns them, and $skip skips those already
+    listed. Pass `after` as the $after parameter.
+    """
+
+    names = [_quote(column) for column in columns]
+    returned = ", ".join(names)
+    where = ""
+    if after is not None:
+        equal = [
+            f"({name} = $after[{i}] OR ({name} IS NULL AND $after[{i}] IS NULL))"
+            for i, name in enumerate(names)
+        ]
+        branches = []
+        for i, name in enumerate(names):
+            greater = (
+                f"($after[{i}] IS NOT NULL"
+                f" AND ({name} IS NULL OR {name} > $after[{i}]))"
+            )
+            branches.append("(" + " AND ".join(equal[:i] + [greater]) + ")")
+        branches.append("(" + " AND ".join(equal) + ")")
+        where = "WHERE " + "\n    OR ".join(branches) + "\n"
+
+    return (
+        f"CALL {{\n{query.strip().rstrip(';')}\n}}\n"
+        f"WITH {returned}\n"
+        f"{where}"
+        f"RETURN {returned}\n"
+        f"ORDER BY {returned}\n"
+        "SKIP $skip" + ("\nLIMIT $page_size" if paged else "")
+    )
+
+
+def count_query(query: str) -> str:
+    """Count the rows of `query`, as listed by `keyset_query`"""
+
+    return f"CALL {{\n{query.strip().rstrip(';')}\n}}\nRETURN count(*) AS total"
+
+
+def has_own_order(query: str) -> bool:
+    """Whether `query` sorts its rows, an order listings would replace"""
+
+    return re.search(r"\bORDER\s+BY\b", query, re.IGNORECASE) is not None
+
+
+def native_value(value: Any) -> Any:
+    """Neo4j temporal values as Python dates and datetimes"""
+
+    return value.to_native() if hasattr(value, "to_native") else value
+
+
+def _encode_key(value: Any) -> Any:
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, datetime):
+        return {"$datetime": value.isoformat()}
+    if isinstance(value, date):
+        return {"$date": value.isoformat()}
+    raise TypeError(f"Can't page by a value of type {type(value).__name__}")
+
+
+def can_page(row: dict[str, Any]) -> bool:
+    """Whether listings can be paged by the values of `row`, which rules out
+    nodes, maps and lists"""
+
+    try:
+        for value in row.values():
+            _encode_key(native_value(value))
+    except TypeError:
+        return False
+    return True
+
+
+def _decode_key(value: Any) -> Any:
+    if isinstance(value, dict):
+        if "$datetime" in value:
+            return datetime.fromisoformat(value["$datetime"])
+        return date.fromisoformat(value["$date"])
+    return value
+
+
+def _signature(payload: bytes) -> str:
+    digest = hmac.new(LISTING_CURSOR_SECRET.encode(), payload, hashlib.sha256)
+    return base64.urlsafe_b64encode(digest.digest()).decode().rstrip("=")
+
+
+def encode_cursor(
+    query: str, columns: list[str], after: list[Any], page_size: int, skip: int = 1
+) -> Optional[str]:
+    """Signed cursor for the page after `skip` rows equal to the row `after`,
+    or None when the row has values that can't be paged by, e.g. nodes or
+    lists"""
+
+    try:
+        key = [_encode_key(native_value(value)) for value in after]
+    except TypeError:
+        return None
+    payload = json.dumps(
+        {
+            "query": query,
+            "columns": columns,
+            "after": key,
+            "skip": skip,
+            "page_size": page_size,
+        },
+        separators=(",", ":"),
+    ).encode()
+    encoded = base64.urlsafe_b64encode(payload).decode().rstrip("=")
+    return f"{encoded}.{_signature(payload)}"
+
+
+def decode_cursor(cursor: str) -> dict[str, Any]:
+    """The query, columns, last row, rows to skip and page size of a cursor,
+    after checking its signature"""
+
+    try:
+        encoded, signature = cursor.split(".")
+        payload = base64.urlsafe_b64decode(encoded + "=" * (-len(encoded) % 4))
+    except ValueError:
+        raise InvalidCursor("Malformed listing cursor") from None
+    if not hmac.compare_digest(signature, _signature(payload)):
+        raise InvalidCursor("Listing cursor signature doesn't match")
+
+    state = json.loads(payload)
+    state["after"] = [_decode_key(value) for value in state["after"]]
+    return state
+
+
+def _page(
+    query: str,
+    columns: list[str],
+    rows: list[dict[str, Any]],
+    after: Optional[list[Any]],
+    skip: int,
+    page_size: int,
+) -> dict[str, Any]:
+    """A page of rows read one past `page_size`, with the cursor of the next
+    page if there are more"""
+
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        keys = [[row[column] for column in columns] for row in rows]
+        # Rows equal to the last one are listed again unless skipped
+        ties = 0
+        while ties < len(keys) and keys[-1 - ties] == keys[-1]:
+            ties += 1
+        if ties == len(keys) and keys[-1] == after:
+            ties += skip
+        next_cursor = encode_cursor(query, columns, keys[-1], page_size, ties)
+    return {"columns": columns, "rows": rows, "next_cursor": next_cursor}
+
+
+def fetch_page(
+    graph: Any,
+    query: str,
+    columns: list[str],
+    after: Optional[list[Any]] = None,
+    page_size: int = LISTING_PAGE_SIZE,
+    skip: int = 0,
+) -> dict[str, Any]:
+    """One page of a listing, with the cursor of the next page if there
+    may be more rows"""
+
+    rows, _ = read_query(
+        graph,
+        keyset_query(query, columns, after),
+        {"after": after, "skip": skip, "page_size": page_size + 1},
+    )
+    rows = [{k: native_value(v) for k, v in row.items()} for row in rows]
+    return _page(query, columns, rows, after, skip, page_size)
+
+
+def _sort_key(row: dict[str, Any], columns: list[str]) -> list[tuple[bool, Any]]:
+    # Nulls last, as in Cypher's ORDER BY
+    return [(row[column] is None, row[column]) for column in columns]
+
+
+def first_page(
+    query: str,
+    columns: list[str],
+    rows: list[dict[str, Any]],
+    page_size: int = LISTING_PAGE_SIZE,
+) -> Optional[dict[str, Any]]:
+    """The first page of a listing, cut from all the rows of `query` already
+    read instead of querying again. None when the rows can't be sorted in
+    Python the way Cypher sorts them, e.g. a column mixes types."""
+
+    rows = [{k: native_value(v) for k, v in row.items()} for row in rows]
+    try:
+        rows.sort(key=lambda row: _sort_key(row, columns))
+    except TypeError:
+        return None
+    return _page(query, columns, rows[: page_size + 1], None, 0, page_size)
+
+
+def fetch_next_page(
+    graph: Any, cursor: str, page_size: Optional[int] = None
+) -> dict[str, Any]:
+    """The page a cursor points to, of the cursor's page size by default"""
+
+    state = decode_cursor(cursor)
+    return fetch_page(
+        graph,
+        state["query"],
+        state["columns"],
+        state["after"],
+        page_size or state["page_size"],
+        state["skip"],
+    )
+
+
+def count_listing(graph: Any, cursor: str) -> int:
+    """Total rows of the listing a cursor belongs to, which runs its whole
+    query again, so only count when a client asks"""
+
+    rows, _ = read_query(graph, count_query(decode_cursor(cursor)["query"]))
+    return rows[0]["total"]
+
+
+def iter_listing_rows(graph: Any, cursor: str) -> Iterator[dict[str, Any]]:
+    """Every row of a listing from a cursor on, fetched from one query as
+    they are read"""
+
+    state = decode_cursor(cursor)
+    rows = stream_query(
+        graph,
+        keyset_query(state["query"], state["columns"], state["after"], paged=False),
+        {"after": state["after"], "skip": state["skip"]},
+        timeout=LISTING_STREAM_TIMEOUT_SECONDS,
+    )
+    for row in rows:
+        yield {k: native_value(v) for k, v in row.items()}
+
+
+@contextmanager
+def collect_listings() -> Iterator[list[dict[str, Any]]]:
+    """Collect the listings returned by tools within the block"""
+
+    listings: list[dict[str, Any]] = []
+    token = _listings.set(listings)
+    try:
+        yield listings
+    finally:
+        _listings.reset(token)
+
+
+def record_listing(listing: dict[str, Any]) -> None:
+    listings = _listings.get()
+    if listings is not None:
+        listings.append(listing)
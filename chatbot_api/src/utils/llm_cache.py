@@ -0,0 +1,158 @@
+import os
+import json
+from typing import Any, AsyncIterator, Iterator, Optional
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForLLMRun,
+    CallbackManagerForLLMRun,
+)
+from langchain_core.language_models.chat_models import generate_from_stream
+from langchain_core.messages import AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+from src.utils.cassette import dump_chat_result, load_chat_result, request_key
+from src.utils.rate_limits import RateLimitedChatOpenAI
+from src.utils.shared_cache import SharedCache
+from src.utils.telemetry import metrics
+
+# SQLite file of LLM responses, kept across restarts. Unset or empty
+# disables the cache for every chain.
+LLM_RESPONSE_CACHE_PATH = os.getenv("LLM_RESPONSE_CACHE_PATH", "")
+# Least recently used responses are evicted past this many
+LLM_RESPONSE_CACHE_MAX_ENTRIES = int(
+    os.getenv("LLM_RESPONSE_CACHE_MAX_ENTRIES", "20000")
+)
+
+llm_response_cache = (
+    SharedCache(LLM_RESPONSE_CACHE_PATH) if LLM_RESPONSE_CACHE_PATH else None
+)
+
+
+def _as_chunk(message: BaseMessage) -> AIMessageChunk:
+    return AIMessageChunk(
+        content=message.content,
+        additional_kwargs=message.additional_kwargs,
+        response_metadata=message.response_metadata,
+        id=message.id,
+        tool_call_chunks=[
+            {
+                "name": tool_call["name"],
+                "args": json.dumps(tool_call["args"]),
+                "id": tool_call["id"],
+                "index": i,
+            }
+            for i, tool_call in enumerate(getattr(message, "tool_calls", []))
+        ],
+    )
+
+
+class CachedChatOpenAI(RateLimitedChatOpenAI):
+    """ChatOpenAI that reuses the response to an identical earlier request.
+
+    Requests are keyed like cassette entries, by a hash of the payload sent
+    to the OpenAI API, so the model, messages, parameters and bound tools
+    all have to match. Only deterministic, temperature 0 models should use
+    it. Cached responses skip the model's rate limit, and are streamed as
+    a single chunk.
+    """
+
+    response_cache: SharedCache
+    cache_name: str
+    cache_max_entries: int = LLM_RESPONSE_CACHE_MAX_ENTRIES
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    def _cache_key(
+        self, messages: list[BaseMessage], stop: Optional[list[str]], **kwargs: Any
+    ) -> str:
+        payload = self._get_request_payload(messages, stop=stop, **kwargs)
+        payload.pop("stream", None)
+        payload.pop("stream_options", None)
+        return request_key(payload)
+
+    def _lookup(self, key: str) -> Optional[ChatResult]:
+        entry = self.response_cache.get("llm_responses", key)
+        metrics.inc(
+            "bank_chatbot_llm_cache_lookups",
+            "outcome",
+            f"{self.cache_name}_{'hit' if entry is not None else 'miss'}",
+            help="LLM response cache lookups by chain and outcome",
+        )
+        return load_chat_result(entry) if entry is not None else None
+
+    def _store(self, key: str, result: ChatResult) -> None:
+        self.response_cache.set(
+            "llm_responses",
+            key,
+            dump_chat_result(result),
+            max_entries=self.cache_max_entries,
+        )
+
+    def _generate(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        key = self._cache_key(messages, stop, **kwargs)
+        cached = self._lookup(key)
+        if cached is not None:
+            return cached
+        result = super()._generate(messages, stop, run_manager, **kwargs)
+        self._store(key, result)
+        return result
+
+    async def _agenerate(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        key = self._cache_key(messages, stop, **kwargs)
+        cached = self._lookup(key)
+        if cached is not None:
+            return cached
+        result = await super()._agenerate(messages, stop, run_manager, **kwargs)
+        self._store(key, result)
+        return result
+
+    def _stream(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        key = self._cache_key(messages, stop, **kwargs)
+        cached = self._lookup(key)
+        if cached is not None:
+            for generation in cached.generations:
+                yield ChatGenerationChunk(message=_as_chunk(generation.message))
+            return
+
+        chunks = []
+        for chunk in super()._stream(messages, stop, run_manager, **kwargs):
+            chunks.append(chunk)
+            yield chunk
+        self._store(key, generate_from_stream(iter(chunks)))
+
+    async def _astream(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        key = self._cache_key(messages, stop, **kwargs)
+        cached = self._lookup(key)
+        if cached is not None:
+            for generation in cached.generations:
+                yield ChatGenerationChunk(message=_as_chunk(generation.message))
+            return
+
+        chunks = []
+        async for chunk in super()._astream(messages, stop, run_manager, **kwargs):
+            chunks.append(chunk)
+            yield chunk
+        self._store(key, generate_from_stream(iter(chunks)))
@@ -0,0 +1,82 @@
+import os
+from typing import Optional
+from langchain_core.embeddings import Embeddings
+from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+from src.utils.cassette import (
+    CASSETTE_MODES,
+    Cassette,
+    CassetteChatOpenAI,
+    CassetteEmbeddings,
+)
+from src.utils.llm_cache import CachedChatOpenAI, llm_response_cache
+from src.utils.rate_limits import RateLimitedChatOpenAI
+from src.utils.shared_cache import SharedCacheEmbeddings, shared_cache
+from src.utils.token_budget import prompt_token_counter
+
+# "record" stores every LLM and embedding response in the cassette
+# directory, "replay" answers from it without calling OpenAI
+LLM_CASSETTE_MODE = os.getenv("LLM_CASSETTE_MODE", "off").lower()
+LLM_CASSETTE_DIR = os.getenv("LLM_CASSETTE_DIR", "cassettes")
+# Multiplier for the recorded latency when replaying, 0 replays instantly
+LLM_CASSETTE_LATENCY_SCALE = float(os.getenv("LLM_CASSETTE_LATENCY_SCALE", "0"))
+
+if LLM_CASSETTE_MODE not in CASSETTE_MODES:
+    raise ValueError(
+        f"LLM_CASSETTE_MODE must be one of {CASSETTE_MODES}, "
+        f"got {LLM_CASSETTE_MODE!r}"
+    )
+
+cassette = Cassette(LLM_CASSETTE_DIR, LLM_CASSETTE_LATENCY_SCALE)
+
+
+def _api_key_kwargs() -> dict[str, str]:
+    # Replaying never calls OpenAI, so it shouldn't need a key
+    if LLM_CASSETTE_MODE == "replay" and not os.getenv("OPENAI_API_KEY"):
+        return {"api_key": "cassette-replay"}
+    return {}
+
+
+def build_chat_model(
+    model: str, temperature: float = 0, cache_name: Optional[str] = None
+) -> ChatOpenAI:
+    """Chat model for the chains and the agent, honoring the cassette mode.
+    Prompt tokens of every call are counted by stage, and calls wait for
+    the model's rate limit.
+
+    With a `cache_name`, responses of temperature 0 models are reused from
+    the LLM response cache. Recording and replaying cassettes bypass it.
+    """
+
+    if LLM_CASSETTE_MODE == "off":
+        if cache_name and temperature == 0 and llm_response_cache is not None:
+            return CachedChatOpenAI(
+                model=model,
+                temperature=temperature,
+                callbacks=[prompt_token_counter],
+                response_cache=llm_response_cache,
+                cache_name=cache_name,
+            )
+        return RateLimitedChatOpenAI(
+            model=model, temperature=temperature, callbacks=[prompt_token_counter]
+        )
+
+    return CassetteChatOpenAI(
+        model=model,
+        temperature=temperature,
+        callbacks=[prompt_token_counter],
+        cassette=cassette,
+        cassette_mode=LLM_CASSETTE_MODE,
+        **_api_key_kwargs(),
+    )
+
+
+def build_embeddings() -> Embeddings:
+    """Embedding model for the vector indexes, honoring the cassette mode.
+    Vectors are shared between workers when the shared cache is enabled."""
+
+    embeddings: Embeddings = OpenAIEmbeddings(**_api_key_kwargs())
+    if LLM_CASSETTE_MODE != "off":
+        embeddings = CassetteEmbeddings(embeddings, cassette, LLM_CASSETTE_MODE)
+    if shared_cache is not None:
+        embeddings = SharedCacheEmbeddings(embeddings, shared_cache)
+    return embeddings
@@ -0,0 +1,204 @@
+import io
+import os
+import time
+import uuid
+import base64
+import pstats
+import logging
+import random
+import marshal
+import cProfile
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Optional, TypeVar
+from src.utils.shared_cache import SharedCache, shared_cache
+
+LOGGER = logging.getLogger(__name__)
+
+# Requests with this header set to a truthy value and the admin token
+# are profiled
+PROFILE_HEADER = os.getenv("PROFILE_HEADER", "X-Profile-Request")
+# Fraction of all other requests to profile, 0 disables sampling
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+# Oldest profiles are evicted once the stored profiles exceed this size,
+# both in memory and in the shared cache
+PROFILE_STORE_MAX_BYTES = int(
+    os.getenv("PROFILE_STORE_MAX_BYTES", str(50 * 1024 * 1024))
+)
+# Required by the admin endpoints that serve profiles, and to ask for a
+# request to be profiled
+PROFILE_ADMIN_TOKEN = os.getenv("PROFILE_ADMIN_TOKEN")
+# Functions listed in a profile's text summary
+PROFILE_SUMMARY_LINES = 40
+
+T = TypeVar("T")
+
+
+@dataclass
+class ProfileRecord:
+    id: str
+    created_at: float
+    question: str
+    duration_ms: float
+    stats: bytes = field(repr=False)
+    summary: str = field(repr=False)
+
+    @property
+    def size(self) -> int:
+        return len(self.stats) + len(self.summary)
+
+    def metadata(self) -> dict[str, Any]:
+        return {
+            "id": self.id,
+            "created_at": self.created_at,
+            "question": self.question,
+            "duration_ms": self.duration_ms,
+            "size_bytes": self.size,
+        }
+
+    def to_json(self) -> dict[str, Any]:
+        return {
+            **self.metadata(),
+            "stats": base64.b64encode(self.stats).decode(),
+            "summary": self.summary,
+        }
+
+    @classmethod
+    def from_json(cls, data: dict[str, Any]) -> "ProfileRecord":
+        return cls(
+            id=data["id"],
+            created_at=data["created_at"],
+            question=data["question"],
+            duration_ms=data["duration_ms"],
+            stats=base64.b64decode(data["stats"]),
+            summary=data["summary"],
+        )
+
+
+class ProfileStore:
+    """In-memory profiles, evicting the oldest past a total size.
+
+    With a `shared` cache, profiles are kept there instead, so the admin
+    endpoints of any worker can serve them. Their metadata is kept apart
+    from the stats, so listing and evicting profiles doesn't read those.
+    """
+
+    def __init__(self, max_bytes: int, shared: Optional[SharedCache] = None):
+        self.max_bytes = max_bytes
+        self.shared = shared
+        self._profiles: OrderedDict[str, ProfileRecord] = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def add(self, record: ProfileRecord) -> None:
+        if self.shared is not None:
+            self.shared.set("profiles", record.id, record.to_json())
+            self.shared.set("profile_metadata", record.id, record.metadata())
+            self._evict_shared()
+            return
+
+        with self._lock:
+            self._profiles[record.id] = record
+            self._size += record.size
+            while self._size > self.max_bytes and self._profiles:
+                _, evicted = self._profiles.popitem(last=False)
+                self._size -= evicted.size
+
+    def _evict_shared(self) -> None:
+        profiles = sorted(
+            self.shared.values("profile_metadata"),
+            key=lambda metadata: metadata["created_at"],
+        )
+        size = sum(metadata["size_bytes"] for metadata in profiles)
+        for metadata in profiles:
+            if size <= self.max_bytes:
+                break
+            self.shared.delete("profiles", metadata["id"])
+            self.shared.delete("profile_metadata", metadata["id"])
+            size -= metadata["size_bytes"]
+
+    def get(self, profile_id: str) -> Optional[ProfileRecord]:
+        if self.shared is not None:
+            data = self.shared.get("profiles", profile_id)
+            return None if data is None else ProfileRecord.from_json(data)
+
+        with self._lock:
+            return self._profiles.get(profile_id)
+
+    def list(self) -> list[dict[str, Any]]:
+        """Metadata of the stored profiles, newest first"""
+
+        if self.shared is not None:
+            return sorted(
+                self.shared.values("profile_metadata"),
+                key=lambda metadata: metadata["created_at"],
+                reverse=True,
+            )
+
+        with self._lock:
+            return [record.metadata() for record in reversed(self._profiles.values())]
+
+
+profile_store = ProfileStore(PROFILE_STORE_MAX_BYTES, shared=shared_cache)
+
+# cProfile allows one active profiler per process
+_profiler_lock = threading.Lock()
+
+
+def should_profile(header_value: Optional[str], admin_token: Optional[str]) -> bool:
+    """Whether to profile a request: when asked to by an admin, or sampled"""
+
+    if (
+        PROFILE_ADMIN_TOKEN
+        and admin_token == PROFILE_ADMIN_TOKEN
+        and (header_value or "").lower() in ("1", "true", "yes")
+    ):
+        return True
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+
+def _summarize(profiler: cProfile.Profile) -> str:
+    output = io.StringIO()
+    stats = pstats.Stats(profiler, stream=output)
+    stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(PROFILE_SUMMARY_LINES)
+    return output.getvalue()
+
+
+def run_profiled(
+    func: Callable[[], T], question: str, store: ProfileStore = profile_store
+) -> tuple[T, Optional[str]]:
+    """Run `func` under cProfile and store the profile.
+
+    Returns the result and the profile id. Runs `func` unprofiled and
+    returns no id while another request is being profiled.
+    """
+
+    if not _profiler_lock.acquire(blocking=False):
+        return func(), None
+
+    try:
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        profiler.enable()
+        try:
+            result = func()
+        finally:
+            profiler.disable()
+            duration_ms = round((time.perf_counter() - started) * 1000, 2)
+    finally:
+        _profiler_lock.release()
+
+    profiler.create_stats()
+    record = ProfileRecord(
+        id=uuid.uuid4().hex,
+        created_at=time.time(),
+        question=question,
+        duration_ms=duration_ms,
+        # Same format as cProfile's output files, readable by pstats
+        stats=marshal.dumps(profiler.stats),
+        summary=_summarize(profiler),
+    )
+    store.add(record)
+    LOGGER.info("Stored profile %s (%s ms)", record.id, duration_ms)
+    return result, record.id
@@ -0,0 +1,230 @@
+import os
+import json
+import time
+import asyncio
+import threading
+from typing import Any, AsyncIterator, Iterator, Optional
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForLLMRun,
+    CallbackManagerForLLMRun,
+)
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+from langchain_openai import ChatOpenAI
+from src.utils.admission import Overloaded
+from src.utils.telemetry import metrics
+from src.utils.token_budget import count_message_tokens, count_tokens
+
+# Default limits for every model, 0 disables a limit
+LLM_REQUESTS_PER_MINUTE = float(os.getenv("LLM_REQUESTS_PER_MINUTE", "500"))
+LLM_TOKENS_PER_MINUTE = float(os.getenv("LLM_TOKENS_PER_MINUTE", "200000"))
+# Overrides by model, e.g. {"gpt-4o": {"requests_per_minute": 5000,
+# "tokens_per_minute": 800000}}
+LLM_RATE_LIMITS = json.loads(os.getenv("LLM_RATE_LIMITS", "{}"))
+# Each worker process gets an equal share of the limits
+API_WORKERS = int(os.getenv("API_WORKERS", "1"))
+# Calls that would wait longer than this for capacity fail instead
+LLM_RATE_LIMIT_MAX_WAIT_SECONDS = float(
+    os.getenv("LLM_RATE_LIMIT_MAX_WAIT_SECONDS", "10")
+)
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at `per_minute`.
+
+    Capacity is reserved up front and may go into debt, so concurrent
+    callers queue up in order instead of polling.
+    """
+
+    def __init__(self, per_minute: float):
+        self.per_minute = per_minute
+        self.capacity = per_minute
+        self._tokens = per_minute
+        self._updated_at = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._updated_at
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.per_minute / 60)
+        self._updated_at = now
+
+    def reserve(self, amount: float, now: float) -> float:
+        """Take `amount` and return the seconds to wait before using it"""
+
+        self._refill(now)
+        self._tokens -= min(amount, self.capacity)
+        return max(0.0, -self._tokens * 60 / self.per_minute)
+
+    def refund(self, amount: float) -> None:
+        self._tokens += min(amount, self.capacity)
+
+
+class ModelRateLimiter:
+    """Requests and tokens per minute for one model, shared by every
+    chat model instance using it"""
+
+    def __init__(
+        self,
+        model: str,
+        requests_per_minute: float,
+        tokens_per_minute: float,
+        max_wait_seconds: float = LLM_RATE_LIMIT_MAX_WAIT_SECONDS,
+    ):
+        self.model = model
+        self.max_wait_seconds = max_wait_seconds
+        self._buckets = {
+            "requests": (
+                TokenBucket(requests_per_minute) if requests_per_minute else None
+            ),
+            "tokens": TokenBucket(tokens_per_minute) if tokens_per_minute else None,
+        }
+        self._lock = threading.Lock()
+
+    def reserve(self, tokens: int) -> float:
+        """Reserve one request with `tokens` prompt tokens and return the
+        seconds to wait, or raise `Overloaded` past the maximum wait"""
+
+        amounts = {"requests": 1, "tokens": tokens}
+        with self._lock:
+            now = time.monotonic()
+            wait = 0.0
+            for name, bucket in self._buckets.items():
+                if bucket is not None:
+                    wait = max(wait, bucket.reserve(amounts[name], now))
+
+            if wait > self.max_wait_seconds:
+                for name, bucket in self._buckets.items():
+                    if bucket is not None:
+                        bucket.refund(amounts[name])
+                metrics.inc(
+                    "bank_chatbot_llm_rate_limited_calls",
+                    "model",
+                    self.model,
+                    help=(
+                        "LLM calls rejected because the model's rate limit "
+                        "was exhausted"
+                    ),
+                )
+                raise Overloaded(f"Rate limit for {self.model} exhausted", 503, wait)
+
+        metrics.observe(
+            "bank_chatbot_llm_rate_limit_wait_seconds",
+            "model",
+            self.model,
+            wait,
+            help="Time LLM calls waited for rate limit capacity",
+        )
+        return wait
+
+    def record_completion(self, tokens: int) -> None:
+        """Count generated tokens, which providers also limit"""
+
+        bucket = self._buckets["tokens"]
+        if bucket is not None and tokens:
+            with self._lock:
+                bucket.reserve(tokens, time.monotonic())
+
+
+_limiters: dict[str, ModelRateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_model_limiter(model: str) -> ModelRateLimiter:
+    with _limiters_lock:
+        if model not in _limiters:
+            limits = LLM_RATE_LIMITS.get(model, {})
+            _limiters[model] = ModelRateLimiter(
+                model,
+                limits.get("requests_per_minute", LLM_REQUESTS_PER_MINUTE)
+                / API_WORKERS,
+                limits.get("tokens_per_minute", LLM_TOKENS_PER_MINUTE) / API_WORKERS,
+            )
+        return _limiters[model]
+
+
+def _completion_tokens(result: ChatResult) -> int:
+    usage = (result.llm_output or {}).get("token_usage") or {}
+    return usage.get("completion_tokens") or 0
+
+
+def _chunk_text(chunk: ChatGenerationChunk) -> str:
+    tool_call_args = [
+        tool_call.get("args") or ""
+        for tool_call in getattr(chunk.message, "tool_call_chunks", [])
+    ]
+    return chunk.text + "".join(tool_call_args)
+
+
+class RateLimitedChatOpenAI(ChatOpenAI):
+    """ChatOpenAI that waits for its model's rate limit before each call"""
+
+    def _reserve(self, messages: list[BaseMessage], **kwargs: Any) -> float:
+        tokens = count_message_tokens(messages, self.model_name, kwargs.get("tools"))
+        return get_model_limiter(self.model_name).reserve(tokens)
+
+    def _record_streamed(self, usage: Optional[dict], text: list[str]) -> None:
+        # Usage is only streamed with `stream_usage`, otherwise the tokens
+        # generated so far are estimated from their text
+        tokens = (
+            usage["output_tokens"]
+            if usage
+            else count_tokens("".join(text), self.model_name)
+        )
+        get_model_limiter(self.model_name).record_completion(tokens)
+
+    def _generate(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        time.sleep(self._reserve(messages, **kwargs))
+        result = super()._generate(messages, stop, run_manager, **kwargs)
+        get_model_limiter(self.model_name).record_completion(_completion_tokens(result))
+        return result
+
+    async def _agenerate(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        await asyncio.sleep(self._reserve(messages, **kwargs))
+        result = await super()._agenerate(messages, stop, run_manager, **kwargs)
+        get_model_limiter(self.model_name).record_completion(_completion_tokens(result))
+        return result
+
+    def _stream(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        time.sleep(self._reserve(messages, **kwargs))
+        usage, text = None, []
+        try:
+            for chunk in super()._stream(messages, stop, run_manager, **kwargs):
+                usage = getattr(chunk.message, "usage_metadata", None) or usage
+                text.append(_chunk_text(chunk))
+                yield chunk
+        finally:
+            self._record_streamed(usage, text)
+
+    async def _astream(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        await asyncio.sleep(self._reserve(messages, **kwargs))
+        usage, text = None, []
+        try:
+            async for chunk in super()._astream(messages, stop, run_manager, **kwargs):
+                usage = getattr(chunk.message, "usage_metadata", None) or usage
+                text.append(_chunk_text(chunk))
+                yield chunk
+        finally:
+            self._record_streamed(usage, text)
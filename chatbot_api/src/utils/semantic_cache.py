@@ -0,0 +1,183 @@
+import os
+import time
+import base64
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Callable, Optional
+import numpy as np
+from src.utils.shared_cache import SharedCache
+from src.utils.telemetry import metrics
+
+# Answers to FAQ questions are reused for similar enough questions
+FAQ_CACHE_ENABLED = os.getenv("FAQ_CACHE_ENABLED", "true").lower() == "true"
+# Minimum cosine similarity between a question and a cached one
+FAQ_CACHE_SIMILARITY_THRESHOLD = float(
+    os.getenv("FAQ_CACHE_SIMILARITY_THRESHOLD", "0.95")
+)
+# Least recently used answers are evicted past this many
+FAQ_CACHE_MAX_ENTRIES = int(os.getenv("FAQ_CACHE_MAX_ENTRIES", "1000"))
+# How often to check whether the ETL has reloaded the FAQs
+FAQ_CACHE_GENERATION_CHECK_SECONDS = float(
+    os.getenv("FAQ_CACHE_GENERATION_CHECK_SECONDS", "60")
+)
+
+
+class SemanticAnswerCache:
+    """Answers keyed by question embedding, looked up by cosine similarity.
+
+    Entries belong to a data generation returned by `load_generation`,
+    e.g. a hash of the source documents. The cache empties itself when
+    the generation changes. Vectors are kept in one preallocated matrix,
+    so a lookup is a single matrix-vector product.
+
+    With a `shared` cache, answers are also written there and answers
+    stored by other workers are loaded whenever the generation is checked.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        load_generation: Callable[[], Optional[str]],
+        similarity_threshold: float = FAQ_CACHE_SIMILARITY_THRESHOLD,
+        max_entries: int = FAQ_CACHE_MAX_ENTRIES,
+        generation_check_seconds: float = FAQ_CACHE_GENERATION_CHECK_SECONDS,
+        shared: Optional[SharedCache] = None,
+    ):
+        self.name = name
+        self.load_generation = load_generation
+        self.similarity_threshold = similarity_threshold
+        self.max_entries = max_entries
+        self.generation_check_seconds = generation_check_seconds
+        self.shared = shared
+
+        self._vectors: Optional[np.ndarray] = None
+        self._used = np.zeros(max_entries, dtype=bool)
+        self._answers: list[Optional[str]] = [None] * max_entries
+        self._slot_keys: list[Optional[str]] = [None] * max_entries
+        # Slot of each stored vector by hash, least recently used first
+        self._lru: OrderedDict[str, int] = OrderedDict()
+        self._generation: Optional[str] = None
+        self._generation_checked_at = float("-inf")
+        self._lock = threading.Lock()
+
+    def _clear(self) -> None:
+        self._used[:] = False
+        self._answers = [None] * self.max_entries
+        self._slot_keys = [None] * self.max_entries
+        self._lru.clear()
+
+    def _check_generation(self) -> bool:
+        """Check whether the data generation changed, when due. Loading it
+        may query Neo4j, so it runs outside the lock. False when it can't
+        be loaded, and answers can't be trusted to be current."""
+
+        with self._lock:
+            now = time.monotonic()
+            if now - self._generation_checked_at < self.generation_check_seconds:
+                return True
+            self._generation_checked_at = now
+
+        try:
+            generation = self.load_generation()
+            entries = (
+                self.shared.values(f"{self.name}_answers", self.max_entries)
+                if self.shared is not None
+                else []
+            )
+        except Exception as e:
+            print(f"Couldn't check whether {self.name} data changed: {e}")
+            with self._lock:
+                self._generation_checked_at = float("-inf")
+            return False
+
+        with self._lock:
+            if generation != self._generation:
+                if self._lru:
+                    print(
+                        f"{self.name} data changed, clearing {len(self._lru)} answers"
+                    )
+                self._clear()
+                self._generation = generation
+            self._load_shared(entries)
+        return True
+
+    def _load_shared(self, entries: list[dict]) -> None:
+        # Oldest first, so the most recent end up most recently used
+        for entry in reversed(entries):
+            if entry["generation"] != self._generation:
+                continue
+            vector = np.frombuffer(base64.b64decode(entry["vector"]), np.float32)
+            key = hashlib.sha256(vector.tobytes()).hexdigest()
+            if key not in self._lru:
+                self._insert(key, vector, entry["answer"])
+
+    @staticmethod
+    def _normalize(vector: list[float]) -> np.ndarray:
+        array = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(array)
+        return array / norm if norm else array
+
+    def _insert(self, key: str, vector: np.ndarray, answer: str) -> None:
+        if self._vectors is None:
+            self._vectors = np.zeros((self.max_entries, len(vector)), dtype=np.float32)
+
+        if key in self._lru:
+            slot = self._lru.pop(key)
+        elif len(self._lru) < self.max_entries:
+            slot = int(np.argmin(self._used))
+        else:
+            _, slot = self._lru.popitem(last=False)
+
+        self._vectors[slot] = vector
+        self._answers[slot] = answer
+        self._slot_keys[slot] = key
+        self._used[slot] = True
+        self._lru[key] = slot
+
+    def lookup(self, vector: list[float]) -> Optional[str]:
+        """The cached answer to the most similar question above the threshold"""
+
+        query = self._normalize(vector)
+        current = self._check_generation()
+        with self._lock:
+            answer = None
+            if current and self._lru and self._vectors is not None:
+                scores = self._vectors @ query
+                scores[~self._used] = -np.inf
+                slot = int(np.argmax(scores))
+                if scores[slot] >= self.similarity_threshold:
+                    self._lru.move_to_end(self._slot_keys[slot])
+                    answer = self._answers[slot]
+
+        metrics.inc(
+            "bank_chatbot_semantic_cache_lookups",
+            "outcome",
+            f"{self.name}_{'hit' if answer is not None else 'miss'}",
+            help="Semantic answer cache lookups by outcome",
+        )
+        return answer
+
+    def store(self, vector: list[float], answer: str) -> None:
+        query = self._normalize(vector)
+        key = hashlib.sha256(query.tobytes()).hexdigest()
+        if not self._check_generation():
+            return
+        with self._lock:
+            self._insert(key, query, answer)
+            generation = self._generation
+
+        if self.shared is not None:
+            self.shared.set(
+                f"{self.name}_answers",
+                key,
+                {
+                    "generation": generation,
+                    "vector": base64.b64encode(query.tobytes()).decode(),
+                    "answer": answer,
+                },
+                max_entries=self.max_entries,
+            )
+
+    def __len__(self) -> int:
+        return len(self._lru)
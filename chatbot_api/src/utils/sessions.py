@@ -0,0 +1,193 @@
+import os
+import re
+import time
+import uuid
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from typing import Any, Iterator, Optional
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+from src.utils.shared_cache import SharedCache, shared_cache
+
+# Sessions idle for longer than this are forgotten
+SESSION_TTL_SECONDS = int(os.getenv("SESSION_TTL_SECONDS", "1800"))
+# Least recently used sessions are evicted past this many
+SESSION_MAX_SESSIONS = int(os.getenv("SESSION_MAX_SESSIONS", "10000"))
+# Most recent turns passed to the agent verbatim, older ones are summarized
+SESSION_MAX_TURNS = int(os.getenv("SESSION_MAX_TURNS", "4"))
+SESSION_SUMMARY_MAX_CHARS = int(os.getenv("SESSION_SUMMARY_MAX_CHARS", "1200"))
+
+# Query result columns that identify an entity, by entity name. Names of
+# other nodes are also called `name`, so only `customer_name` is a customer's.
+ENTITY_COLUMNS = {
+    "customer_id": ("customer_id", "customerid", "customer_number"),
+    "customer_name": ("customer_name",),
+    "loan_number": ("loan_number", "loan_id", "mortgage_id", "loan"),
+}
+
+# Entities resolved while answering the current request
+_resolved_entities: ContextVar[Optional[dict[str, str]]] = ContextVar(
+    "resolved_entities", default=None
+)
+
+
+def _first_sentence(text: str, max_chars: int = 200) -> str:
+    sentence = re.split(r"(?<=[.!?])\s", text.strip(), maxsplit=1)[0]
+    return sentence if len(sentence) <= max_chars else sentence[:max_chars] + "..."
+
+
+@dataclass
+class Session:
+    id: str
+    history: list[tuple[str, str]] = field(default_factory=list)
+    summary: str = ""
+    entities: dict[str, str] = field(default_factory=dict)
+    last_used: float = field(default_factory=time.monotonic)
+
+    def add_turn(self, question: str, answer: str) -> None:
+        """Append a turn, folding the oldest turns into the summary"""
+
+        self.history.append((question, answer))
+        while len(self.history) > SESSION_MAX_TURNS:
+            old_question, old_answer = self.history.pop(0)
+            turn = f"User asked: {old_question.strip()} Answer: " + _first_sentence(
+                old_answer
+            )
+            self.summary = f"{self.summary}\n{turn}".strip()
+        if len(self.summary) > SESSION_SUMMARY_MAX_CHARS:
+            # Keep the most recent part of the summary
+            self.summary = self.summary[-SESSION_SUMMARY_MAX_CHARS:].split("\n", 1)[-1]
+
+    def agent_inputs(self) -> dict[str, Any]:
+        """Chat history and session context for the agent prompt"""
+
+        chat_history: list[BaseMessage] = []
+        for question, answer in self.history:
+            chat_history += [HumanMessage(content=question), AIMessage(content=answer)]
+
+        context = []
+        if self.summary:
+            context.append(f"Summary of the earlier conversation:\n{self.summary}")
+        if self.entities:
+            known = ", ".join(f"{k}: {v}" for k, v in self.entities.items())
+            context.append(
+                "Entities already identified in this conversation. Use them in "
+                f"tool inputs instead of looking them up again: {known}"
+            )
+        return {"chat_history": chat_history, "session_context": "\n\n".join(context)}
+
+
+class SessionStore:
+    """In-memory sessions with LRU eviction and an idle TTL.
+
+    With a `shared` cache, sessions are kept there instead so that any
+    worker can continue a conversation.
+    """
+
+    def __init__(
+        self,
+        max_sessions: int = SESSION_MAX_SESSIONS,
+        ttl_seconds: int = SESSION_TTL_SECONDS,
+        shared: Optional[SharedCache] = None,
+    ):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.shared = shared
+        self._sessions: OrderedDict[str, Session] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _evict_expired(self, now: float) -> None:
+        # Sessions are ordered by last use, so expired ones come first
+        while self._sessions:
+            oldest = next(iter(self._sessions.values()))
+            if now - oldest.last_used <= self.ttl_seconds:
+                break
+            self._sessions.popitem(last=False)
+
+    def get(self, session_id: Optional[str]) -> Session:
+        """The live session with this id, or a new one"""
+
+        if self.shared is not None:
+            data = self.shared.get("sessions", session_id) if session_id else None
+            if data is None:
+                return Session(id=session_id or uuid.uuid4().hex)
+            data["history"] = [tuple(turn) for turn in data["history"]]
+            return Session(**data)
+
+        now = time.monotonic()
+        with self._lock:
+            self._evict_expired(now)
+            session = self._sessions.get(session_id) if session_id else None
+            if session is None:
+                session = Session(id=session_id or uuid.uuid4().hex)
+            return session
+
+    def save(self, session: Session) -> None:
+        if self.shared is not None:
+            data = asdict(session)
+            # Monotonic clocks aren't comparable across processes
+            del data["last_used"]
+            self.shared.set(
+                "sessions",
+                session.id,
+                data,
+                ttl_seconds=self.ttl_seconds,
+                max_entries=self.max_sessions,
+            )
+            return
+
+        with self._lock:
+            session.last_used = time.monotonic()
+            self._sessions[session.id] = session
+            self._sessions.move_to_end(session.id)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+
+session_store = SessionStore(shared=shared_cache)
+
+
+def extract_entities(rows: list[Any]) -> dict[str, str]:
+    """Entities that a query result identifies unambiguously.
+
+    A column counts when its name matches one of `ENTITY_COLUMNS` and all
+    rows agree on its value.
+    """
+
+    values: dict[str, set[str]] = {}
+    for row in rows:
+        if not isinstance(row, dict):
+            continue
+        for column, value in row.items():
+            if value is None or isinstance(value, (dict, list)):
+                continue
+            name = column.lower().split(".")[-1]
+            for entity, columns in ENTITY_COLUMNS.items():
+                if name in columns:
+                    values.setdefault(entity, set()).add(str(value))
+                    break
+
+    return {entity: v.pop() for entity, v in values.items() if len(v) == 1}
+
+
+@contextmanager
+def collect_entities() -> Iterator[dict[str, str]]:
+    """Collect the entities resolved by tools within the block"""
+
+    entities: dict[str, str] = {}
+    token = _resolved_entities.set(entities)
+    try:
+        yield entities
+    finally:
+        _resolved_entities.reset(token)
+
+
+def record_entities(rows: list[Any]) -> None:
+    entities = _resolved_entities.get()
+    if entities is not None:
+        entities.update(extract_entities(rows))
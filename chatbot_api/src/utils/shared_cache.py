@@ -0,0 +1,175 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Any, Optional
+from langchain_core.embeddings import Embeddings
+
+# SQLite file shared by every API worker on a host. Empty keeps all caches
+# in-process, which is enough for a single worker.
+SHARED_CACHE_PATH = os.getenv("SHARED_CACHE_PATH", "")
+# Question embeddings kept in the shared cache
+SHARED_EMBEDDING_CACHE_MAX_ENTRIES = int(
+    os.getenv("SHARED_EMBEDDING_CACHE_MAX_ENTRIES", "50000")
+)
+
+
+class SharedCache:
+    """JSON values in a SQLite file, safe to use from several processes.
+
+    Entries live in namespaces, each optionally capped with least recently
+    used eviction and given a TTL. SQLite's file locking serializes writers
+    across processes, and WAL mode lets readers run alongside a writer.
+    """
+
+    def __init__(self, path: str, timeout: float = 30.0):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        self._writes: dict[str, int] = {}
+        self._connection().executescript(
+            """
+            CREATE TABLE IF NOT EXISTS entries (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                expires_at REAL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (namespace, key)
+            );
+            CREATE INDEX IF NOT EXISTS entries_last_used
+                ON entries (namespace, last_used);
+            """
+        )
+
+    def _connection(self) -> sqlite3.Connection:
+        # Connections can't be shared across threads or forked processes
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(
+                self.path, timeout=self.timeout, isolation_level=None
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        now = time.time()
+        cursor = self._connection().execute(
+            """
+            UPDATE entries SET last_used = ?
+            WHERE namespace = ? AND key = ?
+            AND (expires_at IS NULL OR expires_at > ?)
+            RETURNING value
+            """,
+            (now, namespace, key, now),
+        )
+        row = cursor.fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def set(
+        self,
+        namespace: str,
+        key: str,
+        value: Any,
+        ttl_seconds: Optional[float] = None,
+        max_entries: Optional[int] = None,
+    ) -> None:
+        now = time.time()
+        conn = self._connection()
+        conn.execute(
+            """
+            INSERT OR REPLACE INTO entries
+                (namespace, key, value, expires_at, last_used)
+            VALUES (?, ?, ?, ?, ?)
+            """,
+            (
+                namespace,
+                key,
+                json.dumps(value),
+                now + ttl_seconds if ttl_seconds else None,
+                now,
+            ),
+        )
+        # Trimming scans the namespace, so only trim once per ~1% of the cap
+        writes = self._writes.get(namespace, 0) + 1
+        self._writes[namespace] = writes
+        if max_entries and writes % max(1, max_entries // 100) == 0:
+            conn.execute(
+                """
+                DELETE FROM entries WHERE namespace = ? AND key IN (
+                    SELECT key FROM entries WHERE namespace = ?
+                    ORDER BY last_used DESC LIMIT -1 OFFSET ?
+                )
+                """,
+                (namespace, namespace, max_entries),
+            )
+
+    def values(self, namespace: str, limit: int = -1) -> list[Any]:
+        """Live values in a namespace, most recently used first"""
+
+        rows = self._connection().execute(
+            """
+            SELECT value FROM entries
+            WHERE namespace = ? AND (expires_at IS NULL OR expires_at > ?)
+            ORDER BY last_used DESC LIMIT ?
+            """,
+            (namespace, time.time(), limit),
+        )
+        return [json.loads(value) for value, in rows]
+
+    def delete(self, namespace: str, key: str) -> None:
+        self._connection().execute(
+            "DELETE FROM entries WHERE namespace = ? AND key = ?", (namespace, key)
+        )
+
+    def clear(self, namespace: str) -> None:
+        self._connection().execute(
+            "DELETE FROM entries WHERE namespace = ?", (namespace,)
+        )
+
+
+shared_cache = SharedCache(SHARED_CACHE_PATH) if SHARED_CACHE_PATH else None
+
+
+class SharedCacheEmbeddings(Embeddings):
+    """Embeddings that reuse vectors computed by any worker"""
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        cache: SharedCache,
+        max_entries: int = SHARED_EMBEDDING_CACHE_MAX_ENTRIES,
+    ):
+        self.embeddings = embeddings
+        self.cache = cache
+        self.max_entries = max_entries
+        self.model = getattr(embeddings, "model", type(embeddings).__name__)
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model}\x00{text}".encode()).hexdigest()
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        key = self._key(text)
+        vector = self.cache.get("embeddings", key)
+        if vector is None:
+            vector = self.embeddings.embed_query(text)
+            self.cache.set("embeddings", key, vector, max_entries=self.max_entries)
+        return vector
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        return [await self.aembed_query(text) for text in texts]
+
+    async def aembed_query(self, text: str) -> list[float]:
+        key = self._key(text)
+        vector = self.cache.get("embeddings", key)
+        if vector is None:
+            vector = await self.embeddings.aembed_query(text)
+            self.cache.set("embeddings", key, vector, max_entries=self.max_entries)
+        return vector
@@ -0,0 +1,69 @@
+import json
+import asyncio
+import hashlib
+from typing import Any, Awaitable, Callable, TypeVar
+from src.utils.telemetry import metrics
+
+T = TypeVar("T")
+
+
+def normalize_question(text: str) -> str:
+    """Case, whitespace and trailing punctuation don't change a question"""
+
+    return " ".join(text.lower().split()).rstrip("?!. ")
+
+
+def flight_key(text: str, context: Any = None) -> str:
+    """Key shared by requests that would run the agent identically"""
+
+    payload = json.dumps(
+        {"question": normalize_question(text), "context": context},
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class SingleFlight:
+    """Share one in-flight execution between concurrent calls with a key.
+
+    The execution runs as its own task, so a caller that goes away (e.g. a
+    disconnected client) doesn't cancel it for the others. It's cancelled
+    once every caller has gone. Must be used from a single event loop.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._in_flight: dict[str, asyncio.Task] = {}
+        self._waiters: dict[asyncio.Task, int] = {}
+
+    async def do(self, key: str, func: Callable[[], Awaitable[T]]) -> tuple[T, bool]:
+        """Result of `func`, and whether it was shared with an earlier call"""
+
+        task = self._in_flight.get(key)
+        coalesced = task is not None
+        if task is None:
+            task = asyncio.ensure_future(func())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+
+        metrics.inc(
+            "bank_chatbot_single_flight_requests",
+            "outcome",
+            f"{self.name}_{'coalesced' if coalesced else 'executed'}",
+            help="Requests that ran an execution or joined one in flight",
+        )
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            return await asyncio.shield(task), coalesced
+        except asyncio.CancelledError:
+            if self._waiters[task] == 1:
+                task.cancel()
+            raise
+        finally:
+            self._waiters[task] -= 1
+            if not self._waiters[task]:
+                del self._waiters[task]
+
+    def __len__(self) -> int:
+        return len(self._in_flight)
@@ -0,0 +1,148 @@
+import os
+import asyncio
+from concurrent.futures import CancelledError, Future
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Iterator, Optional
+from langchain_core.embeddings import Embeddings
+from src.utils.single_flight import normalize_question
+from src.utils.telemetry import metrics, stage_span
+
+# Start retrieval for every tool as soon as a question arrives, while the
+# agent LLM decides which tool to call. Saves a retrieval round trip on
+# answers that use a tool, at the cost of retrievals that go unused.
+SPECULATIVE_RETRIEVAL_ENABLED = (
+    os.getenv("SPECULATIVE_RETRIEVAL_ENABLED", "false").lower() == "true"
+)
+
+SpeculativeTask = Callable[["Speculation"], Awaitable[Any]]
+
+_tasks: dict[str, SpeculativeTask] = {}
+_current: ContextVar[Optional["Speculation"]] = ContextVar("speculation", default=None)
+
+
+def speculative_task(name: str) -> Callable[[SpeculativeTask], SpeculativeTask]:
+    """Register a coroutine run for every question when speculating. Its
+    result is handed to the tool asking for `name` with the same question."""
+
+    def register(func: SpeculativeTask) -> SpeculativeTask:
+        _tasks[name] = func
+        return func
+
+    return register
+
+
+class Speculation:
+    """Retrievals started for one question, run on the event loop.
+
+    Results are kept in thread-safe futures, since the tools that take
+    them run in worker threads.
+    """
+
+    def __init__(self, question: str):
+        self.question = question
+        self._key = normalize_question(question)
+        self._loop = asyncio.get_running_loop()
+        self._futures: dict[str, Future] = {}
+        self._tasks: list[asyncio.Task] = []
+        self._embeddings: dict[str, asyncio.Task] = {}
+        self._taken: set[str] = set()
+
+    def start(self, tasks: dict[str, SpeculativeTask]) -> None:
+        for name, func in tasks.items():
+            future: Future = Future()
+            task = self._loop.create_task(self._run(name, func))
+            task.add_done_callback(lambda t, f=future: _resolve(f, t))
+            self._futures[name] = future
+            self._tasks.append(task)
+
+    async def _run(self, name: str, func: SpeculativeTask) -> Any:
+        with stage_span(f"speculative_{name}"):
+            return await func(self)
+
+    async def embed(self, embeddings: Embeddings) -> list[float]:
+        """The question's embedding, computed once per embedding model"""
+
+        model = getattr(embeddings, "model", type(embeddings).__name__)
+        if model not in self._embeddings:
+            self._embeddings[model] = self._loop.create_task(
+                asyncio.to_thread(embeddings.embed_query, self.question)
+            )
+        return await self._embeddings[model]
+
+    def take(self, name: str, question: str) -> Optional[Any]:
+        """The result of task `name`, waiting for it if needed, or None when
+        it was run for another question or failed"""
+
+        future = self._futures.get(name)
+        if future is None or normalize_question(question) != self._key:
+            return None
+        # Waiting on the event loop thread would block the task itself
+        try:
+            on_loop = asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            on_loop = False
+        if on_loop and not future.done():
+            return None
+
+        try:
+            result = future.result()
+        except (Exception, CancelledError) as e:
+            print(f"Speculative {name} failed, retrieving again: {e}")
+            return None
+        self._taken.add(name)
+        return result
+
+    def close(self) -> None:
+        for task in self._tasks + list(self._embeddings.values()):
+            task.cancel()
+        for name, future in self._futures.items():
+            if name in self._taken:
+                outcome = "used"
+            elif future.done() and not future.cancelled() and future.exception():
+                outcome = "failed"
+            else:
+                outcome = "unused"
+            metrics.inc(
+                "bank_chatbot_speculative_retrievals",
+                "outcome",
+                f"{name}_{outcome}",
+                help="Speculative retrievals by task and whether a tool used them",
+            )
+
+
+def _resolve(future: Future, task: asyncio.Task) -> None:
+    if task.cancelled():
+        future.cancel()
+    elif task.exception() is not None:
+        future.set_exception(task.exception())
+    else:
+        future.set_result(task.result())
+
+
+@contextmanager
+def speculate(question: str) -> Iterator[Optional[Speculation]]:
+    """Start the registered retrievals for `question`, for the tools called
+    within the block to take. Must be entered on the event loop."""
+
+    if not SPECULATIVE_RETRIEVAL_ENABLED or not _tasks:
+        yield None
+        return
+
+    speculation = Speculation(question)
+    # Started before setting the context variable, so the tasks can't take
+    # their own results
+    speculation.start(dict(_tasks))
+    token = _current.set(speculation)
+    try:
+        yield speculation
+    finally:
+        _current.reset(token)
+        speculation.close()
+
+
+def take_speculative(name: str, question: str) -> Optional[Any]:
+    """Result of the speculative task `name` for `question`, if one ran"""
+
+    speculation = _current.get()
+    return speculation.take(name, question) if speculation is not None else None
@@ -0,0 +1,237 @@
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Iterator, Optional
+from opentelemetry import trace
+from langchain_core.runnables import Runnable, RunnableConfig, RunnableLambda
+
+# Upper bounds, in seconds, of the latency histogram buckets
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+# Upper bounds of the prompt token histogram buckets
+TOKEN_BUCKETS = (250, 500, 1000, 2000, 4000, 8000, 16000, 32000, 64000, 128000)
+# Upper bounds of the histogram of examples per Cypher prompt
+EXAMPLE_COUNT_BUCKETS = (0, 1, 2, 3, 4, 6, 8, 12, 16)
+
+tracer = trace.get_tracer("bank_chatbot")
+
+# Stage timings of the request being served, when it asked for them
+_request_timings: ContextVar[Optional[list[dict[str, Any]]]] = ContextVar(
+    "request_timings", default=None
+)
+# Timing record of the innermost stage or tool being run
+_current_stage: ContextVar[Optional[dict[str, Any]]] = ContextVar(
+    "current_stage", default=None
+)
+
+
+class Histogram:
+    """Cumulative histogram in the Prometheus bucket layout"""
+
+    def __init__(self, buckets: tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, amount: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, amount)] += 1
+        self.sum += amount
+        self.count += 1
+
+    def cumulative_counts(self) -> list[int]:
+        totals, running = [], 0
+        for count in self.counts:
+            running += count
+            totals.append(running)
+        return totals
+
+
+class MetricsRegistry:
+    """Thread-safe histograms and counters keyed by metric name and label value"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms: dict[tuple[str, str], dict[str, Histogram]] = {}
+        self._counters: dict[tuple[str, str], dict[str, float]] = {}
+        self._help: dict[str, str] = {}
+
+    def observe(
+        self,
+        metric: str,
+        label: str,
+        value: str,
+        amount: float,
+        help: str = "",
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+    ) -> None:
+        with self._lock:
+            histograms = self._histograms.setdefault((metric, label), {})
+            histograms.setdefault(value, Histogram(buckets)).observe(amount)
+            if help:
+                self._help[metric] = help
+
+    def inc(
+        self, metric: str, label: str, value: str, amount: float = 1, help: str = ""
+    ) -> None:
+        with self._lock:
+            counters = self._counters.setdefault((metric, label), {})
+            counters[value] = counters.get(value, 0) + amount
+            if help:
+                self._help[metric] = help
+
+    def render_prometheus(self) -> str:
+        """Render every metric in the Prometheus text exposition format"""
+
+        lines = []
+        with self._lock:
+            for (metric, label), counters in sorted(self._counters.items()):
+                if metric in self._help:
+                    lines.append(f"# HELP {metric} {self._help[metric]}")
+                lines.append(f"# TYPE {metric} counter")
+                for value, count in sorted(counters.items()):
+                    lines.append(f'{metric}{{{label}="{value}"}} {count}')
+
+            for (metric, label), histograms in sorted(self._histograms.items()):
+                if metric in self._help:
+                    lines.append(f"# HELP {metric} {self._help[metric]}")
+                lines.append(f"# TYPE {metric} histogram")
+                for value, histogram in sorted(histograms.items()):
+                    bounds = [str(b) for b in histogram.buckets] + ["+Inf"]
+                    for bound, count in zip(bounds, histogram.cumulative_counts()):
+                        lines.append(
+                            f'{metric}_bucket{{{label}="{value}",le="{bound}"}} {count}'
+                        )
+                    lines.append(f'{metric}_sum{{{label}="{value}"}} {histogram.sum}')
+                    lines.append(
+                        f'{metric}_count{{{label}="{value}"}} {histogram.count}'
+                    )
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+
+@contextmanager
+def _timed_span(
+    name: str, kind: str, metric: str, label: str, attributes: dict[str, Any]
+) -> Iterator[trace.Span]:
+    record: dict[str, Any] = {"name": name, "kind": kind}
+    token = _current_stage.set(record)
+    started = time.perf_counter()
+    status = "ok"
+    with tracer.start_as_current_span(name, attributes=attributes) as span:
+        try:
+            yield span
+        except BaseException:
+            status = "error"
+            raise
+        finally:
+            seconds = time.perf_counter() - started
+            _current_stage.reset(token)
+            metrics.observe(
+                metric, label, name, seconds, help=f"Latency of each {label}"
+            )
+            timings = _request_timings.get()
+            if timings is not None:
+                record.update(duration_ms=round(seconds * 1000, 2), status=status)
+                timings.append(record)
+
+
+def stage_span(stage: str, **attributes: Any):
+    """Trace and time one stage of answering a question"""
+
+    return _timed_span(
+        stage, "stage", "bank_chatbot_stage_latency_seconds", "stage", attributes
+    )
+
+
+def tool_span(tool: str, **attributes: Any):
+    """Trace and time one agent tool call"""
+
+    return _timed_span(
+        tool, "tool", "bank_chatbot_tool_latency_seconds", "tool", attributes
+    )
+
+
+def current_stage() -> str:
+    """Name of the innermost stage or tool being run"""
+
+    record = _current_stage.get()
+    return record["name"] if record is not None else "unattributed"
+
+
+def record_prompt_tokens(tokens: int) -> None:
+    """Attribute the tokens of a prompt sent to an LLM to the current stage"""
+
+    record = _current_stage.get()
+    if record is not None:
+        record["prompt_tokens"] = record.get("prompt_tokens", 0) + tokens
+    trace.get_current_span().set_attribute("llm.prompt_tokens", tokens)
+    metrics.observe(
+        "bank_chatbot_prompt_tokens",
+        "stage",
+        current_stage(),
+        tokens,
+        help="Prompt tokens sent to an LLM",
+        buckets=TOKEN_BUCKETS,
+    )
+
+
+def record_prompt_trim(stage: str, items: int) -> None:
+    """Count examples, rows or documents dropped to fit a token budget"""
+
+    metrics.inc(
+        "bank_chatbot_prompt_trimmed_items",
+        "stage",
+        stage,
+        items,
+        help="Prompt items dropped to fit a token budget",
+    )
+
+
+def record_cypher_examples(examples: int) -> None:
+    """Record how many examples a Cypher prompt was given"""
+
+    record = _current_stage.get()
+    if record is not None:
+        record["examples"] = examples
+    metrics.observe(
+        "bank_chatbot_cypher_examples",
+        "stage",
+        current_stage(),
+        examples,
+        help="Examples included in each Cypher generation prompt",
+        buckets=EXAMPLE_COUNT_BUCKETS,
+    )
+
+
+@contextmanager
+def collect_timings() -> Iterator[list[dict[str, Any]]]:
+    """Collect the stage and tool timings recorded within the block.
+
+    The list is shared rather than copied when LangChain runs sync tools in
+    a worker thread, so timings from tools end up in it too.
+    """
+
+    timings: list[dict[str, Any]] = []
+    token = _request_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _request_timings.reset(token)
+
+
+def traced_runnable(runnable: Runnable, stage: str) -> Runnable:
+    """Wrap a runnable so every invocation is recorded as a stage"""
+
+    def _invoke(input: Any, config: RunnableConfig) -> Any:
+        with stage_span(stage):
+            return runnable.invoke(input, config)
+
+    async def _ainvoke(input: Any, config: RunnableConfig) -> Any:
+        with stage_span(stage):
+            return await runnable.ainvoke(input, config)
+
+    return RunnableLambda(_invoke, afunc=_ainvoke, name=stage)
@@ -0,0 +1,133 @@
+import os
+import json
+from functools import lru_cache
+from typing import Any, Callable, Optional, Sequence, TypeVar
+import tiktoken
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.messages import BaseMessage
+from src.utils.telemetry import record_prompt_tokens, record_prompt_trim
+
+# Token budgets for the prompts that include retrieved content. Examples,
+# query results or FAQ documents are dropped from the end until the prompt
+# fits. 0 disables a budget.
+CYPHER_GENERATION_TOKEN_BUDGET = int(
+    os.getenv("CYPHER_GENERATION_TOKEN_BUDGET", "4000")
+)
+QA_GENERATION_TOKEN_BUDGET = int(os.getenv("QA_GENERATION_TOKEN_BUDGET", "8000"))
+FAQ_ANSWER_TOKEN_BUDGET = int(os.getenv("FAQ_ANSWER_TOKEN_BUDGET", "6000"))
+
+# Encoding used when the model is unknown
+DEFAULT_TOKEN_ENCODING = os.getenv("DEFAULT_TOKEN_ENCODING", "o200k_base")
+
+# Tokens OpenAI adds around every chat message and before the reply
+TOKENS_PER_MESSAGE = 3
+TOKENS_PER_REPLY = 3
+
+T = TypeVar("T")
+
+
+@lru_cache(maxsize=None)
+def _encoding(name: str) -> Optional[tiktoken.Encoding]:
+    try:
+        return tiktoken.get_encoding(name)
+    except Exception as e:
+        # tiktoken downloads encodings on first use, which fails offline
+        print(f"Token encoding {name} unavailable, estimating tokens: {e}")
+        return None
+
+
+@lru_cache(maxsize=None)
+def _encoding_name(model: Optional[str]) -> str:
+    if model:
+        try:
+            return tiktoken.encoding_name_for_model(model)
+        except KeyError:
+            pass
+    return DEFAULT_TOKEN_ENCODING
+
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    """Number of tokens in `text` for `model`, estimated when the encoding
+    can't be loaded"""
+
+    encoding = _encoding(_encoding_name(model))
+    if encoding is None:
+        return (len(text) + 3) // 4
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def count_message_tokens(
+    messages: Sequence[BaseMessage],
+    model: Optional[str] = None,
+    tools: Optional[list[dict[str, Any]]] = None,
+) -> int:
+    """Prompt tokens of a chat request, including tool calls and definitions"""
+
+    tokens = TOKENS_PER_REPLY
+    for message in messages:
+        tokens += TOKENS_PER_MESSAGE + count_tokens(str(message.content), model)
+        for tool_call in getattr(message, "tool_calls", None) or []:
+            tokens += count_tokens(
+                tool_call["name"] + json.dumps(tool_call["args"]), model
+            )
+    if tools:
+        tokens += count_tokens(json.dumps(tools), model)
+    return tokens
+
+
+def fit_to_budget(
+    items: list[T],
+    render: Callable[[list[T]], str],
+    budget: Optional[int],
+    stage: str,
+    model: Optional[str] = None,
+) -> list[T]:
+    """Longest prefix of `items` whose rendered prompt fits `budget` tokens.
+
+    Items are expected in order of relevance, so the least relevant are
+    dropped first. No items are kept when the prompt is over budget even
+    without them.
+    """
+
+    if not budget or count_tokens(render(items), model) <= budget:
+        return items
+
+    low, high = 0, len(items) - 1
+    while low < high:
+        middle = (low + high + 1) // 2
+        if count_tokens(render(items[:middle]), model) <= budget:
+            low = middle
+        else:
+            high = middle - 1
+
+    print(
+        f"Dropped {len(items) - low} of {len(items)} items from the {stage} "
+        f"prompt to fit its {budget} token budget"
+    )
+    record_prompt_trim(stage, len(items) - low)
+    return items[:low]
+
+
+class PromptTokenCounter(BaseCallbackHandler):
+    """Count the prompt tokens of every chat model call by stage"""
+
+    # Count in the caller's context so tokens are attributed to its stage
+    run_inline = True
+
+    def on_chat_model_start(
+        self,
+        serialized: dict[str, Any],
+        messages: list[list[BaseMessage]],
+        *,
+        invocation_params: Optional[dict[str, Any]] = None,
+        **kwargs: Any,
+    ) -> None:
+        params = invocation_params or {}
+        model = params.get("model") or params.get("model_name")
+        for prompt in messages:
+            record_prompt_tokens(
+                count_message_tokens(prompt, model, params.get("tools"))
+            )
+
+
+prompt_token_counter = PromptTokenCounter()
@@ -0,0 +1,22 @@
+def text_node_retrieval_query(
+    text_node_properties: list[str],
+    embedding_node_property: str = "embedding",
+    include_embedding: bool = False,
+) -> str:
+    """Build a retrieval query that returns the same text and metadata as
+    `Neo4jVector.from_existing_graph`, for use with `from_existing_index`.
+
+    The embeddings themselves are written by the ETL embedding stage, so
+    connecting to an existing index never embeds anything at startup.
+    With `include_embedding` the node's embedding stays in the metadata.
+    """
+
+    embedding = "" if include_embedding else f"`{embedding_node_property}`: Null, "
+    null_properties = ", ".join(f"`{prop}`: Null" for prop in text_node_properties)
+
+    return (
+        f"RETURN reduce(str='', k IN {text_node_properties} |"
+        " str + '\\n' + k + ': ' + coalesce(node[k], '')) AS text, "
+        f"node {{.*, {embedding}id: Null, "
+        f"{null_properties}}} AS metadata, score"
+    )
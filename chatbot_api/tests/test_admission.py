@@ -0,0 +1,112 @@
+import asyncio
+import pytest
+from langchain_core.messages import AIMessageChunk, HumanMessage
+from langchain_core.outputs import ChatGenerationChunk
+from langchain_openai import ChatOpenAI
+from src.utils import rate_limits
+from src.utils.admission import AdmissionController, Overloaded
+from src.utils.rate_limits import ModelRateLimiter, RateLimitedChatOpenAI, TokenBucket
+from src.utils.token_budget import count_tokens
+
+
+def test_token_bucket_waits_for_refill():
+    """
+    Test that reservations past the capacity wait for the refill rate
+    """
+    bucket = TokenBucket(per_minute=60)
+
+    assert bucket.reserve(60, now=bucket._updated_at) == 0
+    assert bucket.reserve(30, now=bucket._updated_at) == pytest.approx(30)
+
+
+def test_rate_limiter_rejects_past_max_wait():
+    """
+    Test that a call that would wait too long fails without using capacity
+    """
+    limiter = ModelRateLimiter(
+        "test-model", requests_per_minute=60, tokens_per_minute=0, max_wait_seconds=1.5
+    )
+    for _ in range(60):
+        limiter.reserve(tokens=100)
+
+    assert limiter.reserve(tokens=100) == pytest.approx(1, abs=0.1)
+    with pytest.raises(Overloaded) as error:
+        limiter.reserve(tokens=100)
+    assert error.value.status_code == 503
+
+
+class RecordingLimiter(ModelRateLimiter):
+    def __init__(self):
+        super().__init__("test-model", requests_per_minute=0, tokens_per_minute=0)
+        self.completions = []
+
+    def record_completion(self, tokens):
+        self.completions.append(tokens)
+
+
+def stream_chunks(usage):
+    yield ChatGenerationChunk(message=AIMessageChunk("Ann has "))
+    yield ChatGenerationChunk(message=AIMessageChunk("two loans"))
+    if usage:
+        yield ChatGenerationChunk(
+            message=AIMessageChunk(
+                "",
+                usage_metadata={
+                    "input_tokens": 5,
+                    "output_tokens": 7,
+                    "total_tokens": 12,
+                },
+            )
+        )
+
+
+def test_streamed_calls_record_completion_tokens(monkeypatch):
+    """
+    Test that streamed calls count their generated tokens once done, from
+    the streamed usage or else estimated from the text
+    """
+    limiter = RecordingLimiter()
+    monkeypatch.setattr(rate_limits, "get_model_limiter", lambda model: limiter)
+    monkeypatch.setattr(
+        ChatOpenAI, "_stream", lambda self, *args, **kwargs: stream_chunks(True)
+    )
+
+    async def astream_chunks(self, *args, **kwargs):
+        for chunk in stream_chunks(False):
+            yield chunk
+
+    monkeypatch.setattr(ChatOpenAI, "_astream", astream_chunks)
+    llm = RateLimitedChatOpenAI(model="gpt-4o-mini", api_key="test")
+    messages = [HumanMessage("Which loans does Ann have?")]
+
+    assert len(list(llm._stream(messages))) == 3
+    assert limiter.completions == [7]
+
+    async def consume():
+        return [chunk async for chunk in llm._astream(messages)]
+
+    asyncio.run(consume())
+    assert limiter.completions[1] == count_tokens("Ann has two loans", "gpt-4o-mini")
+
+
+def test_admission_rejects_when_queue_is_full():
+    """
+    Test that requests beyond the concurrency and queue limits get a 429
+    """
+    controller = AdmissionController(max_concurrency=1, max_queue=1, queue_timeout=5)
+
+    async def request():
+        async with controller.slot():
+            await asyncio.sleep(0.05)
+
+    async def run():
+        return await asyncio.gather(
+            *[request() for _ in range(3)], return_exceptions=True
+        )
+
+    results = asyncio.run(run())
+
+    assert results[:2] == [None, None]
+    assert isinstance(results[2], Overloaded)
+    assert results[2].status_code == 429
+    assert results[2].retry_after >= 1
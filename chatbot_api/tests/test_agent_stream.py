@@ -0,0 +1,103 @@
+import json
+import asyncio
+from contextlib import AsyncExitStack
+from langchain_core.messages import AIMessage, AIMessageChunk
+from src.models.bank_rag_query import BankQueryInput
+from src.utils.agent_stream import AGENT_LLM_TAG, stream_agent_events
+from src.utils.sessions import Session
+
+
+class StubExecutor:
+    def __init__(self, events):
+        self.events = events
+
+    async def astream_events(self, agent_input, version):
+        for event in self.events:
+            yield event
+
+
+def llm_event(kind, data):
+    return {"event": kind, "data": data, "tags": [AGENT_LLM_TAG], "parent_ids": ["a"]}
+
+
+def stream(executor, session):
+    async def run():
+        return [
+            json.loads(line)
+            async for line in stream_agent_events(
+                executor,
+                None,
+                BankQueryInput(text="Which loans does Ann have?"),
+                session,
+                {"input": "Which loans does Ann have?"},
+                AsyncExitStack(),
+            )
+        ]
+
+    return asyncio.run(run())
+
+
+def test_events_stream_tokens_steps_then_done():
+    """
+    Test that text streamed before a tool call is reset, tool results are
+    sent as steps, and the answer ends the stream and is added to the session
+    """
+    executor = StubExecutor(
+        [
+            llm_event("on_chat_model_stream", {"chunk": AIMessageChunk("Let me")}),
+            llm_event(
+                "on_chat_model_end",
+                {
+                    "output": AIMessage(
+                        "Let me",
+                        tool_calls=[{"name": "loans", "args": {}, "id": "1"}],
+                    )
+                },
+            ),
+            {
+                "event": "on_tool_end",
+                "name": "loans",
+                "data": {"input": "Ann", "output": "L1"},
+                "parent_ids": ["a"],
+            },
+            llm_event("on_chat_model_stream", {"chunk": AIMessageChunk("Ann has ")}),
+            llm_event("on_chat_model_stream", {"chunk": AIMessageChunk("L1")}),
+            {
+                "event": "on_chain_end",
+                "data": {"output": {"output": "Ann has L1", "intermediate_steps": []}},
+                "parent_ids": [],
+            },
+        ]
+    )
+    session = Session(id="s1")
+
+    events = stream(executor, session)
+
+    assert [event["type"] for event in events] == [
+        "token",
+        "reset",
+        "step",
+        "token",
+        "token",
+        "done",
+    ]
+    assert events[2]["output"] == "L1"
+    assert events[-1]["output"] == "Ann has L1"
+    assert events[-1]["session_id"] == "s1"
+    assert session.history == [("Which loans does Ann have?", "Ann has L1")]
+
+
+def test_run_without_an_answer_ends_with_an_error():
+    """
+    Test that a run that never returns an answer sends an error event
+    and leaves the session as it was
+    """
+    executor = StubExecutor(
+        [llm_event("on_chat_model_stream", {"chunk": AIMessageChunk("Ann")})]
+    )
+    session = Session(id="s2")
+
+    events = stream(executor, session)
+
+    assert [event["type"] for event in events] == ["token", "error"]
+    assert session.history == []
@@ -0,0 +1,94 @@
+import numpy as np
+from src.tools.branch_queues import BranchQueueModel, QueueObservation
+
+BRANCHES = [f"branch {i}" for i in range(500)]
+
+
+STATES = ["California", "Texas", "Ohio", None]
+
+
+def make_model(now: list[float]) -> BranchQueueModel:
+    model = BranchQueueModel(step_seconds=60, warmup_steps=30, clock=lambda: now[0])
+    model.set_branches(BRANCHES, [STATES[i % 4] for i in range(len(BRANCHES))])
+    return model
+
+
+def test_wait_times_are_consistent_within_a_step_and_across_models():
+    """
+    Test that repeated queries in one step agree, as do separate processes
+    """
+    now = [1_200_000.0]
+    first, second = make_model(now), make_model(now)
+
+    waits = [first.wait_time(name) for name in BRANCHES]
+    now[0] += 30
+
+    assert [first.wait_time(name) for name in BRANCHES] == waits
+    assert [second.wait_time(name) for name in BRANCHES] == waits
+
+
+def test_most_available_returns_shortest_waits():
+    """
+    Test that the heap returns the same branches as sorting all waits
+    """
+    now = [1_200_000.0]
+    model = make_model(now)
+
+    for _ in range(3):
+        best = model.most_available(5)
+        waits = model.wait_minutes()
+        expected = np.sort(waits)[:5]
+
+        assert [wait for _, wait in best] == [round(w) for w in expected]
+        assert model.most_available(5) == best
+        now[0] += 60
+
+
+def test_update_supersedes_heap_entries():
+    """
+    Test that a pushed observation replaces the branch's old heap entry
+    """
+    model = make_model([1_200_000.0])
+    model.most_available()
+    busiest = BRANCHES[int(np.argmax(model.wait_minutes()))]
+    model.update(busiest, QueueObservation(queue_length=0))
+
+    best = dict(model.most_available(len(BRANCHES)))
+
+    assert len(best) == len(BRANCHES)
+    assert best[busiest] == 0
+    assert model.wait_time(busiest) == 0
+
+
+def test_most_available_in_state_only_returns_that_state():
+    """
+    Test that a state query returns that state's shortest waits
+    """
+    model = make_model([1_200_000.0])
+    model.most_available()
+    in_texas = [i for i in range(len(BRANCHES)) if STATES[i % 4] == "Texas"]
+    waits = model.wait_minutes()[in_texas]
+
+    best = model.most_available(3, state="texas")
+
+    assert {BRANCHES.index(name) % 4 for name, _ in best} == {1}
+    assert [wait for _, wait in best] == [round(w) for w in sorted(waits)[:3]]
+    assert model.most_available(3, state="Nevada") == []
+
+
+def test_models_started_at_different_times_agree():
+    """
+    Test that a model kept running and models started later report the
+    same waits, whenever they started
+    """
+    now = [1_200_000.0]
+    early = make_model(now)
+    early.wait_time(BRANCHES[0])
+
+    for minutes in [10, 10, 25, 50, 7]:
+        now[0] += minutes * 60
+        late = make_model(now)
+        waits = [late.wait_time(name) for name in BRANCHES]
+
+        assert [early.wait_time(name) for name in BRANCHES] == waits
+        assert early.most_available(5) == late.most_available(5)
@@ -0,0 +1,79 @@
+import asyncio
+import pytest
+from langchain_core.embeddings import FakeEmbeddings
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_openai import ChatOpenAI
+from src.utils.cassette import (
+    Cassette,
+    CassetteChatOpenAI,
+    CassetteEmbeddings,
+    request_key,
+)
+
+
+def test_request_key_ignores_key_order():
+    """
+    Test that equivalent requests hash to the same cassette key
+    """
+    first = {"model": "gpt-4o-mini", "messages": [{"role": "user", "content": "hi"}]}
+    second = {"messages": [{"content": "hi", "role": "user"}], "model": "gpt-4o-mini"}
+
+    assert request_key(first) == request_key(second)
+    assert request_key(first) != request_key({**first, "temperature": 1})
+
+
+def test_embeddings_replay_recorded_vectors(tmp_path):
+    """
+    Test that replayed embeddings match the recording and misses fail loudly
+    """
+    cassette = Cassette(str(tmp_path))
+    recorder = CassetteEmbeddings(FakeEmbeddings(size=4), cassette, "record")
+    recorded = recorder.embed_query("What is a Jumbo loan?")
+
+    player = CassetteEmbeddings(FakeEmbeddings(size=4), cassette, "replay")
+
+    assert player.embed_query("What is a Jumbo loan?") == recorded
+    with pytest.raises(ValueError):
+        player.embed_query("An unrecorded question")
+
+
+def chat_model(cassette, mode):
+    # Nothing listens on this port, so a network call would fail
+    return CassetteChatOpenAI(
+        model="gpt-4o-mini",
+        api_key="test",
+        base_url="http://127.0.0.1:9/v1",
+        max_retries=0,
+        cassette=cassette,
+        cassette_mode=mode,
+    )
+
+
+def test_chat_model_replays_recording_without_calling_the_api(tmp_path, monkeypatch):
+    """
+    Test that a recorded chat response is replayed without calling the
+    API, and that an unrecorded request fails in replay mode
+    """
+    cassette = Cassette(str(tmp_path))
+    calls = []
+
+    def generate(self, messages, stop=None, run_manager=None, **kwargs):
+        calls.append(messages)
+        return ChatResult(
+            generations=[ChatGeneration(message=AIMessage("Jumbo loans exceed"))],
+            llm_output={"token_usage": {"completion_tokens": 3}},
+        )
+
+    monkeypatch.setattr(ChatOpenAI, "_generate", generate)
+    recorded = chat_model(cassette, "record").invoke("What is a Jumbo loan?")
+    assert len(calls) == 1
+
+    monkeypatch.undo()
+    player = chat_model(cassette, "replay")
+
+    assert player.invoke("What is a Jumbo loan?").content == recorded.content
+    replayed = asyncio.run(player.ainvoke("What is a Jumbo loan?"))
+    assert replayed.content == "Jumbo loans exceed"
+    with pytest.raises(ValueError, match="No recorded chat response"):
+        player.invoke("An unrecorded question")
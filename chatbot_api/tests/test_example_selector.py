@@ -0,0 +1,44 @@
+from langchain_core.documents import Document
+from src.langchain_custom.graph_qa.cypher import format_retrieved_documents
+from src.utils.example_selector import select_examples
+
+
+def test_select_examples_applies_score_threshold():
+    """
+    Test that examples below the threshold are dropped but the best is kept
+    """
+    vectors = [[1.0, 0.0], [0.0, 1.0], [0.7, 0.7]]
+
+    assert select_examples([1.0, 0.0], vectors, [0.95, 0.5, 0.92], 8, 1, 0.9) == [
+        0,
+        2,
+    ]
+    assert select_examples([1.0, 0.0], vectors, [0.8, 0.5, 0.7], 8, 1, 0.9) == [0]
+
+
+def test_select_examples_skips_near_duplicates():
+    """
+    Test that a near-duplicate of a picked example ranks below a different one
+    """
+    vectors = [[1.0, 0.0, 0.0], [0.99, 0.01, 0.0], [0.8, 0.0, 0.6]]
+    scores = [0.99, 0.98, 0.95]
+    query = [1.0, 0.0, 0.3]
+
+    assert select_examples(query, vectors, scores, 2, 1, 0.9, 0.7) == [0, 2]
+    # Without diversity, the most relevant are picked
+    assert select_examples(query, vectors, scores, 2, 1, 0.9, 1.0) == [0, 1]
+
+
+def test_format_retrieved_documents_keeps_requested_metadata():
+    """
+    Test that only the requested metadata is included in the examples
+    """
+    doc = Document(
+        page_content="\nquestion: How many customers?",
+        metadata={"cypher": "MATCH (c:Customer) RETURN count(c)", "created": "2024"},
+    )
+
+    formatted = format_retrieved_documents([doc], ["cypher"])
+
+    assert "cypher:\nMATCH (c:Customer) RETURN count(c)" in formatted
+    assert "created" not in formatted
@@ -0,0 +1,102 @@
+import pytest
+from langchain_community.graphs.neo4j_graph import Neo4jGraph
+from neo4j.exceptions import Neo4jError
+from src.utils import graph_queries
+from src.utils.graph_queries import (
+    QueryCancelled,
+    QueryRejected,
+    read_query,
+    tag_queries,
+    terminate_queries,
+)
+from src.utils.telemetry import metrics
+
+
+class CannedGraph:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def query(self, query, params={}):
+        return self.rows
+
+
+def test_rows_are_capped_by_count_and_size():
+    """
+    Test that reading stops at the row and byte caps, and says so
+    """
+    graph = CannedGraph([{"name": f"Customer {i}"} for i in range(5)])
+
+    assert read_query(graph, "MATCH (c) RETURN c.name AS name") == (graph.rows, False)
+    rows, truncated = read_query(graph, "MATCH (c) RETURN c.name", max_rows=3)
+    assert len(rows) == 3 and truncated
+    rows, truncated = read_query(graph, "MATCH (c) RETURN c.name", max_bytes=50)
+    assert len(rows) == 2 and truncated
+
+
+def test_cancelled_requests_start_no_more_queries():
+    """
+    Test that once a request's queries are terminated, it can't run new ones
+    """
+    graph = CannedGraph([{"total": 1}])
+
+    with tag_queries() as tag:
+        assert read_query(graph, "RETURN 1 AS total")[0] == [{"total": 1}]
+        terminate_queries(graph, tag)
+        with pytest.raises(QueryCancelled):
+            read_query(graph, "RETURN 1 AS total")
+
+    with tag_queries():
+        assert read_query(graph, "RETURN 1 AS total")[0] == [{"total": 1}]
+
+
+def stopped_count(reason):
+    counters = metrics._counters.get(("bank_chatbot_neo4j_queries_stopped", "reason"))
+    return (counters or {}).get(reason, 0)
+
+
+def test_only_global_caps_are_counted(monkeypatch):
+    """
+    Test that results cut short by the caller's own limit aren't counted as
+    stopped by a cap, and that callers can't raise the global caps
+    """
+    graph = CannedGraph([{"name": f"Customer {i}"} for i in range(5)])
+    before = stopped_count("max_rows")
+
+    read_query(graph, "MATCH (c) RETURN c.name", max_rows=3)
+    assert stopped_count("max_rows") == before
+
+    monkeypatch.setattr(graph_queries, "CYPHER_QUERY_MAX_ROWS", 4)
+    rows, truncated = read_query(graph, "MATCH (c) RETURN c.name", max_rows=100)
+    assert len(rows) == 4 and truncated
+    assert stopped_count("max_rows") == before + 1
+
+
+class RejectingSession:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute_read(self, work):
+        raise Neo4jError.hydrate(
+            code="Neo.ClientError.Statement.AccessMode",
+            message="Writing in read access mode not allowed",
+        )
+
+
+class RejectingDriver:
+    def session(self, **config):
+        return RejectingSession()
+
+
+def test_writes_are_rejected_without_retrying():
+    """
+    Test that a query Neo4j refuses to run in a read transaction raises
+    QueryRejected, rather than a ClientError the agent would retry
+    """
+    graph = Neo4jGraph.__new__(Neo4jGraph)
+    graph._driver, graph._database = RejectingDriver(), "neo4j"
+
+    with pytest.raises(QueryRejected):
+        read_query(graph, "MATCH (c:Customer) DETACH DELETE c")
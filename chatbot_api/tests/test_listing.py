@@ -0,0 +1,163 @@
+from datetime import date
+import pytest
+from src.utils.listing import (
+    InvalidCursor,
+    can_page,
+    decode_cursor,
+    encode_cursor,
+    fetch_next_page,
+    fetch_page,
+    first_page,
+    has_own_order,
+    iter_listing_rows,
+    keyset_query,
+)
+
+QUERY = "MATCH (c:Customer) RETURN c.name AS name, c.joined AS joined;"
+
+
+class RecordingGraph:
+    def __init__(self, rows):
+        self.rows = rows
+        self.calls = []
+
+    def query(self, query, params={}):
+        self.calls.append((query, params))
+        return self.rows[: params.get("page_size")]
+
+
+def test_keyset_query_continues_after_the_last_row():
+    """
+    Test that pages are ordered by every column and continue from the
+    previous page's last row, with nulls last, keeping duplicate rows
+    """
+    first = keyset_query(QUERY, ["name", "joined"])
+    assert "WHERE" not in first and "DISTINCT" not in first
+    assert "SKIP $skip" in first
+    assert "ORDER BY `name`, `joined`" in first
+    assert "RETURN c.name AS name, c.joined AS joined\n}" in first
+
+    after = keyset_query(QUERY, ["name", "joined"], ["Ann", None])
+    assert "($after[0] IS NOT NULL AND (`name` IS NULL OR `name` > $after[0]))" in (
+        after
+    )
+    assert "(`name` = $after[0] OR (`name` IS NULL AND $after[0] IS NULL))" in after
+    assert (
+        "(`joined` = $after[1] OR (`joined` IS NULL AND $after[1] IS NULL)))" in after
+    )
+
+
+def test_cursor_round_trip_and_tampering():
+    """
+    Test that cursors keep dates, and are rejected once modified
+    """
+    cursor = encode_cursor(QUERY, ["name", "joined"], ["Ann", date(2024, 3, 1)], 50)
+    state = decode_cursor(cursor)
+    assert state["after"] == ["Ann", date(2024, 3, 1)]
+    assert state["query"] == QUERY and state["page_size"] == 50
+
+    payload, signature = cursor.split(".")
+    with pytest.raises(InvalidCursor):
+        decode_cursor(payload[:-2] + "xx." + signature)
+    with pytest.raises(InvalidCursor):
+        decode_cursor("not a cursor")
+
+
+def test_rows_with_nodes_or_lists_are_not_paged():
+    """
+    Test that only rows of scalar and temporal values can be paged by
+    """
+    assert can_page({"name": "Ann", "joined": date(2024, 3, 1), "fees": None})
+    assert not can_page({"customer": {"name": "Ann"}})
+    assert encode_cursor(QUERY, ["loans"], [["L1", "L2"]], 50) is None
+
+
+def test_fetch_page_returns_cursor_only_when_more_rows_follow():
+    """
+    Test that a page asks for one extra row to tell whether another
+    page follows, and that its cursor points after the last row shown
+    """
+    rows = [{"name": name, "joined": date(2024, 1, 1)} for name in "ABC"]
+    graph = RecordingGraph(rows)
+
+    page = fetch_page(graph, QUERY, ["name", "joined"], page_size=2)
+    assert [row["name"] for row in page["rows"]] == ["A", "B"]
+    assert graph.calls[0][1]["page_size"] == 3
+
+    fetch_next_page(graph, page["next_cursor"])
+    assert graph.calls[1][1]["after"] == ["B", date(2024, 1, 1)]
+
+    last = fetch_page(graph, QUERY, ["name", "joined"], page_size=3)
+    assert last["next_cursor"] is None
+
+
+def test_duplicate_rows_are_listed_once_each():
+    """
+    Test that rows equal to the last row of a page are skipped by the next
+    page's cursor, including ties spanning several pages
+    """
+    rows = [{"name": name, "joined": None} for name in "ABBBBC"]
+    graph = RecordingGraph(rows)
+
+    page = fetch_page(graph, QUERY, ["name", "joined"], page_size=2)
+    assert decode_cursor(page["next_cursor"])["skip"] == 1
+
+    graph.rows = rows[1:]
+    page = fetch_next_page(graph, page["next_cursor"])
+    assert graph.calls[1][1]["skip"] == 1
+    assert decode_cursor(page["next_cursor"])["skip"] == 3
+
+    graph.rows = rows[4:]
+    fetch_next_page(graph, page["next_cursor"])
+    assert graph.calls[2][1]["skip"] == 3
+
+
+def test_queries_with_their_own_order_are_detected():
+    """
+    Test that queries sorting their rows are told apart, since a listing
+    would reorder them
+    """
+    assert has_own_order("MATCH (m:Mortgage) RETURN m.id AS id ORDER BY m.amount")
+    assert has_own_order("MATCH (m) RETURN m.id AS id order\n by m.id DESC")
+    assert not has_own_order(QUERY)
+
+
+def test_first_page_is_cut_from_rows_already_read():
+    """
+    Test that the first page is sorted by every column with nulls last,
+    and its cursor skips the rows tied with the last one shown
+    """
+    rows = [
+        {"name": None, "joined": 1},
+        {"name": "B", "joined": 2},
+        {"name": "A", "joined": 1},
+        {"name": "B", "joined": 2},
+        {"name": "A", "joined": None},
+    ]
+
+    listing = first_page(QUERY, ["name", "joined"], rows, page_size=4)
+
+    assert listing["rows"] == [
+        {"name": "A", "joined": 1},
+        {"name": "A", "joined": None},
+        {"name": "B", "joined": 2},
+        {"name": "B", "joined": 2},
+    ]
+    state = decode_cursor(listing["next_cursor"])
+    assert state["after"] == ["B", 2] and state["skip"] == 2
+    assert first_page(QUERY, ["name"], [{"name": "A"}, {"name": 1}]) is None
+
+
+def test_listing_rows_stream_from_one_query():
+    """
+    Test that the rest of a listing is read from a single query without
+    a page size, starting after the cursor's row
+    """
+    rows = [{"name": name, "joined": date(2024, 1, 1)} for name in "ABC"]
+    graph = RecordingGraph(rows)
+    cursor = encode_cursor(QUERY, ["name", "joined"], ["A", None], 2, skip=1)
+
+    assert list(iter_listing_rows(graph, cursor)) == rows
+    [(query, params)] = graph.calls
+    assert "LIMIT" not in query
+    assert params == {"after": ["A", None], "skip": 1}
@@ -0,0 +1,51 @@
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from src.utils.llm_cache import CachedChatOpenAI
+from src.utils.shared_cache import SharedCache
+
+
+def make_model(tmp_path) -> CachedChatOpenAI:
+    return CachedChatOpenAI(
+        model="gpt-4o-mini",
+        temperature=0,
+        api_key="test",
+        response_cache=SharedCache(str(tmp_path / "llm.sqlite3")),
+        cache_name="test",
+    )
+
+
+def test_cached_response_is_reused_without_calling_openai(tmp_path):
+    """
+    Test that a stored response is returned and streamed for the same prompt
+    """
+    model = make_model(tmp_path)
+    messages = [HumanMessage(content="How many customers are there?")]
+    model._store(
+        model._cache_key(messages, None),
+        ChatResult(
+            generations=[
+                ChatGeneration(message=AIMessage(content="MATCH (c) RETURN count(c)"))
+            ]
+        ),
+    )
+
+    assert model.invoke(messages).content == "MATCH (c) RETURN count(c)"
+    assert "".join(c.content for c in model.stream(messages)) == (
+        "MATCH (c) RETURN count(c)"
+    )
+
+
+def test_cache_key_depends_on_bound_tools(tmp_path):
+    """
+    Test that the same messages with different tools are cached separately
+    """
+    model = make_model(tmp_path)
+    messages = [HumanMessage(content="What is the wait at Jordan 1?")]
+    tool = {
+        "type": "function",
+        "function": {"name": "get_wait", "parameters": {"type": "object"}},
+    }
+
+    assert model._cache_key(messages, None) != model._cache_key(
+        messages, None, tools=[tool]
+    )
@@ -0,0 +1,87 @@
+import pstats
+from src.utils import profiling
+from src.utils.profiling import (
+    ProfileRecord,
+    ProfileStore,
+    run_profiled,
+    should_profile,
+)
+from src.utils.shared_cache import SharedCache
+
+
+def _record(profile_id: str, size: int) -> ProfileRecord:
+    return ProfileRecord(profile_id, 0.0, "question", 1.0, b"x" * size, "")
+
+
+def test_profile_store_evicts_oldest_past_size_cap():
+    """
+    Test that the oldest profiles are evicted once the store is over its cap
+    """
+    store = ProfileStore(max_bytes=250)
+    for profile_id in ["first", "second", "third"]:
+        store.add(_record(profile_id, 100))
+
+    assert store.get("first") is None
+    assert [p["id"] for p in store.list()] == ["third", "second"]
+
+
+def test_run_profiled_stores_loadable_stats(tmp_path):
+    """
+    Test that a stored profile can be read back with pstats
+    """
+    store = ProfileStore(max_bytes=10**9)
+    result, profile_id = run_profiled(lambda: sorted(range(1000)), "sort", store)
+
+    path = tmp_path / "profile.prof"
+    path.write_bytes(store.get(profile_id).stats)
+
+    assert result == list(range(1000))
+    assert pstats.Stats(str(path)).total_calls > 0
+
+
+def test_profiles_in_shared_cache_are_seen_by_every_store(tmp_path):
+    """
+    Test that a profile stored by one worker's store can be listed and read
+    back by another's through the shared cache
+    """
+    path = str(tmp_path / "shared.sqlite3")
+    writer = ProfileStore(max_bytes=10**9, shared=SharedCache(path))
+    reader = ProfileStore(max_bytes=10**9, shared=SharedCache(path))
+    writer.add(ProfileRecord("first", 1.0, "question", 1.0, b"\x00\xff", "text"))
+    writer.add(_record("second", 10))
+
+    assert [p["id"] for p in reader.list()] == ["first", "second"]
+    assert reader.get("first").stats == b"\x00\xff"
+    assert reader.get("missing") is None
+
+
+def test_shared_profiles_are_evicted_past_size_cap(tmp_path):
+    """
+    Test that profiles in the shared cache are capped by their total size,
+    evicting the oldest along with their metadata
+    """
+    store = ProfileStore(
+        max_bytes=250, shared=SharedCache(str(tmp_path / "shared.sqlite3"))
+    )
+    for created_at, profile_id in enumerate(["first", "second", "third"]):
+        store.add(ProfileRecord(profile_id, created_at, "q", 1.0, b"x" * 100, ""))
+
+    assert store.get("first") is None
+    assert store.shared.get("profile_metadata", "first") is None
+    assert [p["id"] for p in store.list()] == ["third", "second"]
+
+
+def test_profile_header_needs_the_admin_token(monkeypatch):
+    """
+    Test that asking for a profile is only honored with the admin token
+    """
+    monkeypatch.setattr(profiling, "PROFILE_SAMPLE_RATE", 0)
+    monkeypatch.setattr(profiling, "PROFILE_ADMIN_TOKEN", "secret")
+
+    assert should_profile("true", "secret")
+    assert not should_profile("true", None)
+    assert not should_profile("true", "guess")
+    assert not should_profile("false", "secret")
+
+    monkeypatch.setattr(profiling, "PROFILE_ADMIN_TOKEN", None)
+    assert not should_profile("true", None)
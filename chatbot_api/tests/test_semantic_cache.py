@@ -0,0 +1,78 @@
+from src.utils.semantic_cache import SemanticAnswerCache
+
+
+def make_cache(generation: list[str], max_entries: int = 2) -> SemanticAnswerCache:
+    return SemanticAnswerCache(
+        "test",
+        lambda: generation[0],
+        similarity_threshold=0.9,
+        max_entries=max_entries,
+        generation_check_seconds=0,
+    )
+
+
+def test_lookup_returns_answers_above_threshold():
+    """
+    Test that only questions similar enough to a cached one hit
+    """
+    cache = make_cache(["v1"])
+    cache.store([1.0, 0.0, 0.0], "fixed and variable mortgages")
+
+    assert cache.lookup([0.99, 0.05, 0.0]) == "fixed and variable mortgages"
+    assert cache.lookup([0.0, 1.0, 0.0]) is None
+
+
+def test_store_evicts_least_recently_used():
+    """
+    Test that a lookup hit keeps an answer from being evicted
+    """
+    cache = make_cache(["v1"])
+    cache.store([1.0, 0.0, 0.0], "first")
+    cache.store([0.0, 1.0, 0.0], "second")
+    cache.lookup([1.0, 0.0, 0.0])
+    cache.store([0.0, 0.0, 1.0], "third")
+
+    assert len(cache) == 2
+    assert cache.lookup([1.0, 0.0, 0.0]) == "first"
+    assert cache.lookup([0.0, 1.0, 0.0]) is None
+
+
+def test_generation_change_clears_cache():
+    """
+    Test that answers from an older data generation are never returned
+    """
+    generation = ["v1"]
+    cache = make_cache(generation)
+    cache.store([1.0, 0.0, 0.0], "old answer")
+    generation[0] = "v2"
+
+    assert cache.lookup([1.0, 0.0, 0.0]) is None
+    assert len(cache) == 0
+
+
+def test_generation_is_loaded_outside_the_lock_and_errors_miss():
+    """
+    Test that the generation isn't loaded while holding the cache's lock,
+    and that failing to load it is a miss rather than an error
+    """
+    outages = []
+
+    def load_generation():
+        assert cache._lock.acquire(blocking=False)
+        cache._lock.release()
+        if outages:
+            raise outages[0]
+        return "v1"
+
+    cache = SemanticAnswerCache(
+        "test", load_generation, similarity_threshold=0.9, generation_check_seconds=0
+    )
+    cache.store([1.0, 0.0, 0.0], "answer")
+
+    outages.append(ConnectionError("Neo4j is unavailable"))
+    assert cache.lookup([1.0, 0.0, 0.0]) is None
+    cache.store([0.0, 1.0, 0.0], "not stored")
+
+    outages.clear()
+    assert cache.lookup([1.0, 0.0, 0.0]) == "answer"
+    assert len(cache) == 1
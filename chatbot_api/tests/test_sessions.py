@@ -0,0 +1,45 @@
+from src.utils.sessions import SessionStore, extract_entities
+
+
+def test_extract_entities_only_keeps_unambiguous_values():
+    """
+    Test that entities are taken from columns all rows agree on
+    """
+    rows = [
+        {"customer_id": "C001", "customer_name": "Alice Smith", "loan_number": "L1"},
+        {"customer_id": "C001", "customer_name": "Alice Smith", "loan_number": "L2"},
+    ]
+
+    assert extract_entities(rows) == {
+        "customer_id": "C001",
+        "customer_name": "Alice Smith",
+    }
+
+
+def test_only_explicit_customer_names_are_entities():
+    """
+    Test that a bare name column isn't taken for a customer's name, since
+    branches and other nodes have names too
+    """
+    rows = [{"name": "Oakland", "state": "California"}]
+
+    assert extract_entities(rows) == {}
+    assert extract_entities([{"c.customer_name": "Alice Smith"}]) == {
+        "customer_name": "Alice Smith"
+    }
+
+
+def test_session_store_evicts_least_recently_used():
+    """
+    Test that saving past the cap evicts the least recently used session
+    """
+    store = SessionStore(max_sessions=2, ttl_seconds=60)
+    first, second = store.get(None), store.get(None)
+    store.save(first)
+    store.save(second)
+    store.save(first)
+    store.save(store.get("third"))
+
+    assert store.get(first.id) is first
+    assert store.get(second.id) is not second
+    assert len(store) == 2
@@ -0,0 +1,53 @@
+from src.utils.sessions import SessionStore
+from src.utils.shared_cache import SharedCache
+
+
+def test_values_are_shared_between_instances(tmp_path):
+    """
+    Test that a value set through one cache is read through another,
+    as it would be by another worker
+    """
+    path = str(tmp_path / "cache.sqlite3")
+    SharedCache(path).set("embeddings", "key", [0.25, 0.5])
+
+    assert SharedCache(path).get("embeddings", "key") == [0.25, 0.5]
+
+
+def test_set_evicts_least_recently_used(tmp_path):
+    """
+    Test that a capped namespace keeps its most recently used entries
+    """
+    cache = SharedCache(str(tmp_path / "cache.sqlite3"))
+    cache.set("answers", "first", 1, max_entries=2)
+    cache.set("answers", "second", 2, max_entries=2)
+    cache.get("answers", "first")
+    cache.set("answers", "third", 3, max_entries=2)
+
+    assert cache.get("answers", "second") is None
+    assert sorted(cache.values("answers")) == [1, 3]
+
+
+def test_expired_values_are_not_returned(tmp_path):
+    """
+    Test that entries past their TTL are ignored
+    """
+    cache = SharedCache(str(tmp_path / "cache.sqlite3"))
+    cache.set("sessions", "expired", {"a": 1}, ttl_seconds=-1)
+
+    assert cache.get("sessions", "expired") is None
+
+
+def test_session_store_round_trips_through_shared_cache(tmp_path):
+    """
+    Test that a session saved by one worker is continued by another
+    """
+    path = str(tmp_path / "cache.sqlite3")
+    session = SessionStore(shared=SharedCache(path)).get(None)
+    session.add_turn("What is my balance?", "Your balance is 100.")
+    session.entities["customer_id"] = "C001"
+    SessionStore(shared=SharedCache(path)).save(session)
+
+    restored = SessionStore(shared=SharedCache(path)).get(session.id)
+
+    assert restored.history == [("What is my balance?", "Your balance is 100.")]
+    assert restored.entities == {"customer_id": "C001"}
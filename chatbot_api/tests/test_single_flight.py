@@ -0,0 +1,70 @@
+import asyncio
+from src.utils.single_flight import SingleFlight, flight_key
+
+
+def test_flight_key_ignores_case_and_punctuation():
+    """
+    Test that questions differing only in formatting share a key
+    """
+    assert flight_key("What  mortgages do you offer?") == flight_key(
+        "what mortgages do you offer"
+    )
+    assert flight_key("What mortgages?", {"summary": "a"}) != flight_key(
+        "What mortgages?", {"summary": "b"}
+    )
+
+
+def test_concurrent_calls_share_one_execution():
+    """
+    Test that calls with the same key while one is in flight reuse its result
+    """
+    flight = SingleFlight("test")
+    calls = 0
+
+    async def answer():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return "answer"
+
+    async def run():
+        return await asyncio.gather(*[flight.do("key", answer) for _ in range(5)])
+
+    results = asyncio.run(run())
+
+    assert calls == 1
+    assert [result for result, _ in results] == ["answer"] * 5
+    assert [coalesced for _, coalesced in results].count(True) == 4
+    assert len(flight) == 0
+
+
+def test_execution_is_cancelled_once_every_caller_is():
+    """
+    Test that cancelling one caller leaves the execution running for the
+    others, and cancelling the last one cancels it
+    """
+    flight = SingleFlight("test")
+    cancelled = asyncio.Event()
+
+    async def answer():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    async def run():
+        first = asyncio.ensure_future(flight.do("key", answer))
+        second = asyncio.ensure_future(flight.do("key", answer))
+        await asyncio.sleep(0.01)
+
+        first.cancel()
+        await asyncio.sleep(0.01)
+        still_running = not cancelled.is_set()
+
+        second.cancel()
+        await asyncio.wait_for(cancelled.wait(), 1)
+        return still_running
+
+    assert asyncio.run(run())
+    assert len(flight) == 0
@@ -0,0 +1,34 @@
+import asyncio
+from src.utils import speculation
+from src.utils.speculation import speculate, speculative_task, take_speculative
+
+
+def test_tools_take_results_for_the_same_question(monkeypatch):
+    """
+    Test that speculative results are only handed out for the question
+    they were retrieved for
+    """
+    monkeypatch.setattr(speculation, "SPECULATIVE_RETRIEVAL_ENABLED", True)
+    monkeypatch.setattr(speculation, "_tasks", {})
+
+    @speculative_task("documents")
+    async def retrieve(spec):
+        await asyncio.sleep(0.01)
+        return [f"documents for {spec.question}"]
+
+    async def run():
+        with speculate("What is a Jumbo loan?"):
+            return await asyncio.to_thread(
+                lambda: (
+                    take_speculative("documents", "what is a jumbo loan"),
+                    take_speculative("documents", "What is a fixed rate?"),
+                    take_speculative("other", "What is a Jumbo loan?"),
+                )
+            )
+
+    same, other_question, other_task = asyncio.run(run())
+
+    assert same == ["documents for What is a Jumbo loan?"]
+    assert other_question is None
+    assert other_task is None
+    assert take_speculative("documents", "What is a Jumbo loan?") is None
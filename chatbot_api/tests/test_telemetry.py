@@ -0,0 +1,42 @@
+import pytest
+from src.utils.telemetry import MetricsRegistry, collect_timings, stage_span, tool_span
+
+
+def test_histogram_buckets_are_cumulative():
+    """
+    Test that observations land in cumulative Prometheus buckets
+    """
+    registry = MetricsRegistry()
+    for seconds in [0.005, 0.2, 0.2, 100]:
+        registry.observe("latency_seconds", "stage", "neo4j_query", seconds)
+
+    output = registry.render_prometheus()
+
+    assert 'latency_seconds_bucket{stage="neo4j_query",le="0.01"} 1' in output
+    assert 'latency_seconds_bucket{stage="neo4j_query",le="0.25"} 3' in output
+    assert 'latency_seconds_bucket{stage="neo4j_query",le="60"} 3' in output
+    assert 'latency_seconds_bucket{stage="neo4j_query",le="+Inf"} 4' in output
+    assert 'latency_seconds_count{stage="neo4j_query"} 4' in output
+
+
+def test_collect_timings_records_stages_and_failures():
+    """
+    Test that spans inside a collection block are reported in order
+    """
+    with collect_timings() as timings:
+        with tool_span("explore_bank_database"):
+            with stage_span("cypher_generation"):
+                pass
+        with pytest.raises(RuntimeError):
+            with stage_span("neo4j_query"):
+                raise RuntimeError("connection lost")
+
+    assert [(t["name"], t["kind"], t["status"]) for t in timings] == [
+        ("cypher_generation", "stage", "ok"),
+        ("explore_bank_database", "tool", "ok"),
+        ("neo4j_query", "stage", "error"),
+    ]
+
+    with stage_span("outside_collection"):
+        pass
+    assert len(timings) == 3
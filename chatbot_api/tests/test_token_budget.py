@@ -0,0 +1,18 @@
+from src.utils.token_budget import count_tokens, fit_to_budget
+
+
+def test_fit_to_budget_keeps_longest_fitting_prefix():
+    """
+    Test that the least relevant items are dropped until the prompt fits
+    """
+    examples = [f"example {i} " * 20 for i in range(8)]
+
+    def render(items):
+        return "Question: how many loans?\n" + "\n".join(items)
+
+    budget = count_tokens(render(examples[:3]))
+    kept = fit_to_budget(examples, render, budget, "cypher_generation")
+
+    assert kept == examples[:3]
+    assert fit_to_budget(examples, render, None, "cypher_generation") == examples
+    assert fit_to_budget(examples, render, 1, "cypher_generation") == []
@@ -0,0 +1,68 @@
+import pytest
+from src.tools import wait_times
+from src.tools.branch_queues import BranchQueueModel
+
+BRANCHES = [
+    {"branch_name": "Oakland", "state_name": "California"},
+    {"branch_name": "Fresno", "state_name": "California"},
+    {"branch_name": "Austin", "state_name": "Texas"},
+]
+
+
+class StubGraph:
+    def __init__(self, states):
+        self.states = states
+        self.customer_lookups = []
+
+    def query(self, query, params={}):
+        if "MATCH (h:Branch)" in query:
+            return BRANCHES
+        self.customer_lookups.append(params["customer"])
+        state = self.states.get(params["customer"])
+        return [{"state": state}] if state else []
+
+
+@pytest.fixture
+def graph(monkeypatch):
+    graph = StubGraph({"C001": "Texas", "Alice Smith": "California"})
+    monkeypatch.setattr(wait_times, "_graph", graph)
+    monkeypatch.setattr(wait_times, "_branches_loaded_at", float("-inf"))
+    monkeypatch.setattr(
+        wait_times, "branch_queues", BranchQueueModel(clock=lambda: 1_200_000.0)
+    )
+    return graph
+
+
+def test_least_busy_branches_in_a_customers_state(graph):
+    """
+    Test that a customer's state is looked up when no state is given, and
+    only that state's branches are returned
+    """
+    assert list(wait_times.get_least_busy_branches(customer=" C001 ")) == ["austin"]
+    assert graph.customer_lookups == ["C001"]
+
+    in_california = wait_times.get_least_busy_branches(customer="Alice Smith")
+    assert set(in_california) == {"oakland", "fresno"}
+    assert list(in_california.values()) == sorted(in_california.values())
+
+    wait_times.get_least_busy_branches(state="Texas", customer="Alice Smith")
+    assert graph.customer_lookups == ["C001", "Alice Smith"]
+
+
+def test_least_busy_branches_explain_missing_branches_and_customers(graph):
+    """
+    Test that a state without branches, an unknown customer and a missing
+    state are answered with a message instead of an empty result
+    """
+    assert (
+        wait_times.get_least_busy_branches(state="Nevada")
+        == "There are no branches in Nevada."
+    )
+    assert (
+        wait_times.get_least_busy_branches(customer="C999")
+        == "Customer 'C999' does not exist or has no state."
+    )
+    assert (
+        wait_times.get_least_busy_branches()
+        == "Provide a state or a customer to search branches in."
+    )
@@ -1,8 +1,125 @@
 import os
+import json
+import time
 import requests
 import streamlit as st
 
-CHATBOT_URL = os.getenv("CHATBOT_URL", "http://localhost:8000/hospital-rag-agent")
+CHATBOT_URL = os.getenv("CHATBOT_URL", "http://localhost:8000/bank-rag-agent")
+# Seconds to wait for the API to start answering, and between streamed events
+CHATBOT_TIMEOUT = float(os.getenv("CHATBOT_TIMEOUT", "120"))
+
+ERROR_MESSAGE = """An error occurred while processing your message.
+This usually means the chatbot failed at generating a query to
+answer your question. Please try again or rephrase your message."""
+
+
+@st.cache_resource
+def get_http_session() -> requests.Session:
+    """One pooled session for all reruns, so connections are reused"""
+
+    return requests.Session()
+
+
+def stream_answer(prompt: str, key: str) -> dict:
+    """Ask the streaming endpoint, rendering the answer and tool steps as
+    they arrive. Returns the message to keep in the chat history."""
+
+    answer_placeholder = st.empty()
+    status = st.status("How was this generated?", state="running")
+    timing_placeholder = st.empty()
+
+    data = {"text": prompt, "session_id": st.session_state.get("session_id")}
+    output_text, steps, first_token_at, listing = "", [], None, None
+    failed = False
+    started = time.perf_counter()
+
+    try:
+        with get_http_session().post(
+            f"{CHATBOT_URL}/stream", json=data, stream=True, timeout=CHATBOT_TIMEOUT
+        ) as response:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                event = json.loads(line)
+
+                if event["type"] == "token":
+                    if first_token_at is None:
+                        first_token_at = time.perf_counter()
+                    output_text += event["text"]
+                    answer_placeholder.markdown(output_text + "▌")
+                elif event["type"] == "reset":
+                    output_text = ""
+                    answer_placeholder.empty()
+                elif event["type"] == "step":
+                    step = (
+                        f"**{event['tool']}**({event['input']}) "
+                        f"returned {event['output']}"
+                    )
+                    steps.append(step)
+                    status.markdown(step)
+                elif event["type"] == "done":
+                    output_text = event["output"]
+                    listing = event.get("listing")
+                    st.session_state.session_id = event["session_id"]
+                elif event["type"] == "error":
+                    raise RuntimeError(event["detail"])
+    except (requests.RequestException, RuntimeError, ValueError) as e:
+        print(f"Chatbot request failed: {e}")
+        output_text = ERROR_MESSAGE
+        steps = [ERROR_MESSAGE]
+        failed = True
+
+    total = time.perf_counter() - started
+    first_token = f"{first_token_at - started:.2f}s" if first_token_at else "n/a"
+    timing = f"First token after {first_token}, answered in {total:.2f}s"
+
+    answer_placeholder.markdown(output_text)
+    if listing:
+        show_listing(listing, key)
+    status.update(state="error" if failed else "complete")
+    timing_placeholder.caption(timing)
+
+    return {
+        "role": "assistant",
+        "output": output_text,
+        "listing": listing,
+        "explanation": "\n\n".join(steps),
+        "timing": timing,
+    }
+
+
+def load_more_rows(listing: dict) -> None:
+    """Add the next page of a listing to it, read without calling an LLM"""
+
+    try:
+        response = get_http_session().post(
+            f"{CHATBOT_URL}/listing",
+            json={"cursor": listing["next_cursor"]},
+            timeout=CHATBOT_TIMEOUT,
+        )
+        response.raise_for_status()
+    except requests.RequestException as e:
+        print(f"Loading more rows failed: {e}")
+        st.toast("Couldn't load more rows, please try again.")
+        return
+
+    page = response.json()
+    listing["rows"] += page["rows"]
+    listing["next_cursor"] = page["next_cursor"]
+
+
+def show_listing(listing: dict, key: str) -> None:
+    """Rows listed with an answer, as a table, with a button loading more
+    while there are"""
+
+    st.dataframe(listing["rows"], column_order=listing["columns"])
+    if listing["next_cursor"]:
+        # The total isn't counted when only part of the rows were read
+        total = listing["total_rows"] or "more"
+        st.caption(f"Showing {len(listing['rows'])} of {total} rows")
+        st.button("Load more", key=key, on_click=load_more_rows, args=(listing,))
+
 
 with st.sidebar:
     st.header("About")
@@ -66,42 +183,27 @@ st.info(
 if "messages" not in st.session_state:
     st.session_state.messages = []
 
-for message in st.session_state.messages:
+for index, message in enumerate(st.session_state.messages):
     with st.chat_message(message["role"]):
         if "output" in message.keys():
             st.markdown(message["output"])
 
+        if message.get("listing"):
+            show_listing(message["listing"], f"listing_{index}")
+
         if "explanation" in message.keys():
             with st.status("How was this generated", state="complete"):
                 st.info(message["explanation"])
 
+        if "timing" in message.keys():
+            st.caption(message["timing"])
+
 if prompt := st.chat_input("What do you want to know?"):
     st.chat_message("user").markdown(prompt)
 
     st.session_state.messages.append({"role": "user", "output": prompt})
 
-    data = {"text": prompt}
-
-    with st.spinner("Searching for an answer..."):
-        response = requests.post(CHATBOT_URL, json=data)
-
-        if response.status_code == 200:
-            output_text = response.json()["output"]
-            explanation = response.json()["intermediate_steps"]
-
-        else:
-            output_text = """An error occurred while processing your message.
-            This usually means the chatbot failed at generating a query to
-            answer your question. Please try again or rephrase your message."""
-            explanation = output_text
-
-    st.chat_message("assistant").markdown(output_text)
-    st.status("How was this generated?", state="complete").info(explanation)
-
-    st.session_state.messages.append(
-        {
-            "role": "assistant",
-            "output": output_text,
-            "explanation": explanation,
-        }
-    )
+    with st.chat_message("assistant"):
+        # Keyed by its place in the history, where it is shown on reruns
+        key = f"listing_{len(st.session_state.messages)}"
+        st.session_state.messages.append(stream_answer(prompt, key))
@@ -0,0 +1,251 @@
+"""
+OpenAI-compatible stand-in for load testing the chatbot API without network.
+
+Chat completions follow a script: requests that offer tools get a tool call
+picked by keywords in the user question, and once a tool result comes back
+they get a final answer. Prompts without tools get a Cypher query or an
+answer depending on which chain sent them. Streaming requests get the same
+reply as server-sent chunks. Embeddings are deterministic.
+"""
+
+import json
+import time
+import uuid
+import base64
+import asyncio
+import hashlib
+import argparse
+import numpy as np
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+# Checked in order, the first rule whose keywords appear in the question wins
+DEFAULT_TOOL_SCRIPT = [
+    {
+        "keywords": ["shortest", "most available", "least busy"],
+        "tool": "find_most_available_branch",
+        "arguments": {"tmp": ""},
+    },
+    {
+        "keywords": ["wait time"],
+        "tool": "get_branch_wait_time",
+        "arguments": {"branch": "Jordan 1"},
+    },
+    {
+        "keywords": ["product", "interest rates", "payment plan", "faq"],
+        "tool": "explore_product_faqs",
+        "arguments": {"question": "{question}"},
+    },
+    {
+        "keywords": [],
+        "tool": "explore_bank_database",
+        "arguments": {"question": "{question}"},
+    },
+]
+
+DEFAULT_CYPHER = "MATCH (c:Customer)-[:HAS]->(m:Mortgage) RETURN count(m) AS total"
+
+app = FastAPI(title="Fake OpenAI")
+app.state.settings = {
+    "llm_latency_ms": 0.0,
+    "llm_jitter_ms": 0.0,
+    "embedding_latency_ms": 0.0,
+    "embedding_dimensions": 1536,
+    "tool_script": DEFAULT_TOOL_SCRIPT,
+}
+app.state.rng = np.random.default_rng(0)
+
+
+def _message_text(message: dict) -> str:
+    content = message.get("content") or ""
+    if isinstance(content, list):
+        content = " ".join(part.get("text", "") for part in content)
+    return content
+
+
+def _pick_tool_call(question: str, tool_names: set[str]) -> dict:
+    lowered = question.lower()
+    for rule in app.state.settings["tool_script"]:
+        if rule["tool"] not in tool_names:
+            continue
+        if not rule["keywords"] or any(k in lowered for k in rule["keywords"]):
+            arguments = {
+                k: v.replace("{question}", question) if isinstance(v, str) else v
+                for k, v in rule["arguments"].items()
+            }
+            return {
+                "id": f"call_{uuid.uuid4().hex[:24]}",
+                "type": "function",
+                "function": {"name": rule["tool"], "arguments": json.dumps(arguments)},
+            }
+    raise ValueError("No scripted tool call matches the question")
+
+
+def _scripted_reply(body: dict) -> dict:
+    """Assistant message for a chat completion request"""
+
+    messages = body.get("messages", [])
+    tools = body.get("tools") or []
+
+    if tools:
+        if messages and messages[-1].get("role") == "tool":
+            result = _message_text(messages[-1])
+            return {"role": "assistant", "content": f"Here is what I found: {result}"}
+
+        question = next(
+            (_message_text(m) for m in reversed(messages) if m.get("role") == "user"),
+            "",
+        )
+        tool_names = {t["function"]["name"] for t in tools}
+        return {
+            "role": "assistant",
+            "content": None,
+            "tool_calls": [_pick_tool_call(question, tool_names)],
+        }
+
+    prompt = "\n".join(_message_text(m) for m in messages)
+    if "Schema:" in prompt and "Cypher" in prompt:
+        return {"role": "assistant", "content": DEFAULT_CYPHER}
+    return {
+        "role": "assistant",
+        "content": "Based on the provided information, the answer is 42.",
+    }
+
+
+async def _simulate_latency(mean_ms: float, jitter_ms: float = 0.0) -> None:
+    delay_ms = mean_ms
+    if jitter_ms:
+        delay_ms = max(0.0, app.state.rng.normal(mean_ms, jitter_ms))
+    if delay_ms:
+        await asyncio.sleep(delay_ms / 1000)
+
+
+def _embed(text: str, dimensions: int) -> np.ndarray:
+    seed = int.from_bytes(hashlib.sha256(text.encode()).digest()[:8], "little")
+    vector = np.random.default_rng(seed).standard_normal(dimensions)
+    return (vector / np.linalg.norm(vector)).astype(np.float32)
+
+
+def _stream_chunks(message: dict, model: str) -> list[dict]:
+    """Chat completion chunks that stream `message` word by word"""
+
+    chunk_id = f"chatcmpl-{uuid.uuid4().hex}"
+
+    def chunk(delta: dict, finish_reason=None) -> dict:
+        return {
+            "id": chunk_id,
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+        }
+
+    chunks = [chunk({"role": "assistant", "content": ""})]
+    if message.get("tool_calls"):
+        tool_calls = [
+            dict(call, index=i) for i, call in enumerate(message["tool_calls"])
+        ]
+        chunks.append(chunk({"tool_calls": tool_calls}))
+        chunks.append(chunk({}, "tool_calls"))
+    else:
+        words = (message.get("content") or "").split(" ")
+        chunks += [
+            chunk({"content": word if i == 0 else f" {word}"})
+            for i, word in enumerate(words)
+        ]
+        chunks.append(chunk({}, "stop"))
+    return chunks
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    settings = app.state.settings
+    await _simulate_latency(settings["llm_latency_ms"], settings["llm_jitter_ms"])
+
+    message = _scripted_reply(body)
+    if body.get("stream"):
+        chunks = _stream_chunks(message, body.get("model", "fake-model"))
+        lines = [f"data: {json.dumps(c)}\n\n" for c in chunks] + ["data: [DONE]\n\n"]
+        return StreamingResponse(iter(lines), media_type="text/event-stream")
+
+    prompt_tokens = sum(len(_message_text(m).split()) for m in body.get("messages", []))
+    completion_tokens = len((message.get("content") or "").split()) or 10
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "fake-model"),
+        "choices": [
+            {
+                "index": 0,
+                "message": message,
+                "finish_reason": "tool_calls" if message.get("tool_calls") else "stop",
+            }
+        ],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        },
+    }
+
+
+@app.post("/v1/embeddings")
+async def embeddings(request: Request):
+    body = await request.json()
+    settings = app.state.settings
+    await _simulate_latency(settings["embedding_latency_ms"])
+
+    inputs = body["input"]
+    if isinstance(inputs, str) or (inputs and isinstance(inputs[0], int)):
+        inputs = [inputs]
+
+    data = []
+    for i, text in enumerate(inputs):
+        vector = _embed(str(text), settings["embedding_dimensions"])
+        # The OpenAI client asks for base64 unless a format is given
+        if body.get("encoding_format") == "base64":
+            embedding = base64.b64encode(vector.tobytes()).decode()
+        else:
+            embedding = vector.tolist()
+        data.append({"object": "embedding", "index": i, "embedding": embedding})
+
+    tokens = sum(len(str(text).split()) for text in inputs)
+    return {
+        "object": "list",
+        "data": data,
+        "model": body.get("model", "fake-embedding"),
+        "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+    }
+
+
+@app.get("/health")
+async def health():
+    return {"status": "running"}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a fake OpenAI API server")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0)
+    parser.add_argument("--llm-jitter-ms", type=float, default=0.0)
+    parser.add_argument("--embedding-latency-ms", type=float, default=0.0)
+    parser.add_argument("--embedding-dimensions", type=int, default=1536)
+    parser.add_argument("--tool-script", help="JSON file replacing the tool script")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    app.state.settings.update(
+        llm_latency_ms=args.llm_latency_ms,
+        llm_jitter_ms=args.llm_jitter_ms,
+        embedding_latency_ms=args.embedding_latency_ms,
+        embedding_dimensions=args.embedding_dimensions,
+    )
+    if args.tool_script:
+        with open(args.tool_script) as f:
+            app.state.settings["tool_script"] = json.load(f)
+    app.state.rng = np.random.default_rng(args.seed)
+
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
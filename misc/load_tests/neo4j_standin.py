@@ -0,0 +1,164 @@
+"""
+In-memory stand-ins for Neo4jGraph and Neo4jVector used by the load tests.
+
+`install` must run before `src.main` is imported so the chains pick up the
+stand-ins when they connect at import time.
+"""
+
+import time
+from typing import Any, Optional
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import InMemoryVectorStore
+from langchain_community.graphs.graph_store import GraphStore
+
+BANK_SCHEMA = {
+    "node_props": {
+        "Branch": [
+            {"property": "id", "type": "INTEGER"},
+            {"property": "name", "type": "STRING"},
+            {"property": "state_name", "type": "STRING"},
+        ],
+        "Customer": [
+            {"property": "id", "type": "STRING"},
+            {"property": "name", "type": "STRING"},
+            {"property": "state", "type": "STRING"},
+            {"property": "total_fees", "type": "FLOAT"},
+            {"property": "fees_late_fee", "type": "FLOAT"},
+            {"property": "outstanding_due", "type": "FLOAT"},
+            {"property": "next_due_date", "type": "DATE"},
+        ],
+        "Mortgage": [
+            {"property": "id", "type": "STRING"},
+            {"property": "amount", "type": "FLOAT"},
+            {"property": "interest", "type": "FLOAT"},
+            {"property": "start", "type": "DATE"},
+            {"property": "status", "type": "STRING"},
+            {"property": "tenure", "type": "INTEGER"},
+        ],
+        "PaymentsDue": [
+            {"property": "id", "type": "STRING"},
+            {"property": "amount", "type": "FLOAT"},
+            {"property": "due_date", "type": "DATE"},
+            {"property": "status", "type": "STRING"},
+        ],
+        "Fees": [
+            {"property": "id", "type": "STRING"},
+            {"property": "type", "type": "STRING"},
+            {"property": "amount", "type": "FLOAT"},
+            {"property": "date_incurred", "type": "DATE"},
+        ],
+    },
+    "rel_props": {},
+    "relationships": [
+        {"start": "Customer", "type": "HAS", "end": "Mortgage"},
+        {"start": "Customer", "type": "MADE", "end": "Payments"},
+        {"start": "Mortgage", "type": "SCHEDULE", "end": "PaymentsDue"},
+        {"start": "Mortgage", "type": "HAS", "end": "Fees"},
+        {"start": "PaymentsDue", "type": "MAY_INCUR", "end": "Fees"},
+    ],
+}
+
+BRANCH_NAMES = [f"Jordan {i}" for i in range(1, 11)]
+BRANCH_STATES = ["California", "Texas"]
+
+FAQS = [
+    ("What is a Fixed-Rate mortgage?", "A Fixed-Rate mortgage keeps its rate."),
+    ("What is an Adjustable-Rate mortgage?", "Its rate follows the market."),
+    ("What payment plans are available?", "Monthly and bi-weekly plans."),
+    ("What interest rates apply to Jumbo loans?", "They depend on tenure."),
+]
+
+EXAMPLE_QUESTIONS = [
+    ("How many customers are there?", "MATCH (c:Customer) RETURN count(c)"),
+    ("What is the average loan amount?", "MATCH (m:Mortgage) RETURN avg(m.amount)"),
+    (
+        "Which loans are above 500000?",
+        "MATCH (m:Mortgage) WHERE m.amount > 500000 RETURN m.id",
+    ),
+]
+
+# Latency added to every graph query and the number of rows returned by
+# generated Cypher queries, set by `install`
+SETTINGS = {"query_latency_ms": 0.0, "result_rows": 5}
+
+
+class InMemoryNeo4jGraph(GraphStore):
+    """Answers the API's Cypher queries with canned rows"""
+
+    def __init__(self, url: Optional[str] = None, *args: Any, **kwargs: Any):
+        self.structured_schema = BANK_SCHEMA
+        self.schema = str(BANK_SCHEMA)
+
+    @property
+    def get_schema(self) -> str:
+        return str(self.structured_schema)
+
+    @property
+    def get_structured_schema(self) -> dict[str, Any]:
+        return self.structured_schema
+
+    def refresh_schema(self) -> None:
+        pass
+
+    def add_graph_documents(self, *args: Any, **kwargs: Any) -> None:
+        raise NotImplementedError("The load test graph is read only")
+
+    def query(self, query: str, params: dict = {}) -> list[dict[str, Any]]:
+        if SETTINGS["query_latency_ms"]:
+            time.sleep(SETTINGS["query_latency_ms"] / 1000)
+        if "MATCH (h:Branch)" in query:
+            return [
+                {"branch_name": name, "state_name": BRANCH_STATES[i % 2]}
+                for i, name in enumerate(BRANCH_NAMES)
+            ]
+        if "c.state AS state" in query:
+            return [{"state": BRANCH_STATES[0]}]
+        return [
+            {"customer": f"Customer {i}", "total": i, "embedding": [0.0] * 8}
+            for i in range(SETTINGS["result_rows"])
+        ]
+
+
+class InMemoryNeo4jVector(InMemoryVectorStore):
+    """InMemoryVectorStore that also accepts the Cypher queries Neo4jVector runs"""
+
+    def query(self, query: str, *, params: Optional[dict] = None) -> list[dict]:
+        return []
+
+
+def _from_existing_index(
+    cls, embedding: Embeddings, index_name: str = "", **kwargs: Any
+) -> InMemoryNeo4jVector:
+    # The fake OpenAI server does not tokenize, so skip client-side chunking.
+    # Cassette and shared cache embeddings wrap the OpenAI embeddings.
+    openai_embeddings = embedding
+    while hasattr(openai_embeddings, "embeddings"):
+        openai_embeddings = openai_embeddings.embeddings
+    if hasattr(openai_embeddings, "check_embedding_ctx_length"):
+        openai_embeddings.check_embedding_ctx_length = False
+
+    store = InMemoryNeo4jVector(embedding)
+    if index_name == "faqs":
+        store.add_documents(
+            [Document(page_content=f"\nquestion: {q}\nanswer: {a}") for q, a in FAQS]
+        )
+    else:
+        store.add_documents(
+            [
+                Document(page_content=f"\nquestion: {q}", metadata={"cypher": c})
+                for q, c in EXAMPLE_QUESTIONS
+            ]
+        )
+    return store
+
+
+def install(query_latency_ms: float = 0.0, result_rows: int = 5) -> None:
+    """Route the API's Neo4j connections to the in-memory stand-ins"""
+
+    import langchain_community.graphs
+    from langchain_community.vectorstores.neo4j_vector import Neo4jVector
+
+    SETTINGS.update(query_latency_ms=query_latency_ms, result_rows=result_rows)
+    langchain_community.graphs.Neo4jGraph = InMemoryNeo4jGraph
+    Neo4jVector.from_existing_index = classmethod(_from_existing_index)
@@ -0,0 +1,231 @@
+"""
+Load test the chatbot API with no network dependencies.
+
+Starts a fake OpenAI server and the API (backed by an in-memory graph) as
+subprocesses, sends the bank questions at each concurrency level, and
+reports p50/p95/p99 latency and throughput. With --baseline, exits with
+status 1 when a level regresses past the stored results.
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import argparse
+import subprocess
+from contextlib import contextmanager
+from typing import Any, Iterator
+import httpx
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(HERE, "baselines.json")
+
+QUESTIONS = [
+    "What is the current wait time at Jordan 1?",
+    "Which branch has the shortest wait time?",
+    "What mortgage products do you offer?",
+    "What interest rates apply to Jumbo loans?",
+    "How many customers have an active mortgage?",
+    "What is the average loan amount?",
+    "Which customers have fees that are still due?",
+    "What is the total amount due next month for loan L0001?",
+    "Which loans are above 500000?",
+    "How many payments did customer Alice Smith make last year?",
+]
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_until_up(url: str, process: subprocess.Popen, timeout: float = 60) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server for {url} exited with {process.returncode}")
+        try:
+            if httpx.get(url, timeout=1).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        time.sleep(0.2)
+    raise TimeoutError(f"Server for {url} did not start within {timeout} seconds")
+
+
+@contextmanager
+def running_services(args: argparse.Namespace) -> Iterator[str]:
+    """Start the fake OpenAI server and the API, yielding the API URL"""
+
+    openai_port, api_port = _free_port(), _free_port()
+    processes = []
+    try:
+        openai_server = subprocess.Popen(
+            [
+                sys.executable,
+                os.path.join(HERE, "fake_openai_server.py"),
+                f"--port={openai_port}",
+                f"--llm-latency-ms={args.llm_latency_ms}",
+                f"--llm-jitter-ms={args.llm_jitter_ms}",
+                f"--embedding-latency-ms={args.embedding_latency_ms}",
+            ]
+            + ([f"--tool-script={args.tool_script}"] if args.tool_script else [])
+        )
+        processes.append(openai_server)
+        _wait_until_up(f"http://127.0.0.1:{openai_port}/health", openai_server)
+
+        api_server = subprocess.Popen(
+            [
+                sys.executable,
+                os.path.join(HERE, "serve_api.py"),
+                f"--port={api_port}",
+                f"--openai-url=http://127.0.0.1:{openai_port}/v1",
+                f"--neo4j-latency-ms={args.neo4j_latency_ms}",
+                f"--neo4j-rows={args.neo4j_rows}",
+            ],
+            stdout=subprocess.DEVNULL if args.quiet else None,
+        )
+        processes.append(api_server)
+        _wait_until_up(f"http://127.0.0.1:{api_port}/", api_server)
+
+        yield f"http://127.0.0.1:{api_port}"
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait()
+
+
+async def _timed_post(
+    client: httpx.AsyncClient, url: str, question: str, limit: asyncio.Semaphore
+) -> tuple[float, bool]:
+    async with limit:
+        started = time.perf_counter()
+        try:
+            response = await client.post(url, json={"text": question})
+            ok = response.status_code == 200
+        except httpx.HTTPError:
+            ok = False
+        return time.perf_counter() - started, ok
+
+
+async def run_level(api_url: str, concurrency: int, requests: int) -> dict[str, Any]:
+    """Send `requests` questions with at most `concurrency` in flight"""
+
+    limit = asyncio.Semaphore(concurrency)
+    questions = [QUESTIONS[i % len(QUESTIONS)] for i in range(requests)]
+    async with httpx.AsyncClient(
+        timeout=httpx.Timeout(120),
+        limits=httpx.Limits(max_connections=concurrency),
+    ) as client:
+        started = time.perf_counter()
+        results = await asyncio.gather(
+            *[
+                _timed_post(client, f"{api_url}/bank-rag-agent", q, limit)
+                for q in questions
+            ]
+        )
+        elapsed = time.perf_counter() - started
+
+    latencies = np.array([seconds for seconds, ok in results if ok]) * 1000
+    p50, p95, p99 = (
+        np.percentile(latencies, [50, 95, 99]) if len(latencies) else (None,) * 3
+    )
+    return {
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": sum(1 for _, ok in results if not ok),
+        "p50_ms": None if p50 is None else round(float(p50), 2),
+        "p95_ms": None if p95 is None else round(float(p95), 2),
+        "p99_ms": None if p99 is None else round(float(p99), 2),
+        "throughput_rps": round(len(latencies) / elapsed, 2),
+    }
+
+
+def find_regressions(
+    results: list[dict[str, Any]], baseline: dict[str, Any], tolerance: float
+) -> list[str]:
+    """Levels that got slower or lost throughput past `tolerance`"""
+
+    expected_levels = {str(r["concurrency"]): r for r in baseline.get("levels", [])}
+    regressions = []
+    for result in results:
+        expected = expected_levels.get(str(result["concurrency"]))
+        if expected is None:
+            continue
+        if result["errors"]:
+            regressions.append(
+                f"c={result['concurrency']}: {result['errors']} failed requests"
+            )
+        for key in ["p50_ms", "p95_ms", "p99_ms"]:
+            if result[key] is None or expected.get(key) is None:
+                continue
+            if result[key] > expected[key] * (1 + tolerance):
+                regressions.append(
+                    f"c={result['concurrency']}: {key} {result[key]} "
+                    f"vs baseline {expected[key]}"
+                )
+        if result["throughput_rps"] < expected["throughput_rps"] * (1 - tolerance):
+            regressions.append(
+                f"c={result['concurrency']}: throughput {result['throughput_rps']} "
+                f"rps vs baseline {expected['throughput_rps']} rps"
+            )
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline load test of the API")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--requests", type=int, default=40, help="Per level")
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0)
+    parser.add_argument("--llm-jitter-ms", type=float, default=0.0)
+    parser.add_argument("--embedding-latency-ms", type=float, default=0.0)
+    parser.add_argument("--neo4j-latency-ms", type=float, default=0.0)
+    parser.add_argument("--neo4j-rows", type=int, default=5)
+    parser.add_argument("--tool-script", help="JSON file replacing the tool script")
+    parser.add_argument("--baseline", help=f"e.g. {DEFAULT_BASELINE}")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument(
+        "--quiet", action="store_true", help="Hide the API's verbose chain output"
+    )
+    args = parser.parse_args()
+
+    with running_services(args) as api_url:
+        if args.warmup:
+            asyncio.run(run_level(api_url, 1, args.warmup))
+
+        results = []
+        for concurrency in args.concurrency:
+            result = asyncio.run(run_level(api_url, concurrency, args.requests))
+            print(json.dumps(result))
+            results.append(result)
+
+    report = {
+        "settings": {
+            "requests": args.requests,
+            "llm_latency_ms": args.llm_latency_ms,
+            "llm_jitter_ms": args.llm_jitter_ms,
+            "embedding_latency_ms": args.embedding_latency_ms,
+            "neo4j_latency_ms": args.neo4j_latency_ms,
+            "neo4j_rows": args.neo4j_rows,
+        },
+        "levels": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("settings") != report["settings"]:
+            print("Warning: baseline was recorded with different settings")
+        regressions = find_regressions(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"Regression: {regression}")
+        sys.exit(1 if regressions else 0)
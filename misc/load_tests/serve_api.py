@@ -0,0 +1,49 @@
+"""
+Serve the chatbot API against a fake OpenAI server and the in-memory graph.
+"""
+
+import os
+import sys
+import argparse
+import uvicorn
+import neo4j_standin
+
+CHATBOT_API_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "..", "chatbot_api"
+)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the API for load tests")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--openai-url", default="http://127.0.0.1:8100/v1")
+    parser.add_argument("--neo4j-latency-ms", type=float, default=0.0)
+    parser.add_argument("--neo4j-rows", type=int, default=5)
+    args = parser.parse_args()
+
+    os.environ.update(
+        {
+            "OPENAI_BASE_URL": args.openai_url,
+            "OPENAI_API_KEY": "load-test",
+            "NEO4J_URI": "bolt://in-memory:7687",
+            "NEO4J_USERNAME": "neo4j",
+            "NEO4J_PASSWORD": "load-test",
+            "NEO4J_CYPHER_EXAMPLES_INDEX_NAME": "questions",
+            "NEO4J_CYPHER_EXAMPLES_TEXT_NODE_PROPERTY": "question",
+            "NEO4J_CYPHER_EXAMPLES_NODE_NAME": "Question",
+            "NEO4J_CYPHER_EXAMPLES_METADATA_NAME": "cypher",
+            # Every request reaches the fake OpenAI server, as when the
+            # baselines were recorded
+            "LLM_RESPONSE_CACHE_PATH": "",
+            "FAQ_CACHE_ENABLED": "false",
+            "SINGLE_FLIGHT_ENABLED": "false",
+        }
+    )
+    for model in ["BANK_AGENT_MODEL", "BANK_CYPHER_MODEL", "BANK_QA_MODEL"]:
+        os.environ.setdefault(model, "gpt-4o-mini")
+
+    neo4j_standin.install(args.neo4j_latency_ms, args.neo4j_rows)
+
+    sys.path.insert(0, CHATBOT_API_DIR)
+    from src.main import app
+
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
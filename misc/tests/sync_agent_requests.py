@@ -1,25 +1,18 @@
 import time
 import requests
 
-CHATBOT_URL = "http://localhost:8000/hospital-rag-agent"
+CHATBOT_URL = "http://localhost:8000/bank-rag-agent"
 
 questions = [
-    "What is the current wait time at wallace-hamilton hospital?",
-    "Which hospital has the shortest wait time?",
-    """At which hospitals are patients complaining
-    about billing and insurance issues?""",
-    "What is the average duration in days for emergency visits?",
-    "What are patients saying about the nursing staff at Castaneda-Hardy?",
-    "What was the total billing amount charged to each payer for 2023?",
-    "What is the average billing amount for medicaid visits?",
-    "How many patients has Dr. Ryan Brown treated?",
-    "Which physician has the lowest average visit duration in days?",
-    "How many visits are open and what is their average duration in days?",
-    "Have any patients complained about noise?",
-    "How much was billed for patient 789's stay?",
-    "Which physician has billed the most to cigna?",
-    """Which state had the largest percent increase in
-    medicaid visits from 2022 to 2023?""",
+    "What is the current wait time at Jordan 1?",
+    "Which branch has the shortest wait time?",
+    "What mortgage products do you offer?",
+    "What interest rates apply to Jumbo loans?",
+    "How many customers have an active mortgage?",
+    "What is the average loan amount?",
+    "Which customers have fees that are still due?",
+    "Which loans are above 500000?",
+    "How many payments did customer Alice Smith make last year?",
 ]
 
 request_bodies = [{"text": q} for q in questions]